@@ -0,0 +1,145 @@
+from typing import List, Optional, Callable
+from abc import ABC, abstractmethod
+import bisect
+import math
+import random
+
+from deadline import Deadline
+
+
+CALIBRATION_SAMPLES = 20  # worsening deltas of the first iterations setting the scale of the criteria
+INITIAL_ACCEPTANCE = 0.5  # probability of accepting the median worsening delta at the start of the annealing
+FINAL_ACCEPTANCE = 0.001  # ... and at the end of it
+LAHC_LENGTH = 50  # costs remembered by the late acceptance hill climbing
+RRT_DEVIATION = 0.01  # relative deviation from the best cost allowed by the record-to-record travel at the start
+THRESHOLD_FACTOR = 1.0  # threshold of the threshold accepting at the start, in the median worsening deltas
+DEFAULT_ACCEPTANCE = "annealing"
+
+
+class AcceptanceCriterion(ABC):
+    """
+    Decides whether the LNS continues from the explored solution. The criteria are scheduled
+    by the progress of the deadline (the elapsed fraction of the search time) instead of the
+    iteration count, so they cool down over the same wall-clock budget whether an iteration
+    takes a millisecond or a second. The criteria measured in cost units are calibrated from
+    the median of the first worsening deltas, so the same defaults fit any instance scale.
+
+    start() is called once at the start of the search, accept() in each iteration
+    (for the improving solutions as well, some criteria keep a history of the costs).
+    The progress source can be replaced at the start, e.g. by the fraction of an iteration
+    budget for the runs which have to be reproducible.
+    """
+    def start(self, deadline: Deadline, cost: float,
+              progress: Optional[Callable[[], float]] = None) -> 'AcceptanceCriterion':
+        self.deadline = deadline
+        self.progress = progress or deadline.progress  # 0 at the start of the search, 1 at the end
+        self.scale: Optional[float] = None  # median of the observed worsening deltas (None before the first one)
+        self._deltas: List[float] = []
+
+        return self
+
+    @abstractmethod
+    def accept(self, current_cost: float, candidate_cost: float, best_cost: float) -> bool:
+        """
+        Returns: True if the LNS continues from the candidate solution.
+        """
+
+    def _observe(self, delta: float) -> None:
+        if delta > 0 and len(self._deltas) < CALIBRATION_SAMPLES:
+            bisect.insort(self._deltas, delta)
+            self.scale = self._deltas[len(self._deltas) // 2]
+
+
+class SimulatedAnnealing(AcceptanceCriterion):
+    """
+    A worse solution is accepted with the probability exp(-delta / T). The temperature cools
+    geometrically with the progress from the one accepting the median worsening delta with
+    the initial_acceptance probability to the one accepting it with the final_acceptance probability.
+    """
+    def __init__(self, initial_acceptance: float = INITIAL_ACCEPTANCE, final_acceptance: float = FINAL_ACCEPTANCE):
+        self.initial_acceptance = initial_acceptance
+        self.final_acceptance = final_acceptance
+
+    def temperature(self) -> float:
+        if self.scale is None:
+            return 0.0
+
+        initial = -self.scale / math.log(self.initial_acceptance)
+        final = -self.scale / math.log(self.final_acceptance)
+        return initial * (final / initial) ** self.progress()
+
+    def accept(self, current_cost: float, candidate_cost: float, best_cost: float) -> bool:
+        delta = candidate_cost - current_cost
+        if delta <= 0:
+            return True
+
+        self._observe(delta)
+        return random.random() < math.exp(-delta / self.temperature())
+
+
+class LateAcceptance(AcceptanceCriterion):
+    """
+    Late acceptance hill climbing (Burke & Bykov): the explored solution is accepted if it is
+    not worse than the current one or than the current cost length iterations ago, the costs are
+    kept in a circular buffer. The only parameter is the length, no calibration is needed.
+    """
+    def __init__(self, length: int = LAHC_LENGTH):
+        self.length = length
+
+    def start(self, deadline: Deadline, cost: float,
+              progress: Optional[Callable[[], float]] = None) -> 'AcceptanceCriterion':
+        super().start(deadline, cost, progress)
+        self.history = [cost] * self.length
+        self.iteration = 0
+
+        return self
+
+    def accept(self, current_cost: float, candidate_cost: float, best_cost: float) -> bool:
+        slot = self.iteration % self.length
+        accepted = candidate_cost <= current_cost or candidate_cost <= self.history[slot]
+        self.history[slot] = candidate_cost if accepted else current_cost
+        self.iteration += 1
+
+        return accepted
+
+
+class RecordToRecordTravel(AcceptanceCriterion):
+    """
+    Record-to-record travel (Dueck): the explored solution is accepted if its cost is within
+    the relative deviation from the best cost (the record), the deviation shrinks linearly
+    with the progress to zero at the end.
+    """
+    def __init__(self, deviation: float = RRT_DEVIATION):
+        self.deviation = deviation
+
+    def accept(self, current_cost: float, candidate_cost: float, best_cost: float) -> bool:
+        if candidate_cost <= current_cost:
+            return True
+
+        return candidate_cost <= best_cost * (1 + self.deviation * (1 - self.progress()))
+
+
+class ThresholdAccepting(AcceptanceCriterion):
+    """
+    Threshold accepting (Dueck & Scheuer): a worse solution is accepted deterministically if
+    the delta is below the threshold, which starts at factor times the median worsening delta
+    and decreases linearly with the progress to zero at the end.
+    """
+    def __init__(self, factor: float = THRESHOLD_FACTOR):
+        self.factor = factor
+
+    def accept(self, current_cost: float, candidate_cost: float, best_cost: float) -> bool:
+        delta = candidate_cost - current_cost
+        if delta <= 0:
+            return True
+
+        self._observe(delta)
+        return delta < self.factor * self.scale * (1 - self.progress())
+
+
+ACCEPTANCE_CRITERIA = {
+    "annealing": SimulatedAnnealing,
+    "lahc": LateAcceptance,
+    "rrt": RecordToRecordTravel,
+    "threshold": ThresholdAccepting,
+}
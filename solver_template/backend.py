@@ -0,0 +1,147 @@
+from typing import List, Optional, Tuple, Dict, Any
+import os
+
+try:
+    import numpy as np  # optional, the pure-Python code paths are used without it
+except ImportError:
+    np = None  # type: ignore
+
+
+BACKEND_ENV = "TSP_BACKEND"  # numpy | python, chosen automatically when unset
+BACKENDS = ["numpy", "python"]
+VECTOR_MIN_SIZE = 32  # below this number of cities the array overhead outweighs the batching
+VECTOR_MAX_CITIES = 5000  # the dense copy of larger matrices would not fit in memory (n^2 doubles)
+ARRAY_CACHE_SIZE = 4  # dense copies of the recently used distance matrices
+
+_backend: Optional[str] = None
+_arrays: Dict[int, Tuple[Any, Any]] = {}  # id(distance matrix) -> (distance matrix, its dense array)
+
+
+def select_backend(name: Optional[str] = None) -> str:
+    """
+    Selects the backend of the batched delta evaluations: the given name, the TSP_BACKEND
+    environment variable or numpy if it can be imported (in this order).
+
+    Returns: The name of the selected backend.
+    """
+    global _backend
+    name = name or os.environ.get(BACKEND_ENV) or ("numpy" if np is not None else "python")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name}, expected one of {', '.join(BACKENDS)}")
+    if name == "numpy" and np is None:
+        raise ImportError("The numpy backend was requested, but numpy is not installed")
+
+    _backend = name
+    return name
+
+
+def backend() -> str:
+    return _backend if _backend is not None else select_backend()
+
+
+def vectorized(size: int, distance_matrix: Optional[List[List[float]]] = None) -> bool:
+    """
+    Returns: True if the numpy backend is selected and the problem of the given size is worth batching
+    (never for the lazy matrices and the matrices too large for a dense copy).
+    """
+    if size < VECTOR_MIN_SIZE or backend() != "numpy":
+        return False
+
+    return distance_matrix is None or (len(distance_matrix) <= VECTOR_MAX_CITIES
+                                       and not getattr(distance_matrix, "lazy", False))
+
+
+def as_array(distance_matrix: List[List[float]]) -> Any:
+    """
+    Returns: The dense numpy array of the distance matrix (built once per matrix and cached).
+    """
+    key = id(distance_matrix)
+    cached = _arrays.get(key)
+    if cached is not None and cached[0] is distance_matrix:
+        return cached[1]
+
+    data = getattr(distance_matrix, "data", None)
+    n = len(distance_matrix)
+    if data is not None:  # compact DistanceMatrix, the upper triangle in one flat array
+        array = np.zeros((n, n))
+        upper = np.triu_indices(n, 1)
+        array[upper] = np.frombuffer(data, dtype=np.float64, count=n * (n - 1) // 2)
+        array += array.T
+    else:
+        array = np.array([list(row) for row in distance_matrix], dtype=np.float64)
+
+    if len(_arrays) >= ARRAY_CACHE_SIZE:
+        _arrays.pop(next(iter(_arrays)))
+    _arrays[key] = (distance_matrix, array)
+
+    return array
+
+
+def _order(solution: List[int]) -> Any:
+    return np.asarray(getattr(solution, "order", solution), dtype=np.intp)  # the list of cities of a Tour
+
+
+def insertion_costs(distance_matrix: List[List[float]], cities: List[int], solution: List[int]) -> Any:
+    """
+    Returns: Array of shape (len(cities), len(solution)), the item [c, i] is the cost of inserting
+    the city cities[c] at the index i of the solution (between solution[i - 1] and solution[i]).
+    """
+    matrix = as_array(distance_matrix)
+    succ = _order(solution)
+    pred = np.roll(succ, 1)
+    rows = matrix[np.asarray(cities, dtype=np.intp)]
+
+    return rows[:, pred] + rows[:, succ] - matrix[pred, succ]
+
+
+def best_two_opt_move(distance_matrix: List[List[float]], solution: List[int]) -> Tuple[int, int, float]:
+    """
+    Evaluates the exchange of every pair of the tour edges (solution[i], solution[i + 1]) and
+    (solution[j], solution[j + 1]), i < j, for (solution[i], solution[j]) and (solution[i + 1], solution[j + 1]).
+
+    Returns: A tuple (i, j, cost delta) of the best exchange.
+    """
+    matrix = as_array(distance_matrix)
+    a = _order(solution)
+    b = np.roll(a, -1)
+    removed = matrix[a, b]
+    deltas = matrix[np.ix_(a, a)] + matrix[np.ix_(b, b)] - removed[:, None] - removed[None, :]
+    deltas[np.tril_indices(len(a))] = np.inf  # only the pairs i < j
+
+    i, j = np.unravel_index(int(np.argmin(deltas)), deltas.shape)
+    return int(i), int(j), float(deltas[i, j])
+
+
+def most_related(distance_matrix: List[List[float]], solution: List[int], reference: float,
+                 count: Optional[int] = None, detour_costs: Optional[List[float]] = None) -> List[Tuple[int, float]]:
+    """
+    Returns: Pairs (index in the solution, |sum of the distances to the two tour neighbors - reference|)
+    of the count smallest differences (all of them if the count is None), sorted by the difference
+    in descending order, the ties by the index (as sorted(..., reverse=True)). The sums are taken from
+    the detour costs (indexed by the city) if given, the count smallest ones are selected by argpartition.
+    """
+    order = _order(solution)
+    if detour_costs is not None:
+        sums = np.asarray(detour_costs, dtype=np.float64)[order]
+    else:
+        matrix = as_array(distance_matrix)
+        sums = matrix[order, np.roll(order, 1)] + matrix[order, np.roll(order, -1)]
+    differences = np.abs(sums - reference)
+
+    indices = np.arange(len(order))
+    if count is not None and count < len(order):
+        indices = np.argpartition(differences, count - 1)[:count] if count > 0 else indices[:0]
+    indices = indices[np.lexsort((indices, -differences[indices]))]
+
+    return list(zip(indices.tolist(), differences[indices].tolist()))
+
+
+def upper_quantile(distance_matrix: List[List[float]], q: float) -> float:
+    """
+    Returns: The q-quantile of all the distances between the distinct cities (selected, not sorted).
+    """
+    matrix = as_array(distance_matrix)
+    distances = matrix[np.triu_indices(len(matrix), 1)]
+    k = int(q * len(distances))
+
+    return float(np.partition(distances, k)[k])
@@ -0,0 +1,248 @@
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import csv
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+try:
+    import resource  # peak memory of the worker processes, Unix only
+except ImportError:
+    resource = None  # type: ignore
+
+from instance_cache import load_instance
+from distance_matrix import solver_matrix
+from lns_solver import LNSSolver
+from local_search import LocalSearch
+from exact import ExactSolver, EXACT_MAX_CITIES
+from acceptance import ACCEPTANCE_CRITERIA, DEFAULT_ACCEPTANCE
+
+
+LOG = logging.getLogger(__name__)
+
+LOCAL_SEARCHES = {
+    "two_opt": LocalSearch.two_opt,
+    "vnd": LocalSearch.vnd,
+    "lin_kernighan": LocalSearch.lin_kernighan,
+}
+SPEED_TOLERANCE = 0.25  # relative drop of the iterations per second reported as a regression
+SOLVERS = ["auto", "lns", "exact"]  # auto routes the small instances to the exact solver as main.py does
+CSV_FIELDS = ["instance", "seed", "repetition", "cities", "time_limit", "cost", "global_best", "gap",
+              "iterations", "iterations_per_second", "time_to_target", "elapsed", "peak_memory_mb", "optimal"]
+
+
+def _peak_memory_mb() -> Optional[float]:
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)  # bytes on macOS, KiB elsewhere
+
+
+def run_task(instance_path: str, seed: int, repetition: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the configured solver on one instance in the current (worker) process.
+
+    Returns: The record of the run (see CSV_FIELDS).
+    """
+    instance = load_instance(instance_path)
+    matrix = solver_matrix(instance["Matrix"])
+    time_limit = config["time_limit"] or config["time_scale"] * instance["Timeout"]
+
+    solver: Any
+    if config["solver"] == "exact" or (config["solver"] == "auto" and len(matrix) <= EXACT_MAX_CITIES):
+        solver = ExactSolver(matrix, time_limit)
+    else:
+        solver = LNSSolver(matrix, time_limit, None, coordinates=instance.get("Coordinates"),
+                           local_search=LOCAL_SEARCHES[config["local_search"]], seed=seed,
+                           lower_bound=config["lower_bound"],
+                           acceptance=ACCEPTANCE_CRITERIA[config["acceptance"]]())
+
+    start = time.time()
+    solver.solve()
+    elapsed = time.time() - start
+
+    global_best = instance.get("GlobalBestVal")
+    target = global_best * (1 + config["target_gap"]) if global_best else None
+    iterations = getattr(solver, "iterations", 0)
+
+    return {
+        "instance": os.path.basename(instance_path),
+        "seed": seed,
+        "repetition": repetition,
+        "cities": len(matrix),
+        "time_limit": time_limit,
+        "cost": solver.best_solution_cost,
+        "global_best": global_best,
+        "gap": (solver.best_solution_cost - global_best) / global_best if global_best else None,
+        "iterations": iterations,
+        "iterations_per_second": iterations / elapsed if elapsed > 0 else None,
+        "time_to_target": next((t for t, cost in solver.trace if target is not None and cost <= target), None),
+        "elapsed": elapsed,
+        "peak_memory_mb": _peak_memory_mb(),
+        "optimal": getattr(solver, "optimal", False),
+    }
+
+
+def run_benchmark(instance_paths: List[str], config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Runs every instance repetitions times (the seed of the repetition r is seed + r) in
+    a process pool. Each run gets a fresh process (where supported), so its peak memory
+    is not inflated by the previous runs.
+    """
+    tasks = [(path, config["seed"] + repetition, repetition, config)
+             for path in instance_paths for repetition in range(config["repetitions"])]
+
+    options: Dict[str, Any] = {"max_workers": config["workers"]}
+    if sys.version_info >= (3, 11):
+        options.update(mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1)
+
+    with ProcessPoolExecutor(**options) as pool:
+        futures = [pool.submit(run_task, *task) for task in tasks]
+        runs = []
+        for future in futures:
+            run = future.result()
+            LOG.info(f"{run['instance']} (seed {run['seed']}): cost {run['cost']}, "
+                     f"{run['iterations_per_second'] or 0:.1f} iterations/s")
+            runs.append(run)
+
+    return runs
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns: Per-instance aggregates of the runs (best and mean cost, mean gap, mean iterations/s,
+    median time to target over the runs that reached it).
+    """
+    by_instance: Dict[str, List[Dict[str, Any]]] = {}
+    for run in runs:
+        by_instance.setdefault(run["instance"], []).append(run)
+
+    summary = {}
+    for name, instance_runs in sorted(by_instance.items()):
+        costs = [run["cost"] for run in instance_runs]
+        gaps = [run["gap"] for run in instance_runs if run["gap"] is not None]
+        speeds = [run["iterations_per_second"] for run in instance_runs if run["iterations_per_second"] is not None]
+        times = [run["time_to_target"] for run in instance_runs if run["time_to_target"] is not None]
+        summary[name] = {
+            "runs": len(instance_runs),
+            "best_cost": min(costs),
+            "mean_cost": statistics.mean(costs),
+            "mean_gap": statistics.mean(gaps) if gaps else None,
+            "mean_iterations_per_second": statistics.mean(speeds) if speeds else None,
+            "median_time_to_target": statistics.median(times) if times else None,
+            "reached_target": len(times),
+        }
+
+    return summary
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            speed_tolerance: float = SPEED_TOLERANCE) -> List[str]:
+    """
+    Prints the differences of the mean costs and the speeds against the baseline results.
+
+    Returns: The instances whose mean cost got worse by more than the relative tolerance
+    or whose iterations per second dropped by more than the speed tolerance.
+    """
+    regressions = []
+    print(f"{'Instance':<20} | {'Mean cost':>12} | {'Baseline':>12} | {'Delta':>8} | {'Speedup':>8}")
+    print("-" * 72)
+    for name, current in results["summary"].items():
+        previous = baseline["summary"].get(name)
+        if previous is None:
+            continue
+
+        delta = (current["mean_cost"] - previous["mean_cost"]) / previous["mean_cost"]
+        speedup = (current["mean_iterations_per_second"] / previous["mean_iterations_per_second"]
+                   if current["mean_iterations_per_second"] and previous["mean_iterations_per_second"] else None)
+        print(f"{name:<20} | {current['mean_cost']:>12.2f} | {previous['mean_cost']:>12.2f} | {delta:>8.2%} | "
+              + (f"{speedup:>7.2f}x" if speedup is not None else f"{'-':>8}"))
+        if delta > tolerance or (speedup is not None and speedup < 1 - speed_tolerance):
+            regressions.append(name)
+
+    return regressions
+
+
+def write_results(results: Dict[str, Any], json_path: Optional[str], csv_path: Optional[str]) -> None:
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if csv_path:
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(results["runs"])
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Runs the solver over the instances and records the results.")
+    parser.add_argument("--data", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"),
+                        help="directory with the instances (the files starting with _ are skipped)")
+    parser.add_argument("--pattern", default="*.json", help="glob of the instance files in the directory")
+    parser.add_argument("--solver", choices=SOLVERS, default="auto")
+    parser.add_argument("--local-search", choices=sorted(LOCAL_SEARCHES), default="lin_kernighan")
+    parser.add_argument("--acceptance", choices=sorted(ACCEPTANCE_CRITERIA), default=DEFAULT_ACCEPTANCE)
+    parser.add_argument("--lower-bound", action="store_true", help="stop the LNS at the Held-Karp bound")
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first repetition")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per run (overrides the instance Timeout)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="fraction of the instance Timeout per run")
+    parser.add_argument("--target-gap", type=float, default=0.0,
+                        help="time to target is measured to GlobalBestVal * (1 + target gap)")
+    parser.add_argument("--workers", type=int, default=None, help="size of the process pool (CPU count by default)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON results")
+    parser.add_argument("--csv", default=None, help="CSV with one row per run")
+    parser.add_argument("--compare", default=None, help="JSON results of the baseline build")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="relative increase of the mean cost reported as a regression")
+    parser.add_argument("--speed-tolerance", type=float, default=SPEED_TOLERANCE,
+                        help="relative drop of the mean iterations per second reported as a regression")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(levelname)-5.5s][%(name)-.20s] %(message)s')
+    args = _parse_args(argv)
+
+    instance_paths = sorted(
+        path for path in glob.glob(os.path.join(args.data, args.pattern))
+        if not os.path.basename(path).startswith("_")
+    )
+    config = {
+        "solver": args.solver,
+        "local_search": args.local_search,
+        "acceptance": args.acceptance,
+        "lower_bound": args.lower_bound,
+        "repetitions": args.repetitions,
+        "seed": args.seed,
+        "time_limit": args.time_limit,
+        "time_scale": args.time_scale,
+        "target_gap": args.target_gap,
+        "workers": args.workers or multiprocessing.cpu_count(),
+    }
+
+    runs = run_benchmark(instance_paths, config)
+    results = {"config": config, "runs": runs, "summary": summarize(runs)}
+    write_results(results, args.output, args.csv)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.speed_tolerance)
+        if regressions:
+            LOG.warning(f"Mean cost or throughput regressed on: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+from typing import List, Tuple
+import heapq
+import logging
+
+from spatial_index import GridIndex, Coordinates
+
+
+LOG = logging.getLogger(__name__)
+
+
+class CandidateIndex:
+    """
+    Precomputed K-nearest neighbor lists (candidate sets) of all cities.
+
+    The index is built once per instance and shared by the operators that only need
+    to look at short edges - greedy insertion, local search and destroy methods.
+    """
+    def __init__(self, neighbors: List[List[int]]):
+        self.neighbors = neighbors
+        self.city_count = len(neighbors)
+        self.k = max((len(nearest) for nearest in neighbors), default=0)
+
+    @staticmethod
+    def from_matrix(distance_matrix: List[List[float]], k: int = 10) -> 'CandidateIndex':
+        """
+        Builds the index from the distance matrix in O(n^2 log k).
+        """
+        city_count = len(distance_matrix)
+        neighbors: List[List[int]] = []
+
+        for city in range(city_count):
+            row = distance_matrix[city]
+            nearest = heapq.nsmallest(k + 1, range(city_count), key=row.__getitem__)
+            neighbors.append([other for other in nearest if other != city][:k])
+
+        return CandidateIndex(neighbors)
+
+    @staticmethod
+    def from_coordinates(coordinates: Coordinates, k: int = 10) -> 'CandidateIndex':
+        """
+        Builds the index from the Euclidean coordinates using a uniform grid, which
+        avoids touching all n^2 pairs of cities.
+        """
+        grid = GridIndex(coordinates)
+
+        return CandidateIndex([grid.nearest(city, k) for city in range(len(coordinates))])
+
+    def nearest(self, city: int) -> List[int]:
+        return self.neighbors[city]
+
+
+def tour_links(solution: List[int], city_count: int) -> Tuple[List[int], List[int]]:
+    """
+    Returns the lists (pred, succ) indexed by city, so the neighbors of a city in the
+    tour can be found in O(1). Cities missing in the solution have both set to -1.
+    """
+    pred = [-1] * city_count
+    succ = [-1] * city_count
+
+    prev = solution[-1] if len(solution) else -1
+    for city in solution:
+        succ[prev] = city
+        pred[city] = prev
+        prev = city
+
+    return pred, succ
+
+
+def links_to_tour(succ: List[int], start: int, length: int) -> List[int]:
+    """
+    Walks the successor links from the start city and returns the tour as a list.
+    """
+    tour = [start]
+    city = succ[start]
+
+    while len(tour) < length:
+        tour.append(city)
+        city = succ[city]
+
+    return tour
@@ -0,0 +1,89 @@
+from typing import List, Optional
+import logging
+import threading
+import time
+
+from utils import write_instance_json
+
+
+LOG = logging.getLogger(__name__)
+
+CHECKPOINT_INTERVAL = 0.5  # minimal seconds between two checkpoints of the best solution
+FLUSH_TIMEOUT = 2.0  # seconds to wait for the final checkpoint
+
+
+class CheckpointWriter:
+    """
+    Writes the checkpoints of the best solution in a background thread, so the search is not
+    stalled by the JSON dumps. The thread holds a single slot where a newer solution replaces
+    the one not written yet (latest wins), submissions are rate limited to one per min_interval
+    and every file is written atomically (see write_instance_json), so the solution file is
+    never left truncated when the process is killed.
+
+    The caller checks due() before submitting, so the (lazy) best solution is materialized only
+    for the checkpoints actually written. close() flushes the final solution regardless of the rate.
+    """
+    def __init__(self, output_path: str, min_interval: float = CHECKPOINT_INTERVAL):
+        self.output_path = output_path
+        self.min_interval = min_interval
+        self.written = 0
+
+        self._condition = threading.Condition()
+        self._slot: Optional[List[int]] = None
+        self._closing = False
+        self._last_submit = -float('inf')
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+
+    def start(self) -> 'CheckpointWriter':
+        self._thread.start()
+        return self
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_submit >= self.min_interval
+
+    def submit(self, solution: List[int]) -> None:
+        """
+        This method hands a copy of the solution to the writer thread (the solution may be
+        modified right after), replacing the pending one if it was not written yet.
+        """
+        self._last_submit = time.monotonic()
+        with self._condition:
+            self._slot = list(solution)
+            self._condition.notify_all()
+
+    def close(self, solution: Optional[List[int]] = None, timeout: float = FLUSH_TIMEOUT) -> bool:
+        """
+        This method submits the final solution (if given), waits for the pending write and stops the thread.
+
+        Returns: True if everything submitted was written within the timeout.
+        """
+        if solution is not None:
+            self.submit(solution)
+
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        flushed = not self._thread.is_alive() and self._slot is None
+        if not flushed:
+            LOG.warning(f"Final checkpoint of {self.output_path} was not written within {timeout} s")
+
+        return flushed
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._slot is None and not self._closing:
+                    self._condition.wait()
+                solution, self._slot = self._slot, None
+
+            if solution is None:
+                return  # closing and nothing pending
+
+            try:
+                write_instance_json(solution, self.output_path)
+                self.written += 1
+            except OSError as e:
+                LOG.warning(f"Checkpoint to {self.output_path} failed: {e}")
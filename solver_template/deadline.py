@@ -0,0 +1,78 @@
+from typing import Optional
+import time
+
+
+FINAL_WRITE_MARGIN = 0.5  # seconds reserved for the final write of the solution (and the cleanup)
+MARGIN_FRACTION = 0.05  # ... but at most this fraction of short time limits
+SMOOTHING = 0.2  # weight of the last iteration in the moving average of the iteration time
+SAFETY_FACTOR = 1.5  # the next iteration is started only if this multiple of its predicted time remains
+
+
+def final_write_margin(time_limit: float) -> float:
+    return min(FINAL_WRITE_MARGIN, MARGIN_FRACTION * time_limit)
+
+
+class Deadline:
+    """
+    Time budget of a search on the perf_counter clock (monotonic, unaffected by the system
+    clock changes). The end is time_limit seconds after the start minus the margin reserved
+    for the final write, the duration of the next iteration is predicted by the exponential
+    moving average of the previous ones, so the search stops before an iteration that would
+    overrun. The remaining time is passed down to the repair and the local search as their
+    time_budget, so a single slow iteration is cut short as well.
+    """
+    def __init__(self, time_limit: float, margin: Optional[float] = None,
+                 smoothing: float = SMOOTHING, safety_factor: float = SAFETY_FACTOR):
+        self.start = time.perf_counter()
+        self.margin = final_write_margin(time_limit) if margin is None else margin
+        self.limit = self.start + time_limit  # the hard limit, the margin before it is kept for the final write
+        self.end = self.start + max(time_limit - self.margin, 0.0)
+        self.smoothing = smoothing
+        self.safety_factor = safety_factor
+        self.iteration_time: Optional[float] = None  # moving average of the iteration time (None before the first one)
+        self._iteration_start = self.start
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def remaining(self) -> float:
+        return max(self.end - time.perf_counter(), 0.0)
+
+    def until_limit(self) -> float:
+        return max(self.limit - time.perf_counter(), 0.0)
+
+    def progress(self) -> float:
+        """
+        Returns: The elapsed fraction of the search time (0 at the start, 1 at the end), the clock
+        of the acceptance criteria cooling down with the wall-clock time.
+        """
+        if self.end <= self.start:
+            return 1.0
+
+        return min((time.perf_counter() - self.start) / (self.end - self.start), 1.0)
+
+    def expired(self) -> bool:
+        return time.perf_counter() >= self.end
+
+    def next_fits(self) -> bool:
+        """
+        Returns: True if the next iteration is predicted to finish before the end.
+        """
+        predicted = self.safety_factor * self.iteration_time if self.iteration_time is not None else 0.0
+        return time.perf_counter() + predicted < self.end
+
+    def start_iteration(self) -> float:
+        self._iteration_start = time.perf_counter()
+        return self._iteration_start
+
+    def end_iteration(self) -> float:
+        """
+        Returns: The duration of the iteration, which is added to the moving average.
+        """
+        duration = time.perf_counter() - self._iteration_start
+        if self.iteration_time is None:
+            self.iteration_time = duration
+        else:
+            self.iteration_time += self.smoothing * (duration - self.iteration_time)
+
+        return duration
@@ -4,11 +4,13 @@ import json
 import time
 import logging
 import math
-import random
 
 import matplotlib.pyplot as plt
 
 from optimizer import Optimizer
+from tour import Tour
+from deadline import Deadline
+from acceptance import AcceptanceCriterion, SimulatedAnnealing
 
 Root = Literal["Coordinates"] \
     | Literal["Matrix"] \
@@ -120,7 +122,8 @@ def _print_stats(rows: List[Tuple[str, float, float]]):
 
 def _lsn_test(
     instance: Instance,
-    timeout: int
+    timeout: int,
+    acceptance: Optional[AcceptanceCriterion] = None
 ):
 
     coords = cast(Coordinates, instance["Coordinates"])
@@ -129,52 +132,50 @@ def _lsn_test(
     global_best_val = cast(float, instance["GlobalBestVal"])
     distance_matrix = cast(Matrix, instance["Matrix"])
 
-    optimizer = Optimizer(distance_matrix)
+    optimizer = Optimizer(distance_matrix, coordinates=coords)
 
+    deadline = Deadline(timeout, margin=0.0)
     start_time = time.time()
     prev_time = start_time
-    delta_time: float = 0
-    temperature: float = 100
 
     # INITIAL SOL
-    curr_solution, curr_solution_cost = optimizer.initial(city_count, distance_matrix)
-    best_solution, best_solution_cost = curr_solution.copy(), curr_solution_cost
+    initial_solution, curr_solution_cost = optimizer.initial(city_count, distance_matrix, time_budget=0.05 * timeout)
+    curr_solution = Tour(initial_solution, city_count)
+    best_solution, best_solution_cost = curr_solution.order.copy(), curr_solution_cost
 
     assert city_count == len(best_solution)
     assert _all_different(best_solution)
+    acceptance = (acceptance or SimulatedAnnealing()).start(deadline, curr_solution_cost)
 
-    while delta_time < timeout:
+    while not deadline.expired():
     # for _ in range(100):
         optimizer.cost.append(curr_solution_cost)
-        explored_sol = curr_solution.copy()
+        curr_solution.begin()  # the edits of the explored solution are journaled
 
         # DESTROY
-        deleted_cities, explored_sol_cost = optimizer.destroy(explored_sol, curr_solution_cost, distance_matrix)
+        deleted_cities, explored_sol_cost = optimizer.destroy(curr_solution, curr_solution_cost, distance_matrix)
         # REPAIR
-        explored_sol_cost = optimizer.repair(explored_sol, explored_sol_cost, deleted_cities, distance_matrix)
+        explored_sol_cost = optimizer.repair(curr_solution, explored_sol_cost, deleted_cities, distance_matrix)
         
         if explored_sol_cost < curr_solution_cost:
-            best_solution, best_solution_cost = explored_sol.copy(), explored_sol_cost
+            optimizer.improved(new_best=explored_sol_cost < best_solution_cost)
+            best_solution, best_solution_cost = curr_solution.order.copy(), explored_sol_cost
         else:
             # optimizer.steps_not_improved += 1
             optimizer.stuck()
         
-        delta_cost = explored_sol_cost - curr_solution_cost
-        if (
-            delta_cost < 0 \
-            or random.random() < math.exp(-delta_cost / temperature)
-        ):
-            curr_solution, curr_solution_cost = explored_sol.copy(), explored_sol_cost
+        if acceptance.accept(curr_solution_cost, explored_sol_cost, best_solution_cost):
+            curr_solution.commit()
+            curr_solution_cost = explored_sol_cost
+        else:
+            curr_solution.rollback()
 
         curr_time = time.time()
         if curr_time - prev_time > 5:
             LOG.info(f"Running for {int(curr_time - start_time)} seconds")
             prev_time = curr_time
         
-        _plot_solution(coords, (curr_solution, curr_solution_cost), (global_best, global_best_val))
-
-        temperature *= 0.97
-        delta_time = time.time() - start_time
+        _plot_solution(coords, (curr_solution.order, curr_solution_cost), (global_best, global_best_val))
     
     LOG.info("Killing after timeout reached.")
 
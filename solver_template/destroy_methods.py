@@ -1,5 +1,10 @@
+import heapq
+import math
 import random
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
+
+from spatial_index import GridIndex
+import backend
 
 
 class DestroyMethods:
@@ -14,17 +19,28 @@ class DestroyMethods:
 
         Note: The solution is modified in-place (the cities are removed).
         """
+        # the removal is traced on index links and the solution is compacted once at the end,
+        # instead of deleting from the list one city at a time
+        n = len(solution)
+        pred_index = [i - 1 for i in range(n)]
+        pred_index[0] = n - 1
+        succ_index = [i + 1 for i in range(n)]
+        succ_index[-1] = 0
 
         for i in sorted(del_indices, reverse=True):  # destroy a part of the solution
+            p, s = pred_index[i], succ_index[i]
             curr = solution[i]
-            pred = solution[(i - 1) % len(solution)]
-            succ = solution[(i + 1) % len(solution)]
+            pred = solution[p]
+            succ = solution[s]
 
             solution_cost -= distance_matrix[curr][pred]
             solution_cost -= distance_matrix[curr][succ]
             solution_cost += distance_matrix[pred][succ]
 
-            del solution[i]
+            succ_index[p], pred_index[s] = s, p
+
+        deleted = set(del_indices)
+        solution[:] = [city for i, city in enumerate(solution) if i not in deleted]
 
         return solution_cost
 
@@ -57,19 +73,25 @@ class DestroyMethods:
         This method removes the specified number of cities based on the distance matrix
         and returns a tuple (list of destroyed cities, new solution cost).
         The distance is calculated as a sum of distances to the two neighbours.
+        If the solution is a Tour tracking its detour costs, the worst cities are popped from
+        its lazy heap in O(n log N), otherwise they are selected from the whole tour.
 
         Note: The solution is modified in-place (the cities are removed).
         """
-        neighbor_lengths: Dict[int, float] = {}  # city index : sum of lengths to 2 neighbors
+        detours = getattr(solution, "detours", None)
+        if detours is not None:
+            del_cities = detours.largest(n)
+            del_indices = _positions(solution, del_cities)
+        else:
+            neighbor_lengths: Dict[int, float] = {}  # city index : sum of lengths to 2 neighbors
 
-        for i, city in enumerate(solution):
-            prev = (i - 1) % len(solution)
-            next = (i + 1) % len(solution)
-            neighbor_lengths[i] = distance_matrix[city][solution[prev]] + distance_matrix[city][solution[next]]
+            for i, city in enumerate(solution):
+                prev = (i - 1) % len(solution)
+                next = (i + 1) % len(solution)
+                neighbor_lengths[i] = distance_matrix[city][solution[prev]] + distance_matrix[city][solution[next]]
 
-        sorted_lengths = sorted(neighbor_lengths.items(), key=lambda item: item[1], reverse=True)
-        del_indices = [city_index for city_index, _ in sorted_lengths[:n]]
-        del_cities = [solution[i] for i in del_indices]
+            del_indices = heapq.nlargest(n, neighbor_lengths, key=neighbor_lengths.__getitem__)
+            del_cities = [solution[i] for i in del_indices]
         new_cost = DestroyMethods.count_cost(del_indices, solution, solution_cost, distance_matrix)
 
         return del_cities, new_cost
@@ -94,27 +116,113 @@ class DestroyMethods:
         # Setup reference values
         seed_city_i = random.randint(0, len(solution) - 1)
         seed_city = solution[seed_city_i]
-        seed_city_sum_distance = _calc_sum_distance(seed_city_i, solution, distance_matrix)
+        detours = getattr(solution, "detours", None)
+        seed_city_sum_distance = detours.costs()[seed_city] if detours is not None \
+            else _calc_sum_distance(seed_city_i, solution, distance_matrix)
 
         related_cities = _calculate_related_cities(
             seed_city,
             seed_city_sum_distance,
             solution,
-            distance_matrix
+            distance_matrix,
+            count=n
         )
 
         deleted_cities: List[int] = [seed_city]
         deleted_cities_i: List[int] = [seed_city_i]
 
-        popped = related_cities.pop()
-        while n > 0 and popped[2] < alpha:
-            deleted_cities.append(popped[0])
-            deleted_cities_i.append(popped[1])
-            n -= 1
-            popped = related_cities.pop()
+        for city, city_i, relatedness in reversed(related_cities):  # from the most related city
+            if relatedness >= alpha:
+                break
+            deleted_cities.append(city)
+            deleted_cities_i.append(city_i)
 
         return deleted_cities, DestroyMethods.count_cost(deleted_cities_i, solution, solution_cost, distance_matrix)
 
+    @staticmethod
+    def radial(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        grid: GridIndex,
+        n: int=30,
+        radius: Optional[float]=None
+    ) -> Tuple[List[int], float]:
+        """
+        This method removes a random seed city together with its nearest cities by the coordinates
+        (n cities in total, only those within radius of the seed if it is given) and returns a tuple
+        (list of destroyed cities, new solution cost). The cities are found by the grid index
+        without scanning the tour, so the removal and the following repair stay local.
+
+        Note: The solution is modified in-place (the cities are removed).
+        """
+        n = min(n, len(solution) - 3)
+        seed_city = solution[random.randrange(len(solution))]
+        nearest = grid.nearest(seed_city, n - 1) if radius is None else grid.within(seed_city, radius)[:n - 1]
+        del_cities = [seed_city] + nearest
+
+        return del_cities, DestroyMethods.count_cost(_positions(solution, del_cities), solution,
+                                                     solution_cost, distance_matrix)
+
+    @staticmethod
+    def strip(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        grid: GridIndex,
+        n: int=30,
+        width: float=1.0
+    ) -> Tuple[List[int], float]:
+        """
+        This method removes the n cities closest to a random seed city within a strip of the plane
+        through the seed in a random direction (width is the half width of the strip in the grid
+        cells, doubled until the strip holds n cities, e.g. near the border of the instance)
+        and returns a tuple (list of destroyed cities, new solution cost).
+
+        Note: The solution is modified in-place (the cities are removed).
+        """
+        n = min(n, len(solution) - 3)
+        seed_city = solution[random.randrange(len(solution))]
+        angle = random.uniform(0, math.pi)
+        half_width = width * grid.cell_size
+        related = grid.strip(seed_city, angle, half_width, n - 1)
+        while len(related) < n - 1 and half_width < grid.cell_size * max(grid.cols, grid.rows):
+            half_width *= 2
+            related = grid.strip(seed_city, angle, half_width, n - 1)
+        del_cities = [seed_city] + related
+
+        return del_cities, DestroyMethods.count_cost(_positions(solution, del_cities), solution,
+                                                     solution_cost, distance_matrix)
+
+    @staticmethod
+    def segment(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        n: int=30
+    ) -> Tuple[List[int], float]:
+        """
+        This method removes n consecutive cities of the tour from a random position and returns
+        a tuple (list of destroyed cities, new solution cost).
+
+        Note: The solution is modified in-place (the cities are removed).
+        """
+        n = min(n, len(solution) - 3)
+        start = random.randrange(len(solution))
+        del_indices = [(start + i) % len(solution) for i in range(n)]
+        del_cities = [solution[i] for i in del_indices]
+
+        return del_cities, DestroyMethods.count_cost(del_indices, solution, solution_cost, distance_matrix)
+
+
+def _positions(solution: List[int], cities: List[int]) -> List[int]:
+    pos = getattr(solution, "pos", None)  # the position index of a Tour
+    if pos is None:
+        index = {city: i for i, city in enumerate(solution)}
+        return [index[city] for city in cities]
+
+    return [pos[city] for city in cities]
+
 
 def _calc_sum_distance(city_i: int, solution: List[int], distance_matrix: List[List[float]]) -> float:
     city = solution[city_i]
@@ -128,19 +236,44 @@ def _calculate_related_cities(
         seed_city: int,
         seed_city_sum_distance: float,
         solution: List[int],
-        distance_matrix: List[List[float]]
+        distance_matrix: List[List[float]],
+        count: Optional[int] = None
 ):
-    related_cities: List[Tuple[int, int, float]] = []
+    """
+    Returns: Tuples (city, index in the solution, relatedness to the seed city) sorted from the least
+    related, so the most related city is popped first. Only the count most related cities are
+    selected if the count is given (instead of sorting all of them).
+    """
+    detours = getattr(solution, "detours", None)
+    detour_costs = detours.costs() if detours is not None else None
 
+    if backend.vectorized(len(solution), distance_matrix):
+        # one more than the count, the seed city itself is the most related one
+        related = [
+            (solution[city_i], city_i, difference)
+            for city_i, difference in backend.most_related(distance_matrix, solution, seed_city_sum_distance,
+                                                           count + 1 if count is not None else None, detour_costs)
+            if solution[city_i] != seed_city
+        ]
+        return related[max(len(related) - count, 0):] if count is not None else related
+
+    # the relatedness is the difference of the detour costs, not a spatial one, so neither the candidate
+    # lists nor the max-heap of the detour costs bound the search: all the cities are scanned
+    related_cities: List[Tuple[int, int, float]] = []
     for city_i, city in enumerate(solution):
         if city == seed_city:
             continue
 
-        city_sum_distance = _calc_sum_distance(city_i, solution, distance_matrix)
+        city_sum_distance = detour_costs[city] if detour_costs is not None \
+            else _calc_sum_distance(city_i, solution, distance_matrix)
         related_cities.append((
             city,
             city_i,
             abs(city_sum_distance - seed_city_sum_distance),
         ))
 
+    if count is not None:
+        # the ties are popped in the same order as from the fully sorted list
+        return heapq.nsmallest(count, related_cities, key=lambda x: (x[2], -x[1]))[::-1]
+
     return sorted(related_cities, key=lambda x: x[2], reverse=True)
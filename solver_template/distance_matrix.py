@@ -0,0 +1,221 @@
+from typing import List, Tuple, Optional, Sequence, Iterator, Dict, Any
+from array import array
+from functools import lru_cache
+import math
+
+
+Coordinates = List[Tuple[float, float]]
+
+ROW_MAX_CITIES = 3000  # the solver gets materialized array rows up to this size (n^2 doubles, 72 MB at the limit)
+
+
+class _CompactRow:
+    """
+    Row view of the compact matrix, so that distance_matrix[a][b] works as with lists.
+    """
+    __slots__ = ('city', 'data', 'offsets', 'city_count')
+
+    def __init__(self, city: int, data: Sequence[float], offsets: List[int], city_count: int):
+        self.city = city
+        self.data = data
+        self.offsets = offsets
+        self.city_count = city_count
+
+    def __getitem__(self, other: int) -> float:
+        city = self.city
+        if other > city:
+            return self.data[self.offsets[city] + other]
+        if other < city:
+            return self.data[self.offsets[other] + city]
+        return 0.0
+
+    def __len__(self) -> int:
+        return self.city_count
+
+    def __iter__(self) -> Iterator[float]:
+        return (self[other] for other in range(self.city_count))
+
+
+class _LazyRow:
+    """
+    Row view of the lazy matrix, the distances are computed on demand.
+    """
+    __slots__ = ('city', 'distance', 'city_count')
+
+    def __init__(self, city: int, distance: Any, city_count: int):
+        self.city = city
+        self.distance = distance
+        self.city_count = city_count
+
+    def __getitem__(self, other: int) -> float:
+        city = self.city
+        if other > city:
+            return self.distance(city, other)
+        if other < city:
+            return self.distance(other, city)
+        return 0.0
+
+    def __len__(self) -> int:
+        return self.city_count
+
+    def __iter__(self) -> Iterator[float]:
+        return (self[other] for other in range(self.city_count))
+
+
+class DistanceMatrix:
+    """
+    Symmetric distance matrix usable in place of the list of lists from the instance file.
+
+    Compact mode: only the upper triangle (without the diagonal) is stored in one flat
+    array of doubles, i.e. n(n-1)/2 unboxed floats.
+    Lazy mode: the Euclidean distances are computed from the coordinates on demand and
+    kept in an LRU cache, so instances whose full matrix does not fit in memory can be solved.
+
+    Both modes support distance_matrix[a][b] and len(distance_matrix), so all methods
+    written for the list of lists accept it transparently.
+    """
+    def __init__(self, city_count: int, data: Optional[Sequence[float]] = None,
+                 coordinates: Optional[Coordinates] = None, cache_size: int = 1 << 20,
+                 rounded: bool = False):
+        self.city_count = city_count
+        self.data = data
+        self.coordinates = coordinates
+        self.rounded = rounded
+        self.cache_size = cache_size
+        self.lazy = data is None
+
+        if self.lazy:
+            if coordinates is None:
+                raise ValueError("Lazy distance matrix requires the coordinates")
+            self._distance = lru_cache(maxsize=cache_size)(self._euclidean)
+            self._rows: List[Any] = [_LazyRow(city, self._distance, city_count) for city in range(city_count)]
+        else:
+            # data[offsets[i] + j] is the distance between the cities i < j
+            offsets = [i * city_count - i * (i + 1) // 2 - i - 1 for i in range(city_count)]
+            self._rows = [_CompactRow(city, data, offsets, city_count) for city in range(city_count)]
+
+    @staticmethod
+    def from_lists(matrix: List[List[float]]) -> 'DistanceMatrix':
+        """
+        Builds the compact matrix from the rows. Only the upper triangle is kept, so the matrix
+        has to be symmetric, ValueError is raised otherwise.
+        """
+        city_count = len(matrix)
+        columns = list(zip(*matrix))
+        data = array('d')
+        for i, row in enumerate(matrix):
+            if list(row[i + 1:]) != list(columns[i][i + 1:]):
+                raise ValueError(f"The distance matrix is not symmetric (row {i} differs from column {i})")
+            data.extend(row[i + 1:])
+
+        return DistanceMatrix(city_count, data)
+
+    @staticmethod
+    def from_coordinates(coordinates: Coordinates, lazy: bool = False, cache_size: int = 1 << 20,
+                         rounded: bool = False) -> 'DistanceMatrix':
+        """
+        Builds the matrix of Euclidean distances, rounded to the nearest integer if
+        rounded is set (the way the instance matrices are computed).
+        """
+        coordinates = [(float(x), float(y)) for x, y in coordinates]
+        city_count = len(coordinates)
+
+        if lazy:
+            return DistanceMatrix(city_count, None, coordinates, cache_size, rounded)
+
+        data = array('d')
+        for i, (x, y) in enumerate(coordinates):
+            row = (math.hypot(x - ox, y - oy) for ox, oy in coordinates[i + 1:])
+            data.extend((float(int(d + 0.5)) for d in row) if rounded else row)
+
+        return DistanceMatrix(city_count, data, coordinates, cache_size, rounded)
+
+    @staticmethod
+    def from_instance(instance: Dict[str, Any], lazy: bool = False) -> 'DistanceMatrix':
+        """
+        Builds the matrix from the loaded instance: the compact form of Matrix if it is
+        present (and lazy is not requested), otherwise computed from Coordinates.
+        """
+        coordinates = instance.get("Coordinates")
+        if "Matrix" in instance and not lazy:
+            matrix = DistanceMatrix.from_lists(instance["Matrix"])
+            matrix.coordinates = coordinates
+            return matrix
+
+        if coordinates is None:
+            raise ValueError("The instance contains neither Matrix nor Coordinates")
+
+        return DistanceMatrix.from_coordinates(coordinates, lazy=lazy)
+
+    def __reduce__(self):
+        # the data may be a view of a memory-mapped file, which cannot be pickled
+        data = array('d', self.data) if self.data is not None else None
+        return DistanceMatrix, (self.city_count, data, self.coordinates, self.cache_size, self.rounded)
+
+    def _euclidean(self, a: int, b: int) -> float:
+        ax, ay = self.coordinates[a]  # type: ignore
+        bx, by = self.coordinates[b]  # type: ignore
+        d = math.hypot(ax - bx, ay - by)
+
+        return float(int(d + 0.5)) if self.rounded else d
+
+    def distance(self, a: int, b: int) -> float:
+        return self._rows[a][b]
+
+    def __getitem__(self, city: int) -> Any:
+        return self._rows[city]
+
+    def __len__(self) -> int:
+        return self.city_count
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._rows)
+
+
+class RowMatrix(list):
+    """
+    The compact matrix materialized into one array of doubles per city for the solver.
+    The compact views pay a Python call per distance_matrix[a][b], which halves the LNS throughput,
+    so the compact form is kept for the storage (and the memory-mapped sidecar) only.
+    The attributes of the source matrix (coordinates, data, lazy) are kept, so the numpy backend
+    and the candidate lists built from the coordinates work the same.
+    """
+    def __init__(self, source: DistanceMatrix):
+        super().__init__(_array_rows(source.city_count, source.data))
+        self.source = source
+        self.city_count = source.city_count
+        self.coordinates = source.coordinates
+        self.data = source.data
+        self.rounded = source.rounded
+        self.lazy = False
+
+    def __reduce__(self):
+        return RowMatrix, (self.source,)
+
+
+def _array_rows(city_count: int, data: Sequence[float]) -> List[array]:
+    # the upper triangle padded to the full rows, the lower part of a row is a column of it
+    upper = []
+    offset = 0
+    for i in range(city_count):
+        upper.append(array('d', bytes(8 * (i + 1))) + array('d', data[offset:offset + city_count - i - 1]))
+        offset += city_count - i - 1
+
+    rows = []
+    for city, column in enumerate(zip(*upper)):
+        row = array('d', column[:city])
+        row.extend(upper[city][city:])
+        rows.append(row)
+
+    return rows
+
+
+def solver_matrix(matrix: Any, max_cities: int = ROW_MAX_CITIES) -> Any:
+    """
+    Returns: The matrix for the solver, the RowMatrix of a compact DistanceMatrix of at most max_cities
+    cities, the matrix itself otherwise (the lazy and the larger matrices, the lists of lists).
+    """
+    if isinstance(matrix, DistanceMatrix) and not matrix.lazy and len(matrix) <= max_cities:
+        return RowMatrix(matrix)
+
+    return matrix
@@ -0,0 +1,203 @@
+from typing import List, Tuple, Optional
+from array import array
+import logging
+import math
+import time
+
+from utils import write_instance_json
+from initial_solutions import InitialSolutions
+from repair_methods import RepairMethods
+from candidates import CandidateIndex
+from local_search import LocalSearch
+from lower_bound import one_tree_bound, integral_distances
+from deadline import final_write_margin
+
+
+LOG = logging.getLogger(__name__)
+
+HELD_KARP_MAX_CITIES = 13  # 2^(n-1) * (n-1)^2 steps of the DP, still well below a second in Python
+EXACT_MAX_CITIES = 30  # main.py routes the instances up to this size to the exact solver
+EPSILON = 1e-6
+
+
+def held_karp(distance_matrix: List[List[float]]) -> Tuple[List[int], float]:
+    """
+    Held-Karp dynamic programming over the subsets of cities: cost[S][j] is the length
+    of the shortest path from the city 0 through all cities of S ending in j. The table
+    is stored in flat arrays indexed by mask * m + j (m = n - 1 cities besides the start).
+
+    Returns: A tuple (optimal tour, its cost).
+    """
+    n = len(distance_matrix)
+    if n <= 3:
+        solution = list(range(n))
+        return solution, RepairMethods.count_cost_trivial(solution, distance_matrix)
+
+    m = n - 1
+    full = 1 << m
+    cost = array('d', [math.inf]) * (full * m)
+    parent = array('b', [-1]) * (full * m)  # the previous city of the path (-1 for the start)
+    for j in range(m):
+        cost[(1 << j) * m + j] = distance_matrix[0][j + 1]
+
+    for mask in range(1, full):
+        base = mask * m
+        for j in range(m):
+            path_cost = cost[base + j]
+            if path_cost == math.inf:
+                continue  # j is not in the subset (or the path does not exist)
+
+            row = distance_matrix[j + 1]
+            for k in range(m):
+                bit = 1 << k
+                if mask & bit:
+                    continue
+                index = (mask | bit) * m + k
+                new_cost = path_cost + row[k + 1]
+                if new_cost < cost[index]:
+                    cost[index] = new_cost
+                    parent[index] = j
+
+    base = (full - 1) * m
+    last = min(range(m), key=lambda j: cost[base + j] + distance_matrix[j + 1][0])
+    tour_cost = cost[base + last] + distance_matrix[last + 1][0]
+
+    solution: List[int] = []
+    mask, j = full - 1, last
+    while j != -1:
+        solution.append(j + 1)
+        previous = parent[mask * m + j]
+        mask ^= 1 << j
+        j = previous
+    solution.append(0)
+    solution.reverse()
+
+    return solution, tour_cost
+
+
+def branch_and_bound(distance_matrix: List[List[float]], time_limit: float,
+                     initial: Optional[Tuple[List[int], float]] = None) -> Tuple[List[int], float, bool]:
+    """
+    Depth-first branch and bound over the paths starting in the city 0. The bound of a path
+    ending in the city last is its length plus the cheapest completion relaxed to a 1-tree:
+    the minimum spanning tree of the unvisited cities plus the shortest edges from last and
+    to the city 0 into them, all under the Held-Karp penalties of the root.
+    The search starts from the incumbent tour (Lin-Kernighan improved greedy-edge by default).
+
+    Returns: A tuple (best tour, its cost, True if the optimality was proven within the time limit).
+    """
+    deadline = time.perf_counter() + time_limit
+    n = len(distance_matrix)
+    if n <= 3:
+        solution, cost = held_karp(distance_matrix)
+        return solution, cost, True
+
+    if initial is None:
+        solution, cost = InitialSolutions.greedy_edge(n, distance_matrix)
+        cost = LocalSearch.lin_kernighan(solution, cost, distance_matrix, CandidateIndex.from_matrix(distance_matrix))
+        initial = (solution, cost)
+    best_solution, best_cost = list(initial[0]), initial[1]
+
+    root_bound, pi = one_tree_bound(distance_matrix, best_cost)
+    integral = integral_distances(distance_matrix)
+
+    def pruned(bound: float) -> bool:
+        if integral:
+            bound = math.ceil(bound - EPSILON)  # tour lengths are integers
+        return bound >= best_cost - EPSILON
+
+    if pruned(root_bound):
+        return best_solution, best_cost, True
+
+    # penalized distances, a tour is longer by exactly 2 * sum(pi) under them
+    penalized = [[distance_matrix[i][j] + pi[i] + pi[j] for j in range(n)] for i in range(n)]
+    penalty = 2 * sum(pi)
+    order = [sorted(range(n), key=penalized[i].__getitem__) for i in range(n)]  # branching order
+
+    path = [0]
+    visited = [False] * n
+    visited[0] = True
+    timed_out = False
+
+    def completion_bound(last: int, remaining: List[int]) -> float:
+        # minimum spanning tree of the remaining cities
+        distance_to_tree = {city: penalized[remaining[0]][city] for city in remaining[1:]}
+        tree = 0.0
+        while distance_to_tree:
+            city = min(distance_to_tree, key=distance_to_tree.__getitem__)
+            tree += distance_to_tree.pop(city)
+            row = penalized[city]
+            for other in distance_to_tree:
+                if row[other] < distance_to_tree[other]:
+                    distance_to_tree[other] = row[other]
+
+        row_last = penalized[last]
+        return tree + min(row_last[city] for city in remaining) + min(penalized[city][0] for city in remaining)
+
+    def search(last: int, length: float, penalized_length: float, depth: int) -> None:
+        nonlocal best_solution, best_cost, timed_out
+        if timed_out or time.perf_counter() > deadline:
+            timed_out = True
+            return
+
+        if depth == n:
+            total = length + distance_matrix[last][0]
+            if total < best_cost - EPSILON:
+                best_solution, best_cost = path.copy(), total
+            return
+
+        remaining = [city for city in range(n) if not visited[city]]
+        if pruned(penalized_length + completion_bound(last, remaining) - penalty):
+            return
+
+        for city in order[last]:
+            if visited[city]:
+                continue
+            visited[city] = True
+            path.append(city)
+            search(city, length + distance_matrix[last][city], penalized_length + penalized[last][city], depth + 1)
+            path.pop()
+            visited[city] = False
+
+    search(0, 0.0, 0.0, 1)
+
+    return best_solution, best_cost, not timed_out
+
+
+class ExactSolver:
+    """
+    Exact solver for small instances: Held-Karp dynamic programming up to HELD_KARP_MAX_CITIES
+    cities, branch and bound with the 1-tree bounds (see lower_bound) above. If the branch and bound does not
+    finish within the time limit, the best tour found so far is kept.
+    """
+    def __init__(self, distance_matrix: List[List[float]], time_limit: float, output_path: Optional[str] = None):
+        self.distance_matrix = distance_matrix
+        self.city_count = len(distance_matrix)
+        self.time_limit = time_limit
+        self.output_path = output_path
+
+        self.best_solution = list(range(self.city_count))
+        self.best_solution_cost = float('inf')
+        self.optimal = False
+        self.trace: List[Tuple[float, float]] = []  # (seconds since the start, cost) as in LNSSolver
+
+    def solve(self):
+        start_time = time.perf_counter()
+        if not self.city_count > 0:
+            return
+
+        if self.city_count <= HELD_KARP_MAX_CITIES:
+            self.best_solution, self.best_solution_cost = held_karp(self.distance_matrix)
+            self.optimal = True
+        else:
+            self.best_solution, self.best_solution_cost, self.optimal = branch_and_bound(
+                self.distance_matrix, self.time_limit - final_write_margin(self.time_limit)
+            )
+
+        self.trace = [(time.perf_counter() - start_time, self.best_solution_cost)]
+
+        if self.output_path:
+            write_instance_json(self.best_solution, self.output_path)
+
+        LOG.info(f"Best found solution cost = {self.best_solution_cost} "
+                 f"({'optimal' if self.optimal else 'not proven optimal'}, {time.perf_counter() - start_time:.3f} s)")
@@ -1,8 +1,14 @@
+import math
 import random
-from typing import Tuple, List
+import time
+from typing import Tuple, List, Optional, Callable, Any
 from itertools import permutations
 
 from repair_methods import RepairMethods
+from candidates import CandidateIndex
+
+
+HILBERT_ORDER = 16  # the coordinates are mapped to the 2^16 x 2^16 grid of the Hilbert curve
 
 
 class InitialSolutions:
@@ -45,6 +51,169 @@ class InitialSolutions:
         return solution, solution_cost
 
 
+    @staticmethod
+    def space_filling_curve(city_count: int, distance_matrix: List[List[float]],
+                            coordinates: Optional[List[Tuple[float, float]]] = None) -> Tuple[List[int], float]:
+        """
+        This method visits the cities in the order of their positions along the Hilbert curve
+        over the bounding box of the coordinates (nearby cities are mostly visited one after
+        another). It is O(n log n), the tour is typically ~25 % longer than the optimum.
+        The coordinates of a DistanceMatrix are used if they are not given.
+
+        Returns: A tuple (initial solution, cost).
+        """
+        coordinates = coordinates or getattr(distance_matrix, "coordinates", None)
+        if not coordinates:
+            raise ValueError("Space-filling curve construction requires the coordinates")
+
+        xs = [x for x, _ in coordinates]
+        ys = [y for _, y in coordinates]
+        min_x, min_y = min(xs), min(ys)
+        side = max(max(xs) - min_x, max(ys) - min_y) or 1.0
+        scale = ((1 << HILBERT_ORDER) - 1) / side
+
+        keys = [_hilbert_index(int((x - min_x) * scale), int((y - min_y) * scale)) for x, y in coordinates]
+        solution = sorted(range(city_count), key=keys.__getitem__)
+
+        return solution, RepairMethods.count_cost_trivial(solution, distance_matrix)
+
+
+    @staticmethod
+    def greedy_edge(city_count: int, distance_matrix: List[List[float]],
+                    candidates: Optional[CandidateIndex] = None) -> Tuple[List[int], float]:
+        """
+        Greedy matching: the candidate edges (each city to its nearest neighbors) are taken
+        from the shortest one and an edge is added unless a city would get degree 3 or a
+        subtour would be closed. The resulting paths are joined by the nearest endpoints.
+        It is O(n K log(n K)) for K candidates, the tour is typically ~15-20 % above the optimum.
+
+        Returns: A tuple (initial solution, cost).
+        """
+        if city_count < 4:
+            return InitialSolutions.greedy(city_count, distance_matrix)
+        if candidates is None:
+            coordinates = getattr(distance_matrix, "coordinates", None)
+            candidates = CandidateIndex.from_coordinates(coordinates) if coordinates \
+                else CandidateIndex.from_matrix(distance_matrix, k=10)
+
+        neighbors = candidates.neighbors
+        edges = sorted(
+            (distance_matrix[a][b], a, b)
+            for a in range(city_count) for b in neighbors[a]
+            if a < b or a not in neighbors[b]  # each edge once
+        )
+
+        parent = list(range(city_count))  # union-find of the paths
+
+        def find(city: int) -> int:
+            while parent[city] != city:
+                parent[city] = parent[parent[city]]
+                city = parent[city]
+            return city
+
+        adjacent: List[List[int]] = [[] for _ in range(city_count)]
+        added = 0
+        for _, a, b in edges:
+            if len(adjacent[a]) < 2 and len(adjacent[b]) < 2:
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[root_a] = root_b
+                    adjacent[a].append(b)
+                    adjacent[b].append(a)
+                    added += 1
+                    if added == city_count - 1:
+                        break
+
+        # walk the paths from their endpoints (a city without edges is a path on its own)
+        fragments: List[List[int]] = []
+        visited = [False] * city_count
+        for city in range(city_count):
+            if visited[city] or len(adjacent[city]) == 2:
+                continue
+            path = [city]
+            visited[city] = True
+            prev, current = -1, city
+            while True:
+                following = [nb for nb in adjacent[current] if nb != prev]
+                if not following:
+                    break
+                prev, current = current, following[0]
+                path.append(current)
+                visited[current] = True
+            fragments.append(path)
+
+        # nearest neighbor over the endpoints of the fragments
+        solution = fragments.pop()
+        while fragments:
+            row = distance_matrix[solution[-1]]
+            best = min(range(len(fragments)),
+                       key=lambda i: min(row[fragments[i][0]], row[fragments[i][-1]]))
+            fragment = fragments[best]
+            fragments[best] = fragments[-1]
+            fragments.pop()
+            if row[fragment[-1]] < row[fragment[0]]:
+                fragment.reverse()
+            solution.extend(fragment)
+
+        return solution, RepairMethods.count_cost_trivial(solution, distance_matrix)
+
+
+    @staticmethod
+    def mst_double_tree(city_count: int, distance_matrix: List[List[float]]) -> Tuple[List[int], float]:
+        """
+        Double-tree heuristic: the cities are visited in the preorder of the minimum spanning
+        tree (Prim's algorithm, O(n^2)), i.e. the doubled tree walk with the repeated cities
+        skipped. By the triangle inequality the tour is at most twice the optimum.
+
+        Returns: A tuple (initial solution, cost).
+        """
+        if city_count == 0:
+            return [], 0
+
+        distance_to_tree = [math.inf] * city_count
+        parent = [-1] * city_count
+        children: List[List[int]] = [[] for _ in range(city_count)]
+        remaining = list(range(1, city_count))
+        city = 0
+
+        while remaining:
+            row = distance_matrix[city]
+            nearest, nearest_index = -1, -1
+            for i, other in enumerate(remaining):
+                if row[other] < distance_to_tree[other]:
+                    distance_to_tree[other] = row[other]
+                    parent[other] = city
+                if nearest == -1 or distance_to_tree[other] < distance_to_tree[nearest]:
+                    nearest, nearest_index = other, i
+
+            remaining[nearest_index] = remaining[-1]
+            remaining.pop()
+            children[parent[nearest]].append(nearest)
+            city = nearest
+
+        solution: List[int] = []
+        stack = [0]
+        while stack:
+            city = stack.pop()
+            solution.append(city)
+            row = distance_matrix[city]
+            stack.extend(sorted(children[city], key=row.__getitem__, reverse=True))  # nearest child first
+
+        return solution, RepairMethods.count_cost_trivial(solution, distance_matrix)
+
+
+    @staticmethod
+    def timed(method: Callable[..., Tuple[List[int], float]], city_count: int,
+              distance_matrix: List[List[float]], **kwargs: Any) -> Tuple[List[int], float, float]:
+        """
+        Returns: A tuple (initial solution, cost, build time in seconds) of the given method.
+        """
+        start = time.perf_counter()
+        solution, cost = method(city_count, distance_matrix, **kwargs)
+
+        return solution, cost, time.perf_counter() - start
+
+
     @staticmethod
     def brute_force(distance_matrix: List[List[float]]):
         city_count = len(distance_matrix)
@@ -62,3 +231,24 @@ class InitialSolutions:
                 best_solution_cost = current_distance
         
         return best_solution, best_solution_cost
+
+
+def _hilbert_index(x: int, y: int) -> int:
+    """
+    Returns: The distance of the point (x, y) along the Hilbert curve filling the grid
+    of side 2^HILBERT_ORDER.
+    """
+    side = 1 << HILBERT_ORDER
+    d = 0
+    s = side >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:  # rotate the quadrant
+            if rx == 1:
+                x, y = side - 1 - x, side - 1 - y
+            x, y = y, x
+        s >>= 1
+
+    return d
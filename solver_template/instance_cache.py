@@ -0,0 +1,287 @@
+from typing import Dict, Any, Optional, Tuple
+from array import array
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+
+from distance_matrix import DistanceMatrix
+
+
+LOG = logging.getLogger(__name__)
+
+# Binary sidecar layout (little-endian, all sections aligned to 8 bytes):
+#   header: magic, version, city count, flags, timeout, source size, source mtime, source hash, content hash,
+#           metadata size
+#   metadata: JSON of the other attributes of the instance (GlobalBest, GlobalBestVal, ...), padded to 8 bytes
+#   distances: n(n-1)/2 doubles (upper triangle of the matrix), present if FLAG_MATRIX is set
+#   coordinates: 2n doubles (x0, y0, x1, y1, ...), present if FLAG_COORDINATES is set
+MAGIC = b'TSPC'
+VERSION = 3
+HEADER = struct.Struct('<4sIIIdQq32s32sQ')
+FLAG_MATRIX = 1
+FLAG_COORDINATES = 2
+SUFFIX = '.cache'
+CACHE_ENV = "TSP_INSTANCE_CACHE"  # directory of the sidecars, a per-user one in the temporary directory when unset
+READ_CHUNK = 1 << 20  # bytes of the instance file hashed at once
+ARRAY_KEYS = ("Matrix", "Coordinates")  # stored as the sections of doubles, not in the metadata
+
+_JSON_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r'\s*')
+_EMPTY_LIST = re.compile(r'\[\s*\]')
+_MATRIX_END = re.compile(r'\]\s*\]')  # the matrix is a list of lists of numbers, no deeper nesting
+
+
+def read_instance_json_streaming(file_path: str, skip_matrix: bool = True) -> Dict[str, Any]:
+    """
+    Reads the instance file like utils.read_instance_json, but the Matrix attribute
+    is skipped without being parsed if skip_matrix is set (the distances can be
+    rebuilt from the Coordinates). The attributes are decoded one by one.
+    """
+    with open(file_path) as f:
+        text = f.read()
+
+    instance: Dict[str, Any] = {}
+    i = _WHITESPACE.match(text, 0).end()  # type: ignore
+    if text[i] != '{':
+        raise ValueError(f"Instance file {file_path} does not contain a JSON object")
+    i = _WHITESPACE.match(text, i + 1).end()  # type: ignore
+
+    while text[i] != '}':
+        key, i = _JSON_DECODER.raw_decode(text, i)
+        i = _WHITESPACE.match(text, i).end()  # type: ignore
+        if text[i] != ':':
+            raise ValueError(f"Malformed instance file {file_path} at offset {i}")
+        i = _WHITESPACE.match(text, i + 1).end()  # type: ignore
+
+        if key == "Matrix" and skip_matrix:
+            end = _EMPTY_LIST.match(text, i) or _MATRIX_END.search(text, i)
+            if end is None:
+                raise ValueError(f"Malformed matrix in instance file {file_path}")
+            i = end.end()
+        else:
+            instance[key], i = _JSON_DECODER.raw_decode(text, i)
+
+        i = _WHITESPACE.match(text, i).end()  # type: ignore
+        if text[i] == ',':
+            i = _WHITESPACE.match(text, i + 1).end()  # type: ignore
+
+    return instance
+
+
+def content_hash(distances: Optional[array], coordinates: Optional[array]) -> bytes:
+    """
+    Hash of the instance data (the upper triangle of the matrix and the coordinates),
+    independent of the formatting of the instance file.
+    """
+    h = hashlib.sha256()
+    for data in (distances, coordinates):
+        h.update(data.tobytes() if data is not None else b'')
+
+    return h.digest()
+
+
+def source_hash(file_path: str) -> bytes:
+    """
+    Hash of the bytes of the instance file, binds the sidecar to the exact file it was compiled from.
+    """
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+            h.update(chunk)
+
+    return h.digest()
+
+
+def _private_dir(folder: str) -> bool:
+    """
+    This method creates the directory of the sidecars accessible to the current user only.
+
+    Returns: True if the directory is owned by the current user and no one else can write to it
+    (otherwise another user could plant a sidecar with different distances).
+    """
+    try:
+        os.makedirs(folder, mode=0o700, exist_ok=True)
+        stat = os.stat(folder)
+    except OSError:
+        return False
+
+    getuid = getattr(os, "getuid", None)  # Unix only
+    if getuid is not None and (stat.st_uid != getuid() or stat.st_mode & 0o022):
+        LOG.warning(f"Instance cache {folder} is not a private directory of the current user, ignoring it")
+        return False
+
+    return True
+
+
+def _cache_paths(file_path: str):
+    # the sidecars are kept in a cache directory, not next to the instance files
+    key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()
+    folder = os.environ.get(CACHE_ENV)
+    if folder and _private_dir(folder):
+        yield os.path.join(folder, key + SUFFIX)
+
+    # the configured directory may be read-only, fall back to a per-user one in the temporary directory
+    uid = getattr(os, "getuid", lambda: "user")()
+    folder = os.path.join(tempfile.gettempdir(), f'tsp_instance_cache-{uid}')
+    if _private_dir(folder):
+        yield os.path.join(folder, key + SUFFIX)
+
+
+def _metadata(instance: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in instance.items() if key not in ARRAY_KEYS and key != "Hash"}
+
+
+def write_instance_cache(file_path: str, cache_path: str, city_count: int, timeout: float,
+                         distances: Optional[array], coordinates: Optional[array],
+                         metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Writes the binary sidecar of the instance (atomically, via a temporary file), the metadata
+    are the other attributes of the instance returned by the later loads as they are.
+
+    Returns: The content hash of the instance.
+    """
+    stat = os.stat(file_path)
+    flags = (FLAG_MATRIX if distances is not None else 0) | (FLAG_COORDINATES if coordinates is not None else 0)
+    digest = content_hash(distances, coordinates)
+    encoded = json.dumps(metadata or {}).encode()
+    encoded += b' ' * (-len(encoded) % 8)  # the doubles stay aligned
+    header = HEADER.pack(MAGIC, VERSION, city_count, flags, float(timeout), stat.st_size, stat.st_mtime_ns,
+                         source_hash(file_path), digest, len(encoded))
+
+    folder = os.path.dirname(cache_path) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(encoded)
+            for data in (distances, coordinates):
+                if data is not None:
+                    data.tofile(f)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return digest
+
+
+def map_instance_cache(file_path: str, cache_path: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """
+    Maps the binary sidecar into memory. The distances are not copied, the returned
+    DistanceMatrix reads them directly from the mapped file.
+
+    Returns: A tuple (instance with Matrix as DistanceMatrix, content hash) or None if
+    the sidecar is missing or does not belong to the current version of the instance file
+    (its size, modification time and the hash of its bytes).
+    The instance has the same attributes as the one parsed from the file.
+    """
+    try:
+        stat = os.stat(file_path)
+        with open(cache_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(mapped) < HEADER.size:
+        return None
+    magic, version, city_count, flags, timeout, size, mtime_ns, source, digest, metadata_size = \
+        HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC or version != VERSION or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    try:
+        if source != source_hash(file_path):
+            return None
+    except OSError:
+        return None
+
+    distance_count = city_count * (city_count - 1) // 2 if flags & FLAG_MATRIX else 0
+    coordinate_count = 2 * city_count if flags & FLAG_COORDINATES else 0
+    if len(mapped) != HEADER.size + metadata_size + 8 * (distance_count + coordinate_count):
+        return None
+
+    try:
+        metadata = json.loads(mapped[HEADER.size:HEADER.size + metadata_size])
+    except ValueError:
+        return None
+
+    view = memoryview(mapped)[HEADER.size + metadata_size:].cast('d')
+    coordinates = None
+    if coordinate_count:
+        flat = view[distance_count:]
+        coordinates = [(flat[2 * i], flat[2 * i + 1]) for i in range(city_count)]
+
+    instance: Dict[str, Any] = metadata
+    if coordinates is not None:
+        instance["Coordinates"] = coordinates
+    if flags & FLAG_MATRIX:
+        instance["Matrix"] = DistanceMatrix(city_count, view[:distance_count], coordinates)
+    elif coordinates is not None:
+        instance["Matrix"] = DistanceMatrix.from_coordinates(coordinates, lazy=True)
+
+    return instance, digest
+
+
+def load_instance(file_path: str, use_cache: bool = True, matrix_from_coordinates: bool = False,
+                  rounded: bool = True) -> Dict[str, Any]:
+    """
+    Loads the instance with Matrix as a DistanceMatrix (an asymmetric Matrix is kept as the lists
+    of rows and is not cached). The first load parses the JSON
+    file and writes the binary sidecar to the cache directory (TSP_INSTANCE_CACHE or a per-user
+    directory in the temporary directory, used only if private to the user), the later loads
+    map the sidecar without parsing anything and return the same attributes.
+    If matrix_from_coordinates is set, Matrix is not parsed at all and the distances
+    are computed from Coordinates (rounded to integers as in the provided instances).
+    The content hash of the instance is stored under the key "Hash".
+    """
+    if use_cache:
+        for cache_path in _cache_paths(file_path):
+            cached = map_instance_cache(file_path, cache_path)
+            if cached is not None:
+                LOG.info(f"Mapped compiled instance {cache_path}")
+                instance, digest = cached
+                instance["Hash"] = digest.hex()
+                return instance
+
+    if matrix_from_coordinates:
+        instance = read_instance_json_streaming(file_path)
+        matrix = DistanceMatrix.from_coordinates(instance["Coordinates"], rounded=rounded)
+    else:
+        with open(file_path) as f:
+            instance = json.load(f)
+        try:
+            matrix = DistanceMatrix.from_instance(instance, lazy="Matrix" not in instance)
+        except ValueError as e:
+            if "Matrix" not in instance:
+                raise
+            # the compact form (and the sidecar) keeps only the upper triangle, the rows are used as they are
+            LOG.warning(f"Instance {file_path} is not compiled: {e}")
+            rows = array('d', (float(value) for row in instance["Matrix"] for value in row))
+            instance["Hash"] = content_hash(rows, None).hex()
+            return instance
+    instance["Matrix"] = matrix
+
+    distances = matrix.data if not matrix.lazy else None
+    coordinates = None
+    if "Coordinates" in instance:
+        coordinates = array('d', (float(value) for point in instance["Coordinates"] for value in point))
+
+    digest = None
+    if use_cache:
+        for cache_path in _cache_paths(file_path):
+            try:
+                digest = write_instance_cache(file_path, cache_path, len(matrix), instance.get("Timeout", 0),
+                                              distances, coordinates, _metadata(instance))  # type: ignore
+                LOG.info(f"Compiled instance written to {cache_path}")
+                break
+            except OSError as e:
+                LOG.warning(f"Could not write compiled instance to {cache_path}: {e}")
+
+    instance["Hash"] = (digest or content_hash(distances, coordinates)).hex()  # type: ignore
+
+    return instance
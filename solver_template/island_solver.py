@@ -0,0 +1,194 @@
+from typing import List, Tuple, Optional, Any, Dict, Callable
+import logging
+import multiprocessing
+import queue
+import time
+
+from acceptance import AcceptanceCriterion
+from lns_solver import LNSSolver
+from operator_selection import OperatorMix
+from candidates import CandidateIndex
+from destroy_methods import DestroyMethods
+from precompute import distance_quantile, InstanceData
+from repair_methods import RepairMethods
+from local_search import LocalSearch, LocalSearchMethod
+from parallel_solver import SharedSolutions, MultiProcessSolver
+
+
+LOG = logging.getLogger(__name__)
+
+Migrant = Tuple[int, List[int], float]  # (source island, tour, cost)
+
+# (distance matrix, candidates) -> (destroy methods, repair methods) of an island
+IslandProfile = Callable[[List[List[float]], CandidateIndex], Tuple[OperatorMix, OperatorMix]]
+
+
+class RingTopology:
+    """
+    Each island sends its migrants to the next island in the ring.
+    """
+    def targets(self, island: int, island_count: int) -> List[int]:
+        return [(island + 1) % island_count] if island_count > 1 else []
+
+
+class FullyConnectedTopology:
+    """
+    Each island sends its migrants to all other islands.
+    """
+    def targets(self, island: int, island_count: int) -> List[int]:
+        return [other for other in range(island_count) if other != island]
+
+
+class ImproveCurrentPolicy:
+    """
+    Migration policy: the island emigrates its best solution and continues from the best
+    immigrant if it is better than its current solution.
+    """
+    def emigrant(self, solver: LNSSolver, solution: List[int], cost: float) -> Tuple[List[int], float]:
+        return solver.best_solution, solver.best_solution_cost
+
+    def immigrate(self, solver: LNSSolver, solution: List[int], cost: float,
+                  migrants: List[Migrant]) -> Optional[Tuple[List[int], float]]:
+        _, tour, tour_cost = min(migrants, key=lambda migrant: (migrant[2], migrant[0]))
+        return (tour, tour_cost) if tour_cost < cost else None
+
+
+class ImproveBestPolicy(ImproveCurrentPolicy):
+    """
+    Migration policy keeping the islands more diverse: the best immigrant is only accepted
+    if it beats the best solution the island has found itself.
+    """
+    def immigrate(self, solver: LNSSolver, solution: List[int], cost: float,
+                  migrants: List[Migrant]) -> Optional[Tuple[List[int], float]]:
+        _, tour, tour_cost = min(migrants, key=lambda migrant: (migrant[2], migrant[0]))
+        return (tour, tour_cost) if tour_cost < solver.best_solution_cost else None
+
+
+def shaw_profile(distance_matrix: List[List[float]], candidates: CandidateIndex) -> Tuple[OperatorMix, OperatorMix]:
+    n = min(30, len(distance_matrix) // 4)
+    return (
+        [(DestroyMethods.shaw_removal, 0.7, {"n": n, "alpha": distance_quantile(distance_matrix, 0.2)}),
+         (DestroyMethods.random, 0.3, {})],
+        [(RepairMethods.greedy, 1.0, {"candidates": candidates})]
+    )
+
+
+def worst_profile(distance_matrix: List[List[float]], candidates: CandidateIndex) -> Tuple[OperatorMix, OperatorMix]:
+    n = min(20, len(distance_matrix) // 4)
+    return (
+        [(DestroyMethods.n_worst_cases, 0.7, {"n": n}),
+         (DestroyMethods.random, 0.3, {})],
+        [(RepairMethods.greedy, 0.5, {"candidates": candidates}),
+         (RepairMethods.greedy_vnd, 0.5, {"candidates": candidates})]
+    )
+
+
+def random_profile(distance_matrix: List[List[float]], candidates: CandidateIndex) -> Tuple[OperatorMix, OperatorMix]:
+    return (
+        [(DestroyMethods.random, 1.0, {})],
+        [(RepairMethods.greedy, 1.0, {"candidates": candidates})]
+    )
+
+
+ISLAND_PROFILES: Dict[str, IslandProfile] = {
+    "shaw": shaw_profile,
+    "worst": worst_profile,
+    "random": random_profile,
+}
+
+TOPOLOGIES = {
+    "ring": RingTopology,
+    "full": FullyConnectedTopology,
+}
+
+MIGRATION_POLICIES = {
+    "current": ImproveCurrentPolicy,
+    "best": ImproveBestPolicy,
+}
+
+
+class _Migration:
+    """
+    Exchange hook of an island: sends the emigrant to the target islands and applies
+    the immigrants waiting in the island's inbox according to the migration policy.
+    """
+    def __init__(self, island: int, inboxes: List[Any], topology: Any, policy: Any, shared: SharedSolutions):
+        self.island = island
+        self.inboxes = inboxes
+        self.topology = topology
+        self.policy = policy
+        self.shared = shared
+
+    def __call__(self, solver: LNSSolver, solution: List[int], cost: float) -> Optional[Tuple[List[int], float]]:
+        self.shared.publish(self.island, solver.best_solution, solver.best_solution_cost)
+
+        tour, tour_cost = self.policy.emigrant(solver, solution, cost)
+        for target in self.topology.targets(self.island, len(self.inboxes)):
+            try:
+                self.inboxes[target].put_nowait((self.island, tour, tour_cost))
+            except queue.Full:
+                pass  # the target has not consumed the previous migrants yet
+
+        migrants: List[Migrant] = []
+        while True:
+            try:
+                migrants.append(self.inboxes[self.island].get_nowait())
+            except queue.Empty:
+                break
+
+        return self.policy.immigrate(solver, solution, cost, migrants) if migrants else None
+
+
+def _run_island(island: int, distance_matrix: List[List[float]], time_limit: float, config: Dict[str, Any],
+                inboxes: List[Any], shared: SharedSolutions, results: Any) -> None:
+    start = time.perf_counter()
+    profile = config["profiles"][island % len(config["profiles"])]
+    candidates = InstanceData.of(distance_matrix, config["coordinates"]).candidates()
+    destroy_methods, repair_methods = profile(distance_matrix, candidates)
+
+    solver = LNSSolver(
+        distance_matrix, time_limit, None,
+        local_search=config["local_search"],
+        seed=config["seed"] + island,
+        candidates=candidates,
+        destroy_methods=destroy_methods,
+        repair_methods=repair_methods,
+        exchange=_Migration(island, inboxes, config["topology"], config["policy"], shared),
+        exchange_interval=config["migration_interval"],
+        acceptance=config["acceptance"]
+    )
+    solver.time_limit = max(time_limit - (time.perf_counter() - start), 0.0)  # the setup counts as well
+    solver.solve()
+
+    for inbox in inboxes:
+        inbox.cancel_join_thread()  # do not wait for the unconsumed migrants on exit
+
+    shared.publish(island, solver.best_solution, solver.best_solution_cost)
+    results.put((island, solver.best_solution, solver.best_solution_cost, solver.iterations))
+
+
+class IslandLNSSolver(MultiProcessSolver):
+    """
+    Island model: several LNSSolver islands with different destroy/repair mixes run in
+    separate processes and exchange elite tours over per-island queues every
+    migration_interval iterations. Both the topology (who sends to whom) and the
+    migration policy (what is sent and when an immigrant is accepted) are pluggable.
+    """
+    def __init__(self, distance_matrix: List[List[float]], time_limit: float, output_path: str,
+                 island_count: Optional[int] = None, seed: int = 0,
+                 coordinates: Optional[List[Tuple[float, float]]] = None,
+                 local_search: LocalSearchMethod = LocalSearch.lin_kernighan,
+                 profiles: Optional[List[IslandProfile]] = None,
+                 topology: Any = None, policy: Any = None, migration_interval: int = 100,
+                 acceptance: Optional[AcceptanceCriterion] = None):
+        self.island_count = island_count or multiprocessing.cpu_count()
+        super().__init__(distance_matrix, time_limit, output_path, self.island_count, _run_island, {
+            "coordinates": coordinates,
+            "local_search": local_search,
+            "profiles": profiles or [shaw_profile, worst_profile, random_profile],
+            "seed": seed,
+            "topology": topology or RingTopology(),
+            "policy": policy or ImproveCurrentPolicy(),
+            "migration_interval": migration_interval,
+            "acceptance": acceptance
+        })
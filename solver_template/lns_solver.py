@@ -1,82 +1,315 @@
-from typing import List
-import math
+from typing import List, Tuple, Optional, Callable, Dict, Any
 import time
 import random
 import logging
 
-from utils import write_instance_json
 from initial_solutions import InitialSolutions
-from repair_methods import RepairMethods
+from repair_methods import RepairMethods, REGRET_K
 from destroy_methods import DestroyMethods
+from candidates import CandidateIndex
+from local_search import LocalSearch, LocalSearchMethod
+from tour import Tour, JournalEntry
+from lower_bound import LowerBound
+from operator_selection import AdaptiveOperatorSelector, OperatorMix, REJECTED, ACCEPTED, BETTER, NEW_BEST
+from profiling import PhaseProfiler
+from checkpoint import CheckpointWriter, CHECKPOINT_INTERVAL
+from deadline import Deadline
+from acceptance import AcceptanceCriterion, SimulatedAnnealing
+from precompute import InstanceData
 
 
 LOG = logging.getLogger(__name__)
+GAP_LOG_INTERVAL = 5.0  # seconds between the reports of the optimality gap
 logging.basicConfig(level=logging.WARN, format='[%(asctime)s][%(levelname)-5.5s][%(name)-.20s] %(message)s')
 
 
+# (solver, current solution, current cost) -> solution to continue from (or None to keep the current one)
+ExchangeHook = Callable[['LNSSolver', List[int], float], Optional[Tuple[List[int], float]]]
+
+
 class LNSSolver:
     def __init__(self, distance_matrix: List[List[float]], time_limit: float,
-                 output_path: str, alpha: float = 0.997):
+                 output_path: Optional[str], acceptance: Optional[AcceptanceCriterion] = None,
+                 coordinates: Optional[List[Tuple[float, float]]] = None, candidate_count: int = 10,
+                 local_search: LocalSearchMethod = LocalSearch.two_opt,
+                 init_method: Callable[[int, List[List[float]]], Tuple[List[int], float]] = InitialSolutions.greedy,
+                 seed: Optional[int] = None, max_iterations: Optional[int] = None,
+                 exchange: Optional[ExchangeHook] = None, exchange_interval: int = 50,
+                 candidates: Optional[CandidateIndex] = None,
+                 destroy_methods: Optional[OperatorMix] = None, repair_methods: Optional[OperatorMix] = None,
+                 segment_length: int = 50, reaction: float = 0.2, time_scoring: Optional[bool] = None,
+                 lower_bound: bool = False, gap_epsilon: float = 1e-6,
+                 profiler: Optional[PhaseProfiler] = None, checkpoint_interval: float = CHECKPOINT_INTERVAL):
 
         self.distance_matrix = distance_matrix
-        self.city_count = len(distance_matrix[0])
-        self.T_initial = 6000
-        self.alpha = alpha
+        self.city_count = len(distance_matrix[0]) if distance_matrix else 0
+        self.acceptance = acceptance or SimulatedAnnealing()  # restarted by each solve()
         self.time_limit = time_limit
-        self.output_path = output_path
+        self.output_path = output_path  # None disables checkpointing (e.g. in parallel workers)
+        self.checkpoint_interval = checkpoint_interval
+        self.init_method = init_method
+        self.seed = seed
+        self.max_iterations = max_iterations
+        self.use_lower_bound = lower_bound  # stop as soon as the best tour reaches the Held-Karp bound
+        self.gap_epsilon = gap_epsilon
+        self.gap: Optional[float] = None  # relative gap of the best tour to the lower bound (None if unknown)
+        self.optimal = False
+        self.trace: List[Tuple[float, float]] = []  # (seconds since the start, cost) of each new best solution
+        self._start_time = 0.0
+        self.exchange = exchange  # called every exchange_interval iterations to share solutions
+        self.exchange_interval = exchange_interval
+        self.iterations = 0
+        self.local_search = local_search  # improvement applied after each repair (e.g. 2-opt, VND, Lin-Kernighan)
+        self.profiler = profiler  # per-phase timing counters of the loop, None disables them
+
+        # K-nearest neighbor lists shared by the repair and local search operators (and by all
+        # the solvers of the instance through the precomputed instance data)
+        self.instance = InstanceData.of(distance_matrix, coordinates)
+        self.candidates = candidates if candidates is not None else self.instance.candidates(candidate_count)
+
+        # the (destroy, repair) pair used in each iteration is drawn by the adaptive weights,
+        # the weights given here are the initial ones; the weights follow the score per millisecond
+        # unless the run is bounded by max_iterations (the measured times would make it irreproducible)
+        self.destroy_methods: OperatorMix = destroy_methods or self._default_destroy_methods()
+        self.repair_methods: OperatorMix = repair_methods or [
+            (RepairMethods.greedy, 1.0, {"candidates": self.candidates}),
+            (RepairMethods.regret, 1.0, {"candidates": self.candidates, "k": REGRET_K})
+        ]
+        self.selector = AdaptiveOperatorSelector(self.destroy_methods, self.repair_methods,
+                                                 segment_length=segment_length, reaction=reaction,
+                                                 time_scoring=max_iterations is None if time_scoring is None else time_scoring)
+        # the detour costs of the cities are maintained by the tour only if a destroy method reads them
+        self.track_detours = any(method in (DestroyMethods.n_worst_cases, DestroyMethods.shaw_removal)
+                                 for method, _, _ in self.destroy_methods)
 
         self.best_solution = list(range(self.city_count))
         self.best_solution_cost = float('inf')
+        self._current: Optional[Tour] = None
+        self._best_journal: Optional[List[JournalEntry]] = None  # edits of the current tour since it was the best
+        self._best_journal_size = 0
+
+    @property
+    def best_solution(self) -> List[int]:
+        self._snapshot_best()
+        return self._best_solution
+
+    @best_solution.setter
+    def best_solution(self, solution: List[int]) -> None:
+        self._best_solution = solution
+        self._best_journal = None
+
+    def _mark_best(self, cost: float) -> None:
+        """
+        The current tour becomes the best solution. Instead of copying it, the edits committed
+        from now on are kept, so the best tour can be restored from the current one when needed.
+        """
+        self.best_solution_cost = cost
+        self._best_journal = []
+        self._best_journal_size = 0
+        self.trace.append((time.perf_counter() - self._start_time, cost))
+
+    def _commit(self, entries: List[JournalEntry]) -> None:
+        if self._best_journal is None:
+            return
+
+        self._best_journal.extend(entries)
+        self._best_journal_size += Tour.journal_size(entries)
+        if self._best_journal_size > self.city_count:
+            self._snapshot_best()  # the undo would not be cheaper than the copy anymore
+
+    def _snapshot_best(self) -> None:
+        if self._best_journal is None or self._current is None:
+            return
+
+        best = self._current.copy()
+        best.undo(self._best_journal)
+        self.best_solution = best.order
 
 
+    def _default_destroy_methods(self) -> OperatorMix:
+        methods: OperatorMix = [(DestroyMethods.random, 1.0, {})]
+        if self.city_count >= 8:
+            methods.append((DestroyMethods.n_worst_cases, 1.0, {"n": min(10, self.city_count // 4)}))
+            methods.append((DestroyMethods.shaw_removal, 1.0, {
+                "n": min(30, self.city_count // 4),
+                "alpha": self.instance.quantile(0.2)
+            }))
+            methods.append((DestroyMethods.segment, 1.0, {"n": min(30, self.city_count // 4)}))
+
+            # spatially localized removals (the cities close to a seed by the coordinates)
+            grid = self.instance.grid()
+            if grid is not None:
+                methods.append((DestroyMethods.radial, 1.0, {"grid": grid, "n": min(30, self.city_count // 4)}))
+                methods.append((DestroyMethods.strip, 1.0, {"grid": grid, "n": min(30, self.city_count // 4)}))
+
+        return methods
+
+    def statistics(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Returns: Statistics of the destroy and repair operators (calls, improvements, mean time).
+        """
+        return self.selector.statistics()
+
+    def profile_report(self) -> Optional[str]:
+        """
+        Returns: The end-of-run report of the profiler (iterations per second, time share of the phases
+        and of the operators), None if the profiling is disabled.
+        """
+        if self.profiler is None:
+            return None
+
+        return self.profiler.report(self.iterations, time.perf_counter() - self._start_time, self.statistics())
+
+    def _iteration_progress(self) -> float:
+        """
+        Returns: The elapsed fraction of max_iterations, the clock of the acceptance criteria
+        which does not depend on the speed of the machine.
+        """
+        return min(self.iterations / self.max_iterations, 1.0)
+
     def solve(self):
         """
-        This method is a LNS metaheuristic with a simulated annealing approach to accepting new solutions.
-        It uses random destroy method and greedy repair followed by 2-opt.
+        This method is a LNS metaheuristic accepting the new solutions by the acceptance criterion
+        (simulated annealing cooled by the wall-clock time by default, see acceptance.py, by the iteration
+        count if max_iterations is set, so the seeded runs of a fixed length are reproducible).
+        In each iteration one (destroy, repair) pair is drawn by the adaptive weights of the selector
+        (random, n worst and shaw destroy with greedy repair by default) and the repair is followed by
+        the local search (2-opt by default). The outcome and the duration of the iteration are reported
+        back, so the pairs yielding the most improvement per millisecond (per call with max_iterations)
+        are drawn more often.
+        The search stops when the next iteration is not predicted to finish before the time limit
+        (minus a margin for the final write), see Deadline.
         """
-        start_time = time.time()
+        deadline = Deadline(self.time_limit)
+        self._start_time = deadline.start
         if not self.city_count > 0:
             return
 
-        curr_solution, curr_solution_cost = InitialSolutions.greedy(self.city_count, self.distance_matrix)
-        self.best_solution = curr_solution.copy()
-        self.best_solution_cost = curr_solution_cost
+        if self.seed is not None:
+            random.seed(self.seed)
+
+        initial_solution, curr_solution_cost = self.init_method(self.city_count, self.distance_matrix)
+        curr_solution = Tour(initial_solution, self.city_count)
+        if self.track_detours:
+            curr_solution.track_detours(self.distance_matrix)
+        curr_solution_cost = self.local_search(
+            curr_solution, curr_solution_cost, self.distance_matrix, self.candidates, time_budget=deadline.remaining()
+        )
+        self._current = curr_solution
+        self._mark_best(curr_solution_cost)
+
+        lower_bound = None
+        if self.use_lower_bound:
+            lower_bound = LowerBound(self.distance_matrix, curr_solution_cost, time_limit=deadline.remaining())
+            lower_bound.start()
+        gap_logged = time.perf_counter()
 
-        T = self.T_initial  # initialize the temperature
+        # the best solutions are written by a background thread, at most once per checkpoint interval
+        checkpoint = CheckpointWriter(self.output_path, self.checkpoint_interval).start() if self.output_path else None
+        checkpoint_pending = checkpoint is not None
 
-        delta_time = time.time() - start_time
-        while delta_time < self.time_limit: # timelimit is the stopping condition
-            explored_solution = curr_solution.copy()
-            deleted_cities, explored_solution_cost = DestroyMethods.random(
-                explored_solution, curr_solution_cost,self.distance_matrix
+        acceptance = self.acceptance.start(deadline, curr_solution_cost,
+                                           self._iteration_progress if self.max_iterations is not None else None)
+        profiler = self.profiler
+
+        while deadline.next_fits():
+            if self.max_iterations is not None and self.iterations >= self.max_iterations:
+                break
+            if lower_bound is not None:
+                self.gap = lower_bound.gap(self.best_solution_cost)
+                if lower_bound.reached(self.best_solution_cost, self.gap_epsilon):
+                    self.optimal = True
+                    LOG.info(f"Best solution reached the lower bound {lower_bound.value()}, stopping early")
+                    break
+                if self.gap is not None and time.perf_counter() - gap_logged > GAP_LOG_INTERVAL:
+                    LOG.info(f"Best solution cost = {self.best_solution_cost}, gap to the lower bound {self.gap:.2%}")
+                    gap_logged = time.perf_counter()
+            iteration_start = stamp = deadline.start_iteration()
+
+            # the candidate is explored directly on the current tour, the journal of its edits
+            # is committed on acceptance and rolled back on rejection (no copies of the tour)
+            curr_solution.begin()
+            pair = self.selector.select()
+            destroy, destroy_config, repair, repair_config = self.selector.operators(pair)
+            deleted_cities, explored_solution_cost = destroy(
+                curr_solution, curr_solution_cost, self.distance_matrix, **destroy_config
             )
-            explored_solution_cost = RepairMethods.greedy(
-                explored_solution, explored_solution_cost, deleted_cities, self.distance_matrix
+            touched_cities = deleted_cities.copy()  # the repair consumes the list of deleted cities
+            if profiler is not None:
+                stamp = profiler.lap("destroy", stamp)
+            explored_solution_cost = repair(
+                curr_solution, explored_solution_cost, deleted_cities, self.distance_matrix,
+                time_budget=deadline.remaining(), **repair_config
             )
-            explored_solution_cost = RepairMethods.two_opt(
-                explored_solution, explored_solution_cost, self.distance_matrix
+            if profiler is not None:
+                stamp = profiler.lap("repair", stamp)
+            explored_solution_cost = self.local_search(
+                curr_solution, explored_solution_cost, self.distance_matrix, self.candidates,
+                active=touched_cities, time_budget=deadline.remaining()
             )
-            if explored_solution_cost < self.best_solution_cost:
-                self.best_solution = explored_solution.copy()
-                self.best_solution_cost = explored_solution_cost
-
-                # Checkpoint the best solution
-                write_instance_json(self.best_solution, self.output_path)
+            if profiler is not None:
+                stamp = profiler.lap("local_search", stamp)
+            outcome = REJECTED
+            new_best = explored_solution_cost < self.best_solution_cost
+            if new_best:
+                outcome = NEW_BEST
 
             # Solution acceptance:
             delta_cost = explored_solution_cost - curr_solution_cost
-            if delta_cost < 0:
-                curr_solution, curr_solution_cost = explored_solution.copy(), explored_solution_cost
+            accepted = acceptance.accept(curr_solution_cost, explored_solution_cost, self.best_solution_cost)
+            if accepted:
+                outcome = max(outcome, BETTER if delta_cost < 0 else ACCEPTED)
+
+            if accepted:
+                curr_solution_cost = explored_solution_cost
+                self._commit(curr_solution.commit())
+                if new_best:
+                    self._mark_best(explored_solution_cost)
+                    checkpoint_pending = checkpoint is not None
             else:
-                acceptance_prob = math.exp(-delta_cost / T)
-                if random.random() < acceptance_prob:
-                    curr_solution, curr_solution_cost = explored_solution.copy(), explored_solution_cost
+                curr_solution.rollback()
+            if profiler is not None:
+                stamp = profiler.lap("acceptance", stamp)
+
+            # Checkpoint the best solution (the lazy snapshot is materialized only when the writer is due)
+            if checkpoint_pending and checkpoint.due():
+                checkpoint.submit(self.best_solution)
+                checkpoint_pending = False
+                if profiler is not None:
+                    stamp = profiler.lap("checkpoint", stamp)
+
+            self.selector.update(pair, outcome, time.perf_counter() - iteration_start)
+
+            self.iterations += 1
+
+            if self.exchange is not None and self.iterations % self.exchange_interval == 0:
+                replacement = self.exchange(self, curr_solution.order, curr_solution_cost)
+                if replacement is not None:
+                    self._snapshot_best()  # the pending snapshot refers to the replaced tour
+                    curr_solution, curr_solution_cost = Tour(replacement[0], self.city_count), replacement[1]
+                    if self.track_detours:
+                        curr_solution.track_detours(self.distance_matrix)
+                    self._current = curr_solution
+                    if curr_solution_cost < self.best_solution_cost:
+                        self._mark_best(curr_solution_cost)
+                        checkpoint_pending = checkpoint is not None
+                if profiler is not None:
+                    profiler.lap("exchange", stamp)
+
+            deadline.end_iteration()
 
-            T *= self.alpha  # cool the temperature
-            delta_time = time.time() - start_time
+        if lower_bound is not None:
+            lower_bound.stop()
+        if checkpoint is not None:
+            checkpoint.close(self.best_solution, timeout=deadline.until_limit())  # final flush regardless of the rate
 
         assert len(self.best_solution) == len(set(self.best_solution))
 
         LOG.info(f"Best found solution: {self.best_solution}")
         LOG.info(f"Best found solution cost = {self.best_solution_cost}")
+        for stats in self.statistics()["pairs"]:
+            LOG.info(f"Operators {stats['name']}: {stats['calls']} calls, {stats['improvements']} improvements, "
+                     f"{stats['mean_time_ms']:.2f} ms per call, weight {stats['weight']:.3f}")
+        if profiler is not None:
+            LOG.info(f"Profile:\n{self.profile_report()}")
         LOG.info(f"Best found solution cost trivial count = {RepairMethods.count_cost_trivial(self.best_solution, self.distance_matrix)}")
@@ -0,0 +1,518 @@
+from typing import List, Optional, Iterable, Tuple, Callable, Sequence
+from collections import deque
+import time
+
+from candidates import CandidateIndex
+from tour import Tour
+
+
+EPSILON = 1e-9  # minimal improvement accepted as a move (guards against float noise)
+
+# (solution, solution cost, distance matrix, candidates, active, max moves, time budget) -> new cost
+LocalSearchMethod = Callable[..., float]
+
+
+class LocalSearch:
+    @staticmethod
+    def count_cost_after_segment_move(solution_cost: float, segment: Tuple[int, int, int, int],
+                                      edge: Tuple[int, int], reverse: bool,
+                                      distance_matrix: List[List[float]]) -> float:
+        """
+        This method incrementally computes the new cost of the solution after moving
+        the segment s1..sL (with the predecessor p and the successor nx, passed as
+        (p, s1, sL, nx)) between the cities of the edge (u, v), optionally reversed.
+        """
+        p, s1, s_l, nx = segment
+        u, v = edge
+
+        cost = solution_cost
+        cost -= distance_matrix[p][s1] + distance_matrix[s_l][nx] + distance_matrix[u][v]
+        cost += distance_matrix[p][nx]
+        if reverse:
+            cost += distance_matrix[u][s_l] + distance_matrix[s1][v]
+        else:
+            cost += distance_matrix[u][s1] + distance_matrix[s_l][v]
+
+        return cost
+
+
+    @staticmethod
+    def segment_move(tour: Tour, segment: Tuple[int, int, int, int], edge: Tuple[int, int], reverse: bool) -> None:
+        """
+        This method moves the segment (p, s1, sL, nx) between the cities of the tour
+        edge (u, v), where v follows u. The move is carried out as a sequence of 2-opt
+        moves, each of them reversing the shorter side of the tour.
+        The edge must not touch the segment and must differ from (pred(p), p) and (nx, succ(nx)).
+        """
+        p, s1, s_l, nx = segment
+        u, v = edge
+
+        tour.two_opt_move(p, s1, u, v)   # p u ... nx sL..s1 v
+        tour.two_opt_move(p, u, nx, s_l) # p nx ... u sL..s1 v
+        if not reverse and s1 != s_l:
+            tour.two_opt_move(u, s_l, s1, v)  # p nx ... u s1..sL v
+
+
+    @staticmethod
+    def two_opt(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        candidates: CandidateIndex,
+        active: Optional[Iterable[int]] = None,
+        max_moves: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> float:
+        """
+        This method runs 2-opt until a local optimum is reached (or the budget runs out).
+        Only the moves adding an edge between a city and one of its candidate neighbors
+        are examined and the first improving move is applied immediately.
+        Don't-look bits: only the cities in the queue are examined, a city is put back
+        to the queue when one of its tour edges changes. By default all cities start
+        in the queue, the argument active restricts it (e.g. to the cities touched by repair).
+
+        Returns: The updated solution cost.
+        Note: The solution is modified in-place.
+        """
+        n = len(solution)
+        if n < 4:
+            return solution_cost
+
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        moves = 0
+
+        tour = Tour.wrap(solution, len(distance_matrix))
+        order, pos = tour.order, tour.pos
+
+        queue = deque(solution if active is None else active)
+        queued = [False] * len(distance_matrix)
+        for city in queue:
+            queued[city] = True
+
+        while queue:
+            if max_moves is not None and moves >= max_moves:
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+            a = queue.popleft()
+            queued[a] = False
+            row_a = distance_matrix[a]
+            improved = False
+
+            for forward in (True, False):
+                i_a = pos[a]
+                b = order[(i_a + 1) % n] if forward else order[i_a - 1]
+                d_ab = row_a[b]
+
+                for c in candidates.neighbors[a]:
+                    d_ac = row_a[c]
+                    if d_ac >= d_ab:
+                        break  # the neighbors are sorted, no further gain is possible
+
+                    i_c = pos[c]
+                    d = order[(i_c + 1) % n] if forward else order[i_c - 1]
+                    if c == b or d == a:
+                        continue
+
+                    delta = d_ac + distance_matrix[b][d] - d_ab - distance_matrix[c][d]
+                    if delta < -EPSILON:
+                        if forward:
+                            tour.reverse((i_a + 1) % n, i_c)
+                        else:
+                            tour.reverse(i_c, (i_a - 1) % n)
+                        solution_cost += delta
+                        moves += 1
+
+                        for city in (a, b, c, d):
+                            if not queued[city]:
+                                queued[city] = True
+                                queue.append(city)
+                        improved = True
+                        break
+
+                if improved:
+                    break
+
+        return solution_cost
+
+
+    @staticmethod
+    def _segment_search(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        candidates: CandidateIndex,
+        min_segment_length: int,
+        max_segment_length: int,
+        active: Optional[Iterable[int]],
+        max_moves: Optional[int],
+        time_budget: Optional[float]
+    ) -> float:
+        """
+        Shared engine of the segment moves: the segments of the given lengths starting
+        or ending in the examined city are moved next to one of the city's candidate
+        neighbors (in both orientations). First improvement and don't-look bits are
+        used as in 2-opt.
+        """
+        n = len(solution)
+        max_segment_length = min(max_segment_length, n - 3)
+        if max_segment_length < min_segment_length:
+            return solution_cost
+
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        moves = 0
+
+        tour = Tour.wrap(solution, len(distance_matrix))
+        order, pos = tour.order, tour.pos
+
+        queue = deque(solution if active is None else active)
+        queued = [False] * len(distance_matrix)
+        for city in queue:
+            queued[city] = True
+
+        while queue:
+            if max_moves is not None and moves >= max_moves:
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+            a = queue.popleft()
+            queued[a] = False
+            row_a = distance_matrix[a]
+            best_move = None
+
+            for length in range(min_segment_length, max_segment_length + 1):
+                i_a = pos[a]
+                for i_s1 in ((i_a, i_a - length + 1) if length > 1 else (i_a,)):
+                    s1 = order[i_s1 % n]
+                    s_l = order[(i_s1 + length - 1) % n]
+                    p = order[(i_s1 - 1) % n]
+                    nx = order[(i_s1 + length) % n]
+                    removal_gain = distance_matrix[p][s1] + distance_matrix[s_l][nx] - distance_matrix[p][nx]
+
+                    for c in candidates.neighbors[a]:
+                        if row_a[c] >= removal_gain:
+                            break
+                        i_c = pos[c]
+                        if (i_c - i_s1) % n < length:
+                            continue  # the neighbor lies in the segment
+
+                        for u, v in ((c, order[(i_c + 1) % n]), (order[i_c - 1], c)):
+                            if u in (nx, s_l) or v in (p, s1):
+                                continue  # the edge touches the segment or its old position
+                            segment = (p, s1, s_l, nx)
+                            for reverse in ((False, True) if length > 1 else (False,)):
+                                new_cost = LocalSearch.count_cost_after_segment_move(
+                                    solution_cost, segment, (u, v), reverse, distance_matrix
+                                )
+                                if new_cost < solution_cost - EPSILON:
+                                    best_move = (segment, (u, v), reverse, new_cost)
+                                    break
+                            if best_move:
+                                break
+                        if best_move:
+                            break
+                    if best_move:
+                        break
+                if best_move:
+                    break
+
+            if best_move:
+                segment, edge, reverse, solution_cost = best_move
+                LocalSearch.segment_move(tour, segment, edge, reverse)
+                moves += 1
+
+                for city in segment + edge:
+                    if not queued[city]:
+                        queued[city] = True
+                        queue.append(city)
+
+        return solution_cost
+
+
+    @staticmethod
+    def or_opt(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        candidates: CandidateIndex,
+        active: Optional[Iterable[int]] = None,
+        max_moves: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> float:
+        """
+        Or-opt: this method moves segments of 1-3 consecutive cities (possibly reversed)
+        next to one of the candidate neighbors of their end city, until a local optimum is reached.
+
+        Returns: The updated solution cost.
+        Note: The solution is modified in-place.
+        """
+        return LocalSearch._segment_search(solution, solution_cost, distance_matrix, candidates,
+                                           1, 3, active, max_moves, time_budget)
+
+
+    @staticmethod
+    def segment_insertion(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        candidates: CandidateIndex,
+        active: Optional[Iterable[int]] = None,
+        max_moves: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        max_segment_length: int = 10
+    ) -> float:
+        """
+        Segment-insertion 3-opt: the same move as Or-opt, but for longer segments
+        (4 up to max_segment_length cities), which covers the 3-opt moves that keep
+        the orientation of the rest of the tour.
+
+        Returns: The updated solution cost.
+        Note: The solution is modified in-place.
+        """
+        return LocalSearch._segment_search(solution, solution_cost, distance_matrix, candidates,
+                                           4, max_segment_length, active, max_moves, time_budget)
+
+
+    @staticmethod
+    def two_h_opt(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        candidates: CandidateIndex,
+        active: Optional[Iterable[int]] = None,
+        max_moves: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> float:
+        """
+        2h-opt: for the tour edge (a, b) and a candidate neighbor c of a, both the 2-opt
+        move adding the edge (a, c) and the insertion of c between a and b are evaluated,
+        and the better one is applied if it improves the solution.
+
+        Returns: The updated solution cost.
+        Note: The solution is modified in-place.
+        """
+        n = len(solution)
+        if n < 5:
+            return solution_cost
+
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        moves = 0
+
+        tour = Tour.wrap(solution, len(distance_matrix))
+        order, pos = tour.order, tour.pos
+
+        queue = deque(solution if active is None else active)
+        queued = [False] * len(distance_matrix)
+        for city in queue:
+            queued[city] = True
+
+        while queue:
+            if max_moves is not None and moves >= max_moves:
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+            a = queue.popleft()
+            queued[a] = False
+            row_a = distance_matrix[a]
+            touched: Sequence[int] = ()
+
+            for forward in (True, False):
+                i_a = pos[a]
+                b = order[(i_a + 1) % n] if forward else order[i_a - 1]
+                d_ab = row_a[b]
+
+                for c in candidates.neighbors[a]:
+                    d_ac = row_a[c]
+                    if d_ac >= d_ab:
+                        break
+                    if c == b:
+                        continue
+
+                    i_c = pos[c]
+                    d = order[(i_c + 1) % n] if forward else order[i_c - 1]
+                    e = order[i_c - 1] if forward else order[(i_c + 1) % n]  # the other neighbor of c
+
+                    two_opt_delta = (d_ac + distance_matrix[b][d] - d_ab - distance_matrix[c][d]
+                                     if d != a else 0.0)
+                    insertion_delta = (d_ac + distance_matrix[c][b] + distance_matrix[e][d] - d_ab
+                                       - distance_matrix[e][c] - distance_matrix[c][d]
+                                       if a not in (d, e) and b != e else 0.0)
+
+                    if min(two_opt_delta, insertion_delta) < -EPSILON:
+                        if two_opt_delta <= insertion_delta:
+                            tour.two_opt_move(a, b, c, d)
+                            solution_cost += two_opt_delta
+                        else:
+                            u, v = (a, b) if forward else (b, a)
+                            segment = (e, c, c, d) if forward else (d, c, c, e)
+                            LocalSearch.segment_move(tour, segment, (u, v), False)
+                            solution_cost += insertion_delta
+                        touched = (a, b, c, d, e)
+                        break
+
+                if touched:
+                    break
+
+            if touched:
+                moves += 1
+                for city in touched:
+                    if not queued[city]:
+                        queued[city] = True
+                        queue.append(city)
+
+        return solution_cost
+
+
+    @staticmethod
+    def vnd(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        candidates: CandidateIndex,
+        active: Optional[Iterable[int]] = None,
+        max_moves: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        operators: Optional[Sequence[LocalSearchMethod]] = None
+    ) -> float:
+        """
+        Variable neighborhood descent: the operators are applied in the given order,
+        every time one of them improves the solution the descent starts over from the first one.
+        The result is a local optimum with respect to all of the operators.
+
+        Returns: The updated solution cost.
+        Note: The solution is modified in-place.
+        """
+        if operators is None:
+            operators = (LocalSearch.two_opt, LocalSearch.or_opt, LocalSearch.segment_insertion)
+
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        active_cities = list(active) if active is not None else None
+
+        k = 0
+        while k < len(operators):
+            remaining = deadline - time.perf_counter() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+
+            new_cost = operators[k](solution, solution_cost, distance_matrix, candidates,
+                                    active=active_cities, max_moves=max_moves, time_budget=remaining)
+            if new_cost < solution_cost - EPSILON:
+                solution_cost = new_cost
+                active_cities = None  # the improvement may have opened moves anywhere in the tour
+                k = 0
+            else:
+                solution_cost = new_cost
+                k += 1
+
+        return solution_cost
+
+
+    @staticmethod
+    def lin_kernighan(
+        solution: List[int],
+        solution_cost: float,
+        distance_matrix: List[List[float]],
+        candidates: CandidateIndex,
+        active: Optional[Iterable[int]] = None,
+        max_moves: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        max_depth: int = 6,
+        breadth: Sequence[int] = (5, 3, 1)
+    ) -> float:
+        """
+        Lin-Kernighan style variable-depth search built from sequential 2-opt moves.
+        Starting with the removed tour edge (t1, t2), where t2 is the examined city
+        and t1 one of its tour neighbors, the edge (t2, t3) to one of the nearest neighbors
+        of t2 is added and (t3, t4) is removed, so that closing the tour by (t4, t1) is
+        a 2-opt move. If the closed tour is not better, the chain continues from t4 as long
+        as the partial gain stays positive (up to max_depth steps).
+        The argument breadth limits the number of t3 alternatives tried at each level
+        (the last value is used for all deeper levels), the chain is undone if it fails.
+
+        Returns: The updated solution cost.
+        Note: The solution is modified in-place.
+        """
+        n = len(solution)
+        if n < 5:
+            return solution_cost
+
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        moves = 0
+
+        tour = Tour.wrap(solution, len(distance_matrix))
+        order, pos = tour.order, tour.pos
+
+        queue = deque(solution if active is None else active)
+        queued = [False] * len(distance_matrix)
+        for city in queue:
+            queued[city] = True
+
+        def neighbor(city: int, forward: bool) -> int:
+            i = pos[city]
+            return order[(i + 1) % n] if forward else order[i - 1]
+
+        def step(t1: int, t2: int, gain: float, depth: int, touched: List[int]) -> float:
+            """
+            Extends the chain by one 2-opt move, returns the gain of the improved tour
+            or 0 if no improving closed tour was found (in that case the tour is restored).
+            """
+            forward = neighbor(t1, True) == t2
+            row_t2 = distance_matrix[t2]
+            choices: List[Tuple[float, int, int]] = []
+
+            for t3 in candidates.neighbors[t2]:
+                open_gain = gain - row_t2[t3]
+                if open_gain <= EPSILON:
+                    break  # the neighbors are sorted, the gain criterion fails for the rest
+                if t3 in touched or t3 == neighbor(t2, True) or t3 == neighbor(t2, False):
+                    continue
+                t4 = neighbor(t3, not forward)
+                if t4 in touched:
+                    continue
+                choices.append((distance_matrix[t3][t4] - row_t2[t3], t3, t4))
+
+            choices.sort(reverse=True)
+            for _, t3, t4 in choices[:breadth[min(depth, len(breadth) - 1)]]:
+                tour.two_opt_move(t2, t1, t3, t4)
+                touched.extend((t3, t4))
+
+                closed_gain = gain - row_t2[t3] + distance_matrix[t3][t4] - distance_matrix[t4][t1]
+                if closed_gain > EPSILON:
+                    return closed_gain
+                if depth + 1 < max_depth:
+                    deeper_gain = step(t1, t4, closed_gain + distance_matrix[t4][t1], depth + 1, touched)
+                    if deeper_gain > EPSILON:
+                        return deeper_gain
+
+                del touched[-2:]
+                tour.two_opt_move(t2, t3, t1, t4)  # undo the move
+
+            return 0.0
+
+        while queue:
+            if max_moves is not None and moves >= max_moves:
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+            t2 = queue.popleft()
+            queued[t2] = False
+
+            for t1_forward in (True, False):
+                t1 = neighbor(t2, t1_forward)
+                touched = [t1, t2]
+                gain = step(t1, t2, distance_matrix[t1][t2], 0, touched)
+
+                if gain > EPSILON:
+                    solution_cost -= gain
+                    moves += 1
+                    for city in touched:
+                        if not queued[city]:
+                            queued[city] = True
+                            queue.append(city)
+                    break
+
+        return solution_cost
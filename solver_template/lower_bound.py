@@ -0,0 +1,171 @@
+from typing import List, Tuple, Optional, Callable, Any
+import math
+import multiprocessing
+import time
+
+
+EPSILON = 1e-6
+
+
+def one_tree(distance_matrix: List[List[float]], pi: List[float]) -> Tuple[float, List[int]]:
+    """
+    Minimum 1-tree under the penalized distances d(i, j) + pi[i] + pi[j]: the minimum spanning
+    tree of the cities 1..n-1 (Prim's algorithm) plus the two shortest edges of the city 0.
+
+    Returns: A tuple (lower bound on the tour length, i.e. the 1-tree length minus 2 * sum(pi),
+    degrees of the cities in the 1-tree).
+    """
+    n = len(distance_matrix)
+    degrees = [0] * n
+    length = 0.0
+
+    distance_to_tree = [math.inf] * n
+    parent = [-1] * n
+    remaining = list(range(2, n))
+    city = 1
+    while remaining:
+        row, pi_city = distance_matrix[city], pi[city]
+        nearest_index = 0
+        for i, other in enumerate(remaining):
+            d = row[other] + pi_city + pi[other]
+            if d < distance_to_tree[other]:
+                distance_to_tree[other] = d
+                parent[other] = city
+            if distance_to_tree[other] < distance_to_tree[remaining[nearest_index]]:
+                nearest_index = i
+
+        city = remaining[nearest_index]
+        remaining[nearest_index] = remaining[-1]
+        remaining.pop()
+        length += distance_to_tree[city]
+        degrees[city] += 1
+        degrees[parent[city]] += 1
+
+    row = distance_matrix[0]
+    first, second = sorted(range(1, n), key=lambda other: row[other] + pi[other])[:2]
+    for other in (first, second):
+        length += row[other] + pi[0] + pi[other]
+        degrees[other] += 1
+    degrees[0] = 2
+
+    return length - 2 * sum(pi), degrees
+
+
+def one_tree_bound(distance_matrix: List[List[float]], upper_bound: float, iterations: int = 200,
+                   time_limit: Optional[float] = None,
+                   publish: Optional[Callable[[float], None]] = None) -> Tuple[float, List[float]]:
+    """
+    Held-Karp lower bound: subgradient optimization of the penalties pi, the penalty of
+    a city grows if its degree in the 1-tree is above 2 and shrinks if it is below 2
+    (Polyak step towards the upper bound, halved whenever the bound stalls).
+    Each improvement of the bound is passed to publish.
+
+    Returns: A tuple (the best lower bound, the penalties attaining it).
+    """
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    n = len(distance_matrix)
+    pi = [0.0] * n
+    best_bound, best_pi = -math.inf, pi.copy()
+    step_scale = 2.0
+    stalled = 0
+
+    for _ in range(iterations):
+        bound, degrees = one_tree(distance_matrix, pi)
+        if bound > best_bound + EPSILON:
+            best_bound, best_pi = bound, pi.copy()
+            stalled = 0
+            if publish is not None:
+                publish(best_bound)
+        else:
+            stalled += 1
+            if stalled >= 10:
+                step_scale /= 2
+                stalled = 0
+
+        norm = sum((degree - 2) ** 2 for degree in degrees)
+        if norm == 0 or step_scale < 1e-6 or best_bound >= upper_bound - EPSILON:
+            break  # the 1-tree is a tour (the bound is tight) or no more progress
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+
+        step = step_scale * (upper_bound - bound) / norm
+        pi = [p + step * (degree - 2) for p, degree in zip(pi, degrees)]
+
+    return best_bound, best_pi
+
+
+
+def integral_distances(distance_matrix: List[List[float]]) -> bool:
+    """
+    Returns: True if all distances are integers (then so is the length of every tour
+    and a lower bound can be rounded up).
+    """
+    if getattr(distance_matrix, "rounded", False):
+        return True
+
+    return all(float(d).is_integer() for row in distance_matrix for d in row)
+
+
+def _compute_bound(distance_matrix: List[List[float]], upper_bound: float, iterations: int,
+                   time_limit: Optional[float], value: Any) -> None:
+    integral = integral_distances(distance_matrix)
+
+    def publish(bound: float) -> None:
+        value.value = math.ceil(bound - EPSILON) if integral else bound
+
+    one_tree_bound(distance_matrix, upper_bound, iterations, time_limit, publish)
+
+
+class LowerBound:
+    """
+    Held-Karp lower bound on the tour length, computed on the side in a separate process.
+    Every improvement of the bound is published to shared memory, so the solver can read
+    the current bound at any time (e.g. to stop when its best tour reaches the bound
+    or to report the optimality gap).
+    """
+    def __init__(self, distance_matrix: List[List[float]], upper_bound: float,
+                 time_limit: Optional[float] = None, iterations: int = 200):
+        self.distance_matrix = distance_matrix
+        self.upper_bound = upper_bound  # cost of a known tour, the target of the subgradient steps
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.process: Any = None
+        self._value: Any = None
+
+    def start(self) -> None:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        self._value = context.Value('d', -math.inf, lock=False)  # a single double is written atomically
+        self.process = context.Process(
+            target=_compute_bound,
+            args=(self.distance_matrix, self.upper_bound, self.iterations, self.time_limit, self._value),
+            daemon=True
+        )
+        self.process.start()
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    def value(self) -> float:
+        """
+        Returns: The best bound published so far (-inf before the first one).
+        """
+        return self._value.value if self._value is not None else -math.inf
+
+    def gap(self, cost: float) -> Optional[float]:
+        """
+        Returns: The relative gap (cost - bound) / bound of the tour, None if there is no bound yet.
+        """
+        bound = self.value()
+        if not bound > 0:
+            return None
+
+        return max(cost - bound, 0.0) / bound
+
+    def reached(self, cost: float, epsilon: float = EPSILON) -> bool:
+        """
+        Returns: True if the tour of the given cost is proven optimal by the bound.
+        """
+        return cost <= self.value() + epsilon
@@ -1,20 +1,106 @@
+import time
+START_TIME = time.perf_counter()  # the Timeout of the instance counts from the start of the process
+
 import sys
+import argparse
 from lns_solver import LNSSolver
+from local_search import LocalSearch
+from instance_cache import load_instance
+from distance_matrix import solver_matrix
+from parallel_solver import ParallelLNSSolver
+from island_solver import IslandLNSSolver, TOPOLOGIES, MIGRATION_POLICIES
+from exact import ExactSolver, EXACT_MAX_CITIES
+from profiling import PhaseProfiler, PROFILE_MODES, profile_mode, capture
+from acceptance import ACCEPTANCE_CRITERIA, DEFAULT_ACCEPTANCE
+from solution_cache import SolutionCache, warm_start
+from initial_solutions import InitialSolutions
+import backend
 
-from utils import read_instance_json, write_instance_json
+from utils import write_instance_json
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
+    parser = argparse.ArgumentParser(usage="python3 main.py <instance-file-path> <solution-file-path> [options]")
+    parser.add_argument("instance_path")
+    parser.add_argument("output_path")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of parallel LNS workers (processes), 1 runs a single search")
+    parser.add_argument("--islands", type=int, default=0,
+                        help="number of islands (processes) of the island model, overrides --workers")
+    parser.add_argument("--topology", choices=sorted(TOPOLOGIES), default="ring", help="migration topology of the islands")
+    parser.add_argument("--migration", choices=sorted(MIGRATION_POLICIES), default="current",
+                        help="migration policy of the islands")
+    parser.add_argument("--acceptance", choices=sorted(ACCEPTANCE_CRITERIA), default=DEFAULT_ACCEPTANCE,
+                        help="acceptance criterion of the LNS (cooled by the wall-clock time)")
+    parser.add_argument("--lower-bound", action="store_true",
+                        help="compute the Held-Karp bound in a subprocess and stop the single search when it is reached")
+    parser.add_argument("--seed", type=int, default=None, help="random seed (of the first worker)")
+    parser.add_argument("--stats", default=None,
+                        help="write the destroy/repair operator statistics (JSON) to this path (single search only)")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                        help="per-phase timing report (counters), optionally under cProfile or tracemalloc "
+                             "(also set by the TSP_PROFILE environment variable)")
+    parser.add_argument("--backend", choices=backend.BACKENDS, default=None,
+                        help="batched delta evaluations (numpy if installed by default, also set by TSP_BACKEND)")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="DIRECTORY",
+                        help="warm start from the best tour of the instance found by the previous runs and update it, "
+                             "optionally in this directory (TSP_SOLUTION_CACHE or ~/.cache/tsp_solutions by default)")
+    parser.add_argument("--profile-output", default=None, help="dump the cProfile statistics to this path")
+
+    if len(sys.argv) < 3:
         print("Usage: python3 main.py <instance-file-path> <solution-file-path>")
         sys.exit(1)
 
-    instance_path = sys.argv[1]
-    output_path = sys.argv[2]
+    args = parser.parse_args()
+    profiling = profile_mode(args.profile)
+    acceptance = ACCEPTANCE_CRITERIA[args.acceptance]()
+    backend.select_backend(args.backend)
+
+    # compiled binary form of the instance is cached, Matrix is a compact DistanceMatrix,
+    # the solver gets its materialized rows (see solver_matrix)
+    instance = load_instance(args.instance_path)
+    matrix = solver_matrix(instance["Matrix"])
+    cache = SolutionCache(args.cache or None) if args.cache is not None else None
+    cached = cache.load(instance["Hash"], len(matrix)) if cache is not None else None
+
+    if len(matrix) <= EXACT_MAX_CITIES:
+        # small instances are solved to optimality (Held-Karp or branch and bound)
+        LNS_solver = ExactSolver(matrix, instance['Timeout'], args.output_path)
+    elif args.islands > 0:
+        LNS_solver = IslandLNSSolver(matrix, instance['Timeout'], args.output_path,
+                                     island_count=args.islands, seed=args.seed or 0,
+                                     coordinates=instance.get("Coordinates"),
+                                     topology=TOPOLOGIES[args.topology](),
+                                     policy=MIGRATION_POLICIES[args.migration](), acceptance=acceptance)
+    elif args.workers > 1:
+        LNS_solver = ParallelLNSSolver(matrix, instance['Timeout'], args.output_path,
+                                       worker_count=args.workers, seed=args.seed or 0,
+                                       coordinates=instance.get("Coordinates"),
+                                       local_search=LocalSearch.lin_kernighan, acceptance=acceptance)
+    else:
+        LNS_solver = LNSSolver(matrix, instance['Timeout'], args.output_path,
+                               coordinates=instance.get("Coordinates"),
+                               local_search=LocalSearch.lin_kernighan, seed=args.seed, lower_bound=args.lower_bound,
+                               profiler=PhaseProfiler() if profiling else None, acceptance=acceptance,
+                               init_method=warm_start(cached["Tour"]) if cached else InitialSolutions.greedy)
+        if cached and cached.get("Statistics"):
+            LNS_solver.selector.warm_start(cached["Statistics"])
+    # the loading of the instance and the setup of the solver (candidate lists, grid) count against the Timeout
+    LNS_solver.time_limit = max(instance['Timeout'] - (time.perf_counter() - START_TIME), 0.0)
+    with capture(profiling, args.profile_output):
+        LNS_solver.solve()
+
+    if profiling and isinstance(LNS_solver, LNSSolver):
+        print(LNS_solver.profile_report(), file=sys.stderr)
 
-    instance = read_instance_json(instance_path)
+    if args.stats and isinstance(LNS_solver, LNSSolver):
+        LNS_solver.selector.write_statistics(args.stats)
 
-    LNS_solver: LNSSolver = LNSSolver(instance["Matrix"], instance['Timeout'], output_path)
-    LNS_solver.solve()
+    best_solution = LNS_solver.best_solution
+    if cached and cached["Cost"] < LNS_solver.best_solution_cost:
+        best_solution = cached["Tour"]  # a previous run found a better tour (e.g. with another solver)
+    write_instance_json(best_solution, args.output_path)
 
-    write_instance_json(LNS_solver.best_solution, output_path)
+    if cache is not None:
+        statistics = LNS_solver.statistics() if isinstance(LNS_solver, LNSSolver) else None
+        cache.store(instance["Hash"], LNS_solver.best_solution, LNS_solver.best_solution_cost, statistics)
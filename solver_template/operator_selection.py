@@ -0,0 +1,172 @@
+from typing import List, Tuple, Dict, Any, Callable
+import json
+import random
+
+
+# outcomes of an LNS iteration, reported back to the selector
+REJECTED = 0
+ACCEPTED = 1  # a worse solution accepted by the acceptance criterion
+BETTER = 2  # better than the current solution
+NEW_BEST = 3  # new best solution
+
+# Ropke & Pisinger: a new best is rewarded the most, accepting a worse solution more than
+# an improvement of the current one (it diversifies the search)
+DEFAULT_SCORES = {REJECTED: 0.0, ACCEPTED: 13.0, BETTER: 9.0, NEW_BEST: 33.0}
+
+# list of (destroy or repair method, initial weight, keyword arguments of the method)
+OperatorMix = List[Tuple[Callable[..., Any], float, Dict[str, Any]]]
+
+
+class _OperatorStats:
+    __slots__ = ('calls', 'improvements', 'new_bests', 'time', 'segment_score', 'segment_time', 'segment_calls')
+
+    def __init__(self):
+        self.calls = 0
+        self.improvements = 0
+        self.new_bests = 0
+        self.time = 0.0
+        self.segment_score = 0.0
+        self.segment_time = 0.0
+        self.segment_calls = 0
+
+    def record(self, outcome: int, score: float, elapsed: float) -> None:
+        self.calls += 1
+        self.improvements += outcome >= BETTER
+        self.new_bests += outcome == NEW_BEST
+        self.time += elapsed
+        self.segment_score += score
+        self.segment_time += elapsed
+        self.segment_calls += 1
+
+    def export(self, name: str) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "calls": self.calls,
+            "improvements": self.improvements,
+            "new_bests": self.new_bests,
+            "total_time": self.time,
+            "mean_time_ms": 1000 * self.time / self.calls if self.calls else 0.0,
+        }
+
+
+class AdaptiveOperatorSelector:
+    """
+    Adaptive large neighborhood search scheduler.
+
+    The selection units are the (destroy, repair) pairs, drawn by the roulette wheel over
+    their weights. Each iteration the pair collects the score of the outcome; after every
+    segment of segment_length iterations the weights are updated as
+        w = (1 - reaction) * w + reaction * (segment score / segment time),
+    so the pairs yielding improvements per millisecond get the CPU time. Pairs that were
+    not used in the segment keep their weight, min_weight prevents starvation.
+
+    The measured time depends on the load of the machine, so with time_scoring off the segment
+    score is divided by the number of calls instead and the selection is reproducible for a seed.
+    """
+    def __init__(self, destroy_methods: OperatorMix, repair_methods: OperatorMix,
+                 segment_length: int = 50, reaction: float = 0.2, min_weight: float = 0.01,
+                 scores: Dict[int, float] = DEFAULT_SCORES, time_scoring: bool = True):
+        self.destroy_methods = destroy_methods
+        self.repair_methods = repair_methods
+        self.segment_length = segment_length
+        self.reaction = reaction
+        self.min_weight = min_weight
+        self.scores = scores
+        self.time_scoring = time_scoring  # score per millisecond of the pair, per call otherwise
+
+        self.pairs = [(d, r) for d in range(len(destroy_methods)) for r in range(len(repair_methods))]
+        self.weights = [destroy_methods[d][1] * repair_methods[r][1] for d, r in self.pairs]
+        self.pair_stats = [_OperatorStats() for _ in self.pairs]
+        self.destroy_stats = [_OperatorStats() for _ in destroy_methods]
+        self.repair_stats = [_OperatorStats() for _ in repair_methods]
+        self.iterations = 0
+
+    def select(self) -> int:
+        """
+        Returns: Index of the selected (destroy, repair) pair.
+        """
+        if len(self.pairs) == 1:
+            return 0
+
+        return random.choices(range(len(self.pairs)), weights=self.weights)[0]
+
+    def operators(self, pair: int) -> Tuple[Callable[..., Any], Dict[str, Any], Callable[..., Any], Dict[str, Any]]:
+        """
+        Returns: A tuple (destroy method, its config, repair method, its config) of the pair.
+        """
+        d, r = self.pairs[pair]
+        destroy, _, destroy_config = self.destroy_methods[d]
+        repair, _, repair_config = self.repair_methods[r]
+
+        return destroy, destroy_config, repair, repair_config
+
+    def update(self, pair: int, outcome: int, elapsed: float) -> None:
+        """
+        Records the outcome and the duration (in seconds) of the iteration that used the pair.
+        """
+        d, r = self.pairs[pair]
+        score = self.scores[outcome]
+        for stats in (self.pair_stats[pair], self.destroy_stats[d], self.repair_stats[r]):
+            stats.record(outcome, score, elapsed)
+
+        self.iterations += 1
+        if self.iterations % self.segment_length == 0:
+            self._update_weights()
+
+    def _update_weights(self) -> None:
+        rates = [
+            (stats.segment_score / max(1000 * stats.segment_time, 1e-3) if self.time_scoring
+             else stats.segment_score / stats.segment_calls) if stats.segment_calls else None
+            for stats in self.pair_stats
+        ]
+        max_rate = max((rate for rate in rates if rate is not None), default=0.0)
+
+        for i, rate in enumerate(rates):
+            if rate is not None:
+                # rates are normalized to [0, 1] so the weights stay comparable to the initial ones
+                relative = rate / max_rate if max_rate > 0 else 0.0
+                self.weights[i] = max((1 - self.reaction) * self.weights[i] + self.reaction * relative,
+                                      self.min_weight)
+
+        for stats in self.pair_stats + self.destroy_stats + self.repair_stats:
+            stats.segment_score = stats.segment_time = 0.0
+            stats.segment_calls = 0
+
+    def statistics(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Returns: Per-operator statistics (calls, improvements, new bests, total and mean time),
+        for the destroy methods, the repair methods and the pairs with their final weights.
+        """
+        pairs = []
+        for i, (d, r) in enumerate(self.pairs):
+            name = f"{self.destroy_methods[d][0].__name__}+{self.repair_methods[r][0].__name__}"
+            pairs.append(dict(self.pair_stats[i].export(name), weight=self.weights[i]))
+
+        return {
+            "destroy": [stats.export(method.__name__)
+                        for stats, (method, _, _) in zip(self.destroy_stats, self.destroy_methods)],
+            "repair": [stats.export(method.__name__)
+                       for stats, (method, _, _) in zip(self.repair_stats, self.repair_methods)],
+            "pairs": pairs,
+        }
+
+    def warm_start(self, statistics: Dict[str, List[Dict[str, Any]]]) -> int:
+        """
+        This method sets the weights of the pairs to their final weights in the statistics of
+        a previous run (see statistics()), matched by the names of the pairs.
+
+        Returns: The number of the pairs whose weight was set.
+        """
+        weights = {pair["name"]: pair["weight"] for pair in statistics.get("pairs", []) if "weight" in pair}
+        matched = 0
+        for i, (d, r) in enumerate(self.pairs):
+            name = f"{self.destroy_methods[d][0].__name__}+{self.repair_methods[r][0].__name__}"
+            if name in weights:
+                self.weights[i] = max(float(weights[name]), self.min_weight)
+                matched += 1
+
+        return matched
+
+    def write_statistics(self, file_path: str) -> None:
+        with open(file_path, 'w') as f:
+            json.dump(self.statistics(), f, indent=4)
@@ -1,10 +1,15 @@
-from typing import List, Callable, Tuple, Dict
+from typing import List, Callable, Tuple, Dict, Any, Optional
 import logging
+import math
 import random
+import time
 
 from initial_solutions import InitialSolutions
 from destroy_methods import DestroyMethods
-from repair_methods import RepairMethods
+from repair_methods import RepairMethods, REGRET_K
+from local_search import LocalSearch, LocalSearchMethod
+from precompute import InstanceData
+from operator_selection import AdaptiveOperatorSelector, REJECTED, BETTER, NEW_BEST
 
 
 # Setup
@@ -40,21 +45,37 @@ RepairMethod = Callable[
 
 
 class Optimizer:
-    def __init__(self, distance_matrix: List[List[float]], verbose: bool=False):
+    def __init__(self, distance_matrix: List[List[float]], verbose: bool=False, adaptive: bool=True,
+                 coordinates: Optional[List[Tuple[float, float]]]=None):
         if verbose:
             LOG.info("Optimizer initialized!")
 
         self.verbose = verbose
+        self.adaptive = adaptive
         self.distance_matrix = distance_matrix
         self.city_count = len(distance_matrix[0])
         self.steps_not_improved = 0
         self.cost: List[float] = []
+        self.instance = InstanceData.of(distance_matrix, coordinates)  # shared with the other solvers of the matrix
         self.distance_quantile = self._compute_distance_qunatile()
+        self.candidates = self.instance.candidates()
 
         self.init_methods: List[InitialMethod] = [
             InitialSolutions.random,
             InitialSolutions.greedy
         ]
+        # constructors tried by initial() within the time budget, from the cheapest one:
+        # (method, keyword arguments, expected number of operations for n cities)
+        self.construction_methods: List[Tuple[InitialMethod, Dict[str, Any], Callable[[int], float]]] = [
+            (InitialSolutions.greedy_edge, {"candidates": self.candidates}, lambda n: 10 * n * math.log2(10 * n + 1)),
+            (InitialSolutions.greedy, {}, lambda n: n * n),
+            (InitialSolutions.mst_double_tree, {}, lambda n: n * n),
+        ]
+        if coordinates:
+            self.construction_methods.insert(0, (
+                InitialSolutions.space_filling_curve, {"coordinates": coordinates}, lambda n: n * math.log2(n + 1)
+            ))
+        self.init_times: Dict[str, float] = {}  # build time of each constructor tried by initial()
         self.destroy_methods: List[DestroyMethod] = [
             DestroyMethods.random,
             DestroyMethods.n_worst_cases,
@@ -63,8 +84,13 @@ class Optimizer:
         self.repair_methods: List[RepairMethod] = [
             # RepairMethods.random,
             RepairMethods.greedy,
+            RepairMethods.greedy_vnd,
+            RepairMethods.regret,
         ]
         
+        # improvement applied after each repair, e.g. LocalSearch.lin_kernighan
+        self.local_search: LocalSearchMethod = LocalSearch.two_opt
+
         self.current_init_method: int = 1
         self.current_destroy_method: int = 1
         self.current_repair_method: int = 0
@@ -79,6 +105,29 @@ class Optimizer:
                 "alpha": self.distance_quantile
             }
         }
+        self.repair_methods_config: Dict[str, Dict[str, Any]] = {
+            "random": {},
+            "greedy": {
+                "candidates": self.candidates
+            },
+            "greedy_vnd": {
+                "candidates": self.candidates,
+                "operators": [LocalSearch.two_opt, LocalSearch.or_opt, LocalSearch.two_h_opt]
+            },
+            "regret": {
+                "candidates": self.candidates,
+                "k": REGRET_K
+            }
+        }
+
+        # adaptive mode draws the (destroy, repair) pair by the weights of the selector instead of
+        # rotating the methods when the search is stuck, the configs are shared with _tweak_params
+        self.selector = AdaptiveOperatorSelector(
+            [(fn, 1.0, self.destroy_methods_config[fn.__name__]) for fn in self.destroy_methods],
+            [(fn, 1.0, self.repair_methods_config[fn.__name__]) for fn in self.repair_methods]
+        )
+        self.current_pair: Optional[int] = None
+        self.iteration_start = 0.0
 
         init_name = self.init_methods[self.current_init_method].__name__
         destroy_name = self.destroy_methods[self.current_destroy_method].__name__
@@ -88,15 +137,40 @@ class Optimizer:
             LOG.info(f"Default methods: {init_name}, {destroy_name}, {repair_name}. Using 2-opt as well!")
 
     def _compute_distance_qunatile(self, q: float=0.2) -> float:
-        distances = [self.distance_matrix[i][j] for i in range(len(self.distance_matrix)) for j in range(i + 1, len(self.distance_matrix))]
-        distances.sort()
-
-        return distances[int(q * len(distances))]
+        return self.instance.quantile(q)
     
-    def initial(self, city_count: int, distance_matrix: List[List[float]]):
-        fn = self.init_methods[self.current_init_method]
+    def initial(self, city_count: int, distance_matrix: List[List[float]], time_budget: Optional[float]=None):
+        """
+        Without the time budget the current initial method is used. Otherwise the constructors
+        are run from the cheapest one while the predicted build time of the next one (the last
+        build time scaled by the ratio of their expected operation counts) fits in the rest of
+        the budget, and the best tour is returned.
+        """
+        if time_budget is None:
+            fn = self.init_methods[self.current_init_method]
 
-        return fn(city_count, distance_matrix)
+            return fn(city_count, distance_matrix)
+
+        best: Optional[Tuple[List[int], float]] = None
+        spent = 0.0
+        last_time, last_operations = 0.0, 1.0
+
+        for fn, config, operations in self.construction_methods:
+            predicted = last_time * operations(city_count) / last_operations
+            if best is not None and spent + predicted > time_budget:
+                break
+
+            solution, cost, build_time = InitialSolutions.timed(fn, city_count, distance_matrix, **config)
+            self.init_times[fn.__name__] = build_time
+            spent += build_time
+            last_time, last_operations = build_time, operations(city_count)
+
+            if self.verbose:
+                LOG.info(f"Initial solution \"{fn.__name__}\": cost {cost} in {build_time:.3f} s")
+            if best is None or cost < best[1]:
+                best = (solution, cost)
+
+        return best
 
     def _change_destroy_method(self):
         last_destroy_method = self.current_destroy_method
@@ -154,9 +228,13 @@ class Optimizer:
     ):
         # self._check()
 
-        fn = self.destroy_methods[self.current_destroy_method]
-        fn_name = fn.__name__
-        config = self.destroy_methods_config[fn_name]
+        self.iteration_start = time.perf_counter()
+        if self.adaptive:
+            self.current_pair = self.selector.select()
+            fn, config, _, _ = self.selector.operators(self.current_pair)
+        else:
+            fn = self.destroy_methods[self.current_destroy_method]
+            config = self.destroy_methods_config[fn.__name__]
 
         res = fn(solution, solution_cost, distance_matrix, **config)
 
@@ -167,20 +245,33 @@ class Optimizer:
         solution: List[int],
         solution_cost: float,
         deleted_cities: List[int],
-        distance_matrix: List[List[float]]
+        distance_matrix: List[List[float]],
+        time_budget: Optional[float] = None
     ):
-        self._check()
+        if self.adaptive and self.current_pair is not None:
+            _, _, fn, config = self.selector.operators(self.current_pair)
+        else:
+            self._check()
+            fn = self.repair_methods[self.current_repair_method]
+            config = self.repair_methods_config[fn.__name__]
+        touched_cities = deleted_cities.copy()
 
-        fn = self.repair_methods[self.current_repair_method]
+        res = fn(solution, solution_cost, deleted_cities, distance_matrix, time_budget=time_budget, **config)
 
-        res = fn(solution, solution_cost, deleted_cities, distance_matrix)
-
-        res = RepairMethods.two_opt(solution, res, distance_matrix)
+        res = self.local_search(solution, res, distance_matrix, self.candidates,
+                                active=touched_cities, time_budget=time_budget)
 
         return res
 
-    def improved(self):
+    def _report(self, outcome: int):
+        if self.adaptive and self.current_pair is not None:
+            self.selector.update(self.current_pair, outcome, time.perf_counter() - self.iteration_start)
+            self.current_pair = None
+
+    def improved(self, new_best: bool=False):
         self.steps_not_improved = 0
+        self._report(NEW_BEST if new_best else BETTER)
     
     def stuck(self):
         self.steps_not_improved += 1
+        self._report(REJECTED)
@@ -0,0 +1,231 @@
+from typing import List, Tuple, Optional, Any, Dict, Callable
+import logging
+import multiprocessing
+import queue
+import time
+
+from checkpoint import CheckpointWriter
+from acceptance import AcceptanceCriterion
+from lns_solver import LNSSolver
+from initial_solutions import InitialSolutions
+from local_search import LocalSearch, LocalSearchMethod
+
+
+LOG = logging.getLogger(__name__)
+
+FINISH_MARGIN = 0.5  # seconds reserved for collecting the results from the workers
+INBOX_SIZE = 4  # solutions waiting in the inbox of a worker per other worker, newer ones are dropped when full
+
+
+class SharedSolutions:
+    """
+    One slot per worker in shared memory: the cost and the tour of the worker's best solution.
+    """
+    def __init__(self, context: Any, worker_count: int, city_count: int):
+        self.worker_count = worker_count
+        self.city_count = city_count
+        self.costs = context.Array('d', [float('inf')] * worker_count, lock=False)
+        self.tours = context.Array('i', worker_count * city_count, lock=False)
+        self.lock = context.Lock()  # the parent process reads the slots at any time
+
+    def publish(self, worker: int, tour: List[int], cost: float) -> None:
+        offset = worker * self.city_count
+        with self.lock:
+            self.tours[offset:offset + self.city_count] = tour
+            self.costs[worker] = cost
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self.lock:
+            worker, cost = self.elite()
+            return self.tour(worker), cost
+
+    def elite(self) -> Tuple[int, float]:
+        """
+        Returns: A tuple (worker holding the best solution, its cost), ties are broken by the worker index.
+        """
+        costs = list(self.costs)
+        worker = min(range(self.worker_count), key=lambda i: (costs[i], i))
+
+        return worker, costs[worker]
+
+    def tour(self, worker: int) -> List[int]:
+        offset = worker * self.city_count
+        return list(self.tours[offset:offset + self.city_count])
+
+
+class _Exchange:
+    """
+    Exchange hook of a worker, called every exchange_interval iterations. The worker posts
+    its best solution (if it improved since the last post) to the inboxes of the other workers
+    and polls its own inbox, neither blocks: a full inbox drops the post and the worker continues
+    with whatever has arrived, so a fast worker never waits for a slow one.
+    A worker whose best solution is more than restart_gap worse than the best received one
+    restarts from that tour.
+
+    Since the exchange does not synchronize the workers, which solutions a worker receives
+    depends on their relative speed, a run is reproducible per seed only without the exchange
+    (a single worker).
+    """
+    def __init__(self, shared: SharedSolutions, inboxes: List[Any], worker: int, restart_gap: float):
+        self.shared = shared
+        self.inboxes = inboxes
+        self.worker = worker
+        self.restart_gap = restart_gap
+        self.posted_cost = float('inf')
+
+    def __call__(self, solver: LNSSolver, solution: List[int], cost: float) -> Optional[Tuple[List[int], float]]:
+        if solver.best_solution_cost < self.posted_cost:
+            self.posted_cost = solver.best_solution_cost
+            self.shared.publish(self.worker, solver.best_solution, solver.best_solution_cost)
+            for target, inbox in enumerate(self.inboxes):
+                if target != self.worker:
+                    try:
+                        inbox.put_nowait((self.worker, solver.best_solution, solver.best_solution_cost))
+                    except queue.Full:
+                        pass  # the target has not consumed the previous solutions yet
+
+        elite: Optional[Tuple[int, List[int], float]] = None
+        while True:
+            try:
+                received = self.inboxes[self.worker].get_nowait()
+            except queue.Empty:
+                break
+            if elite is None or received[2] < elite[2]:
+                elite = received
+
+        if elite is not None and solver.best_solution_cost > elite[2] * (1 + self.restart_gap):
+            LOG.info(f"Worker {self.worker} restarts from the elite solution of worker {elite[0]}")
+            return elite[1], elite[2]
+
+        return None
+
+    def finish(self) -> None:
+        for inbox in self.inboxes:
+            inbox.cancel_join_thread()  # do not wait for the unconsumed solutions on exit
+
+
+def _run_worker(worker: int, distance_matrix: List[List[float]], time_limit: float, config: Dict[str, Any],
+                inboxes: List[Any], shared: SharedSolutions, results: Any) -> None:
+    start = time.perf_counter()
+    exchange = _Exchange(shared, inboxes, worker, config["restart_gap"])
+    solver = LNSSolver(
+        distance_matrix, time_limit, None,
+        coordinates=config["coordinates"],
+        local_search=config["local_search"],
+        init_method=config["init_methods"][worker % len(config["init_methods"])],
+        seed=config["seed"] + worker,
+        exchange=exchange,
+        exchange_interval=config["exchange_interval"],
+        acceptance=config["acceptance"]
+    )
+    solver.time_limit = max(time_limit - (time.perf_counter() - start), 0.0)  # the setup counts as well
+    solver.solve()
+    exchange.finish()
+
+    shared.publish(worker, solver.best_solution, solver.best_solution_cost)
+    results.put((worker, solver.best_solution, solver.best_solution_cost, solver.iterations))
+
+
+class MultiProcessSolver:
+    """
+    Common driver of the multi-process solvers: runs process_count searches in separate processes,
+    each as target(index, distance matrix, time limit, config, inboxes, shared, results), where
+    the inboxes are per-process queues for the exchange of the solutions, the shared slots hold
+    the best solution of each process and the results queue receives the final ones.
+    The parent process collects the best solutions published in shared memory and checkpoints
+    them from a background thread.
+    """
+    def __init__(self, distance_matrix: List[List[float]], time_limit: float, output_path: Optional[str],
+                 process_count: int, target: Callable[..., None], config: Dict[str, Any]):
+        self.distance_matrix = distance_matrix
+        self.city_count = len(distance_matrix)
+        self.time_limit = time_limit
+        self.output_path = output_path
+        self.process_count = process_count
+        self.target = target
+        self.config = config
+
+        self.best_solution = list(range(self.city_count))
+        self.best_solution_cost = float('inf')
+        self.iterations = 0
+        self.checkpoint: Optional[CheckpointWriter] = None
+
+    def solve(self):
+        start_time = time.time()
+        if not self.city_count > 0:
+            return
+
+        # fork shares the distance matrix with the processes without copying it
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        shared = SharedSolutions(context, self.process_count, self.city_count)
+        inboxes = [context.Queue(maxsize=INBOX_SIZE * self.process_count) for _ in range(self.process_count)]
+        results = context.Queue()
+        # the best solutions are written by a background thread, the collection of the results goes on
+        self.checkpoint = CheckpointWriter(self.output_path).start() if self.output_path else None
+
+        process_time_limit = max(self.time_limit - FINISH_MARGIN - (time.time() - start_time), 0.0)
+        processes = [
+            context.Process(
+                target=self.target,
+                args=(index, self.distance_matrix, process_time_limit, self.config, inboxes, shared, results),
+                daemon=True
+            )
+            for index in range(self.process_count)
+        ]
+        for process in processes:
+            process.start()
+
+        finished = 0
+        deadline = start_time + self.time_limit
+        while finished < self.process_count and time.time() < deadline:
+            try:
+                _, solution, cost, iterations = results.get(timeout=0.5)
+                finished += 1
+                self.iterations += iterations
+                self._update(solution, cost)
+            except queue.Empty:
+                # checkpoint the best solution published by the processes so far
+                self._update(*shared.snapshot())
+
+        for process in processes:
+            process.join(timeout=max(deadline - time.time(), 0.0))
+            if process.is_alive():
+                process.terminate()
+        if self.checkpoint is not None:
+            self.checkpoint.close(self.best_solution, timeout=max(deadline - time.time(), 0.0))
+
+        LOG.info(f"Best found solution cost = {self.best_solution_cost} ({self.iterations} iterations in total)")
+
+    def _update(self, solution: List[int], cost: float) -> None:
+        if cost < self.best_solution_cost and len(set(solution)) == self.city_count:
+            self.best_solution = solution
+            self.best_solution_cost = cost
+
+            # Checkpoint the best solution (the pending one is replaced if it was not written yet)
+            if self.checkpoint is not None:
+                self.checkpoint.submit(self.best_solution)
+
+
+class ParallelLNSSolver(MultiProcessSolver):
+    """
+    Multi-start LNS: independent LNSSolver workers (each with its own seed and initial
+    method) run in separate processes and exchange their best solutions over per-worker
+    queues without waiting for each other (see _Exchange).
+    """
+    def __init__(self, distance_matrix: List[List[float]], time_limit: float, output_path: str,
+                 worker_count: Optional[int] = None, seed: int = 0,
+                 coordinates: Optional[List[Tuple[float, float]]] = None,
+                 local_search: LocalSearchMethod = LocalSearch.lin_kernighan,
+                 exchange_interval: int = 50, restart_gap: float = 0.02,
+                 acceptance: Optional[AcceptanceCriterion] = None):
+        self.worker_count = worker_count or multiprocessing.cpu_count()
+        super().__init__(distance_matrix, time_limit, output_path, self.worker_count, _run_worker, {
+            "coordinates": coordinates,
+            "local_search": local_search,
+            "init_methods": [InitialSolutions.greedy, InitialSolutions.random],
+            "seed": seed,
+            "exchange_interval": exchange_interval,
+            "restart_gap": restart_gap,
+            "acceptance": acceptance
+        })
@@ -0,0 +1,107 @@
+from typing import List, Tuple, Dict, Optional, Any
+import random
+
+from candidates import CandidateIndex
+from spatial_index import GridIndex, Coordinates
+import backend
+
+
+QUANTILE_SAMPLES = 10000  # pairs of cities sampled for the distance quantiles
+REGISTRY_SIZE = 4  # instances whose precomputed data is kept
+
+_registry: Dict[int, Tuple[Any, 'InstanceData']] = {}  # id(distance matrix) -> (distance matrix, its data)
+
+
+def distance_quantile(distance_matrix: List[List[float]], q: float, samples: int = QUANTILE_SAMPLES) -> float:
+    """
+    The q-quantile of the distances between the cities (see InstanceData.quantile),
+    the scale of the shaw removal alpha parameter.
+    """
+    return InstanceData.of(distance_matrix).quantile(q, samples)
+
+
+class InstanceData:
+    """
+    Data precomputed once per distance matrix and shared by all the solvers of the instance
+    (Optimizer, LNSSolver and the island configurations):
+    - the distance quantiles, read from one sorted random sample of the pairs of cities (or
+      selected from all the distances with the numpy backend) instead of sorting all n^2/2 of them,
+    - the candidate neighbor lists,
+    - the uniform grid over the coordinates (radius, k-nearest and strip queries of the destroy methods).
+
+    InstanceData.of(distance_matrix) returns the shared object, everything is computed on the first use.
+    """
+    def __init__(self, distance_matrix: List[List[float]], coordinates: Optional[Coordinates] = None):
+        self.distance_matrix = distance_matrix
+        self.city_count = len(distance_matrix)
+        self.coordinates = coordinates or getattr(distance_matrix, "coordinates", None)
+
+        self._samples: Dict[int, List[float]] = {}  # sample size -> sorted sampled distances
+        self._quantiles: Dict[Tuple[float, int], float] = {}
+        self._candidates: Dict[int, CandidateIndex] = {}
+        self._grid: Optional[GridIndex] = None
+
+    @staticmethod
+    def of(distance_matrix: List[List[float]], coordinates: Optional[Coordinates] = None) -> 'InstanceData':
+        key = id(distance_matrix)
+        entry = _registry.get(key)
+        if entry is not None and entry[0] is distance_matrix:
+            data = entry[1]
+            if data.coordinates is None and coordinates:
+                data.coordinates = coordinates
+            return data
+
+        data = InstanceData(distance_matrix, coordinates)
+        if len(_registry) >= REGISTRY_SIZE:
+            _registry.pop(next(iter(_registry)))
+        _registry[key] = (distance_matrix, data)
+
+        return data
+
+    def quantile(self, q: float, samples: int = QUANTILE_SAMPLES) -> float:
+        """
+        Returns: The q-quantile of the distances between the distinct cities. It is exact (selected by
+        np.partition) with the numpy backend, estimated from the sample of pairs otherwise.
+        """
+        key = (q, samples)
+        if key not in self._quantiles:
+            if backend.vectorized(self.city_count, self.distance_matrix):
+                self._quantiles[key] = backend.upper_quantile(self.distance_matrix, q)
+            else:
+                distances = self._sample(samples)
+                self._quantiles[key] = distances[int(q * (len(distances) - 1))] if distances else 0.0
+
+        return self._quantiles[key]
+
+    def _sample(self, samples: int) -> List[float]:
+        if samples not in self._samples:
+            n = self.city_count
+            rng = random.Random(0)
+            self._samples[samples] = sorted(
+                self.distance_matrix[a][b]
+                for a, b in ((rng.randrange(n), rng.randrange(n)) for _ in range(samples if n > 1 else 0))
+                if a != b
+            )
+
+        return self._samples[samples]
+
+    def candidates(self, k: int = 10) -> CandidateIndex:
+        """
+        Returns: The K-nearest neighbor lists (from the coordinates if they are known, the matrix otherwise).
+        """
+        if k not in self._candidates:
+            if self.coordinates:
+                self._candidates[k] = CandidateIndex.from_coordinates(self.coordinates, k)
+            else:
+                self._candidates[k] = CandidateIndex.from_matrix(self.distance_matrix, k)
+
+        return self._candidates[k]
+
+    def grid(self) -> Optional[GridIndex]:
+        """
+        Returns: The grid index over the coordinates, None if the coordinates are unknown.
+        """
+        if self._grid is None and self.coordinates:
+            self._grid = GridIndex(self.coordinates)
+
+        return self._grid
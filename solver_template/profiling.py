@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional, Any, Iterator
+from contextlib import contextmanager
+import cProfile
+import io
+import logging
+import math
+import os
+import pstats
+import time
+import tracemalloc
+
+
+LOG = logging.getLogger(__name__)
+
+PROFILE_ENV = "TSP_PROFILE"  # counters | cprofile | tracemalloc, the same as the --profile flag of main.py
+PROFILE_MODES = ["counters", "cprofile", "tracemalloc"]
+HISTOGRAM_BUCKETS = 24  # log2 buckets of microseconds, the last one collects everything above ~8 s
+
+
+class PhaseProfiler:
+    """
+    Per-phase time counters of the LNS loop (destroy, repair, local search, acceptance,
+    checkpoint, exchange) with log2 histograms of the phase durations.
+    The solver holds None instead of a profiler when the profiling is disabled, so the
+    disabled counters cost a single comparison per phase.
+    """
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.histograms: Dict[str, List[int]] = {}
+
+    def record(self, phase: str, elapsed: float) -> None:
+        if phase not in self.totals:
+            self.totals[phase] = 0.0
+            self.counts[phase] = 0
+            self.histograms[phase] = [0] * HISTOGRAM_BUCKETS
+
+        self.totals[phase] += elapsed
+        self.counts[phase] += 1
+        bucket = math.frexp(elapsed * 1e6)[1] if elapsed > 0 else 0  # 2^(b-1) <= microseconds < 2^b
+        self.histograms[phase][min(max(bucket, 0), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def lap(self, phase: str, since: float) -> float:
+        """
+        Records the time from since to now for the phase.
+
+        Returns: The current time (the start of the next phase).
+        """
+        now = time.perf_counter()
+        self.record(phase, now - since)
+
+        return now
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            phase: {
+                "calls": self.counts[phase],
+                "total_time": total,
+                "mean_time_ms": 1000 * total / self.counts[phase],
+                "histogram_us": {f"<{1 << bucket}": count
+                                 for bucket, count in enumerate(self.histograms[phase]) if count},
+            }
+            for phase, total in self.totals.items()
+        }
+
+    def report(self, iterations: int, elapsed: float,
+               operators: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> str:
+        """
+        Returns: End-of-run report: iterations per second, time share and mean time of each
+        phase and (if the operator statistics are given) of each destroy/repair pair.
+        """
+        lines = [f"{iterations} iterations in {elapsed:.2f} s ({iterations / elapsed if elapsed > 0 else 0:.1f} per second)"]
+        lines.append(f"{'Phase':<40} | {'Calls':>8} | {'Share':>7} | {'Mean [ms]':>10}")
+
+        rows = [(phase, self.counts[phase], total) for phase, total in self.totals.items()]
+        if operators is not None:
+            rows += [(pair["name"], pair["calls"], pair["total_time"]) for pair in operators["pairs"]]
+
+        for name, calls, total in rows:
+            share = total / elapsed if elapsed > 0 else 0.0
+            lines.append(f"{name:<40} | {calls:>8} | {share:>7.1%} | {1000 * total / max(calls, 1):>10.3f}")
+
+        return "\n".join(lines)
+
+
+def profile_mode(flag: Optional[str] = None) -> Optional[str]:
+    """
+    Returns: The profiling mode from the CLI flag, or from the TSP_PROFILE environment variable.
+    """
+    mode = flag or os.environ.get(PROFILE_ENV) or None
+    if mode is not None and mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profiling mode {mode}, expected one of {', '.join(PROFILE_MODES)}")
+
+    return mode
+
+
+@contextmanager
+def capture(mode: Optional[str], output_path: Optional[str] = None, top: int = 20) -> Iterator[None]:
+    """
+    Runs the enclosed code under cProfile or tracemalloc (by mode, nothing for other modes)
+    and logs the top entries at the end. The cProfile statistics are also dumped to
+    output_path (readable by pstats or snakeviz) if it is given.
+    """
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if output_path:
+                profiler.dump_stats(output_path)
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+            LOG.warning(f"cProfile top {top} by cumulative time:\n{stream.getvalue()}")
+    elif mode == "tracemalloc":
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            lines = "\n".join(str(stat) for stat in snapshot.statistics("lineno")[:top])
+            LOG.warning(f"tracemalloc peak {peak / (1 << 20):.1f} MB, top {top} allocations:\n{lines}")
+    else:
+        yield
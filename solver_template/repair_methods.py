@@ -1,7 +1,17 @@
-from typing import List, Tuple
+from typing import List, Tuple, Optional, Sequence, Dict, Set, Iterable
+import heapq
 import math
 import itertools
 import random
+import time
+
+from candidates import CandidateIndex, tour_links, links_to_tour
+from precompute import InstanceData
+import backend
+from local_search import LocalSearch, LocalSearchMethod
+
+
+REGRET_K = 2  # insertions of a city compared by the regret repair (regret-2 by default)
 
 
 class RepairMethods:
@@ -11,10 +21,11 @@ class RepairMethods:
         solution_cost: float,
         deleted_cities: List[int],
         distance_matrix: List[List[float]],
+        time_budget: Optional[float] = None
     ) -> float:
         """
         This method randomly inserts deleted cities back into the solution.
-        Used only for testing purposes.
+        Used only for testing purposes (the time budget is accepted only for the uniform signature).
         """
         while deleted_cities:
             city = deleted_cities.pop()
@@ -65,30 +76,52 @@ class RepairMethods:
 
     @staticmethod
     def greedy(solution: List[int], solution_cost: float, deleted_cities: List[int],
-                      distance_matrix: List[List[float]]) -> float:
+                      distance_matrix: List[List[float]], candidates: Optional[CandidateIndex] = None,
+                      time_budget: Optional[float] = None) -> float:
         """
         This method repairs a solution by greedily reinserting deleted cities at positions that minimize
         the overall solution cost.
+        If the candidate index is given, only the edges touching the nearest neighbors
+        of each deleted city are considered as insertion points.
+        When the time budget runs out, the remaining cities are inserted one by one (each at its
+        cheapest position) instead of picking the cheapest insertion over all of them in each round.
 
         Returns: The updated total solution cost after all deleted cities have been reinserted.
         Note: The solution is modified in-place (the deleted cities a reinserted).
         """
+        if candidates is not None and solution:
+            return RepairMethods._regret_insertion(solution, solution_cost, deleted_cities,
+                                                   distance_matrix, candidates, 1, time_budget)
 
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        late = False
+        vectorized = backend.vectorized(len(solution), distance_matrix)  # a round in one broadcast
         while deleted_cities:
+            if deadline is not None and not late and time.perf_counter() > deadline:
+                late = True
+            first = len(deleted_cities) - 1 if late else 0
             lowest_cost = math.inf
-            best_insertion = (0, deleted_cities[0])  # (the best insertion index, the best city)
-            best_deletion = 0  # index in deleted_cities to be removed
+            best_insertion = (0, deleted_cities[first])  # (the best insertion index, the best city)
+            best_deletion = first  # index in deleted_cities to be removed
             best_insertion_cost = math.inf
 
-            for city_index, city in enumerate(deleted_cities):
-
-                for insertion_point in range(len(solution)):
-                    insertion_cost = RepairMethods.count_cost(insertion_point, city, solution, distance_matrix)
-                    if insertion_cost < lowest_cost:
-                        lowest_cost = insertion_cost
-                        best_insertion = (insertion_point, city)
-                        best_deletion = city_index
-                        best_insertion_cost = insertion_cost
+            if vectorized:
+                costs = backend.insertion_costs(distance_matrix, deleted_cities[first:], solution)
+                city_index, insertion_point = divmod(int(costs.argmin()), costs.shape[1])
+                best_deletion = first + city_index
+                best_insertion = (insertion_point, deleted_cities[best_deletion])
+                best_insertion_cost = float(costs[city_index, insertion_point])
+            else:
+                for city_index in range(first, len(deleted_cities)):
+                    city = deleted_cities[city_index]
+
+                    for insertion_point in range(len(solution)):
+                        insertion_cost = RepairMethods.count_cost(insertion_point, city, solution, distance_matrix)
+                        if insertion_cost < lowest_cost:
+                            lowest_cost = insertion_cost
+                            best_insertion = (insertion_point, city)
+                            best_deletion = city_index
+                            best_insertion_cost = insertion_cost
 
             solution.insert(best_insertion[0], best_insertion[1])
             solution_cost += best_insertion_cost
@@ -97,6 +130,171 @@ class RepairMethods:
         return solution_cost
 
 
+    @staticmethod
+    def regret(solution: List[int], solution_cost: float, deleted_cities: List[int],
+               distance_matrix: List[List[float]], candidates: Optional[CandidateIndex] = None,
+               k: int = REGRET_K, time_budget: Optional[float] = None) -> float:
+        """
+        This method repairs a solution by the regret-k insertion: in each round the deleted city with
+        the largest regret (the sum of the differences between its k cheapest insertions and the
+        cheapest one) is inserted at its cheapest position, so the cities which would lose the most
+        by waiting go first (ties by the cheaper insertion). With k=1 it is the greedy insertion.
+        If the candidate index is given, only the edges touching the nearest neighbors
+        of each deleted city are considered as insertion points (see _regret_insertion).
+
+        Returns: The updated total solution cost after all deleted cities have been reinserted.
+        Note: The solution is modified in-place (the deleted cities a reinserted).
+        """
+        if not solution:
+            return RepairMethods.greedy(solution, solution_cost, deleted_cities, distance_matrix,
+                                        time_budget=time_budget)
+
+        return RepairMethods._regret_insertion(solution, solution_cost, deleted_cities, distance_matrix,
+                                               candidates, k, time_budget)
+
+
+    @staticmethod
+    def _regret_insertion(solution: List[int], solution_cost: float, deleted_cities: List[int],
+                          distance_matrix: List[List[float]], candidates: Optional[CandidateIndex],
+                          k: int, time_budget: Optional[float] = None) -> float:
+        """
+        Regret-k insertion over a cached table of the k cheapest insertions (cost, city after which
+        it is inserted) of each deleted city. The partial tour is kept as successor/predecessor
+        links during the repair, so an insertion is O(1). After inserting a city into the edge
+        (p, s) only the table entries using that edge are recomputed, and the two new edges (p, city)
+        and (city, s) are offered to the deleted cities having p, city or s among their candidate
+        neighbors (to all of them without the candidate index). The cities wait in a lazy heap
+        ordered by their regret, an entry is outdated once the table row of the city changes.
+
+        With the candidate index, the insertions of a city are looked up on the edges touching its
+        nearest neighbors in the tour, a city without any neighbor in the tour falls back to
+        scanning all edges. When the time budget runs out, the remaining cities are inserted one
+        by one at their cheapest position.
+        """
+        pred, succ = tour_links(solution, len(distance_matrix))
+        in_tour = [p != -1 for p in pred]
+        length = len(solution)
+        start = solution[0]  # stays in the tour, the walks over all edges start from it
+        neighbors = candidates.neighbors if candidates is not None else None
+        remaining = set(deleted_cities)
+
+        near: Dict[int, List[int]] = {}  # city -> the deleted cities having it among their neighbors
+        if neighbors is not None:
+            for city in deleted_cities:
+                for nb in neighbors[city]:
+                    near.setdefault(nb, []).append(city)
+
+        options: Dict[int, List[Tuple[float, int]]] = {}  # city -> k cheapest (insertion cost, prev)
+        users: Dict[int, Set[int]] = {}  # prev -> the cities with an option on the edge (prev, succ[prev])
+        version = dict.fromkeys(deleted_cities, 0)
+        queue: List[Tuple[float, float, int, int]] = []  # (-regret, cheapest insertion, version, city)
+
+        def set_options(city: int, city_options: List[Tuple[float, int]]) -> None:
+            for _, prev in options.get(city, ()):
+                if prev in users:  # the edge may have been split already
+                    users[prev].discard(city)
+            options[city] = city_options
+            for _, prev in city_options:
+                users.setdefault(prev, set()).add(city)
+
+            version[city] += 1
+            cheapest = city_options[0][0]
+            regret = sum(cost - cheapest for cost, _ in city_options[1:])
+            heapq.heappush(queue, (-regret, cheapest, version[city], city))
+
+        def scan(city: int) -> None:
+            anchors: Iterable[int] = ()
+            if neighbors is not None:
+                anchors = {prev for nb in neighbors[city] if in_tour[nb] for prev in (pred[nb], nb)}
+            if not anchors:
+                anchors = links_to_tour(succ, start, length)
+
+            row = distance_matrix[city]
+            set_options(city, heapq.nsmallest(
+                k, ((row[prev] + row[succ[prev]] - distance_matrix[prev][succ[prev]], prev) for prev in anchors)
+            ))
+
+        for city in deleted_cities:
+            scan(city)
+
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        while remaining:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+            _, _, city_version, city = heapq.heappop(queue)
+            if city not in remaining or city_version != version[city]:
+                continue  # outdated entry
+
+            city_options = options.pop(city)
+            for _, prev in city_options:
+                users[prev].discard(city)
+            insertion_cost, p = city_options[0]
+            s = succ[p]
+            succ[p], pred[city] = city, p
+            succ[city], pred[s] = s, city
+            in_tour[city] = True
+            length += 1
+            solution_cost += insertion_cost
+            remaining.discard(city)
+
+            # the options on the split edge are gone, the new edges may be better for the cities nearby
+            invalidated = users.pop(p, set())
+            invalidated.discard(city)
+            for other in invalidated:
+                scan(other)
+
+            notified = remaining if neighbors is None \
+                else {other for y in (p, city, s) for other in near.get(y, ()) if other in remaining}
+            for other in notified:
+                if other in invalidated:
+                    continue
+                row = distance_matrix[other]
+                new_options = [(row[p] + row[city] - distance_matrix[p][city], p),
+                               (row[city] + row[s] - distance_matrix[city][s], city)]
+                merged = heapq.nsmallest(k, options[other] + new_options)
+                if merged != options[other]:
+                    set_options(other, merged)
+
+        for city in [city for city in deleted_cities if city in remaining]:  # out of time
+            scan(city)
+            insertion_cost, p = options[city][0]
+            s = succ[p]
+            succ[p], pred[city] = city, p
+            succ[city], pred[s] = s, city
+            in_tour[city] = True
+            length += 1
+            solution_cost += insertion_cost
+
+        deleted_cities.clear()
+        solution[:] = links_to_tour(succ, start, length)
+
+        return solution_cost
+
+
+    @staticmethod
+    def greedy_vnd(solution: List[int], solution_cost: float, deleted_cities: List[int],
+                   distance_matrix: List[List[float]], candidates: CandidateIndex,
+                   operators: Optional[Sequence[LocalSearchMethod]] = None,
+                   time_budget: Optional[float] = None) -> float:
+        """
+        This method repairs a solution by the greedy insertion and then improves it by
+        the variable neighborhood descent over the local search operators
+        (2-opt, Or-opt and segment insertion by default), starting from the reinserted cities.
+
+        Returns: The updated total solution cost.
+        Note: The solution is modified in-place.
+        """
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        touched_cities = deleted_cities.copy()
+        solution_cost = RepairMethods.greedy(solution, solution_cost, deleted_cities, distance_matrix, candidates,
+                                             time_budget)
+
+        remaining = max(deadline - time.perf_counter(), 0.0) if deadline is not None else None
+        return LocalSearch.vnd(solution, solution_cost, distance_matrix, candidates,
+                               active=touched_cities, operators=operators, time_budget=remaining)
+
+
     @staticmethod
     def count_cost_after_swap(solution: List[int], solution_cost: float, vertex_indices: Tuple[int, int],
                                   distance_matrix: List[List[float]]) -> float:
@@ -139,7 +337,15 @@ class RepairMethods:
         to identify the best swap of 2 edges that results in the lowest cost.
         Each combination represents the first vertices of the edges that are to be swapped.
         It applies the swap and returns the updated cost of the solution.
+        With the numpy backend all the combinations are evaluated in one batch.
         """
+        if backend.vectorized(len(solution), distance_matrix):
+            first, last, delta = backend.best_two_opt_move(distance_matrix, solution)
+            if delta < 0:
+                RepairMethods.two_opt_swap(solution, (first + 1) % len(solution), last)
+                return solution_cost + delta
+            return solution_cost
+
         best_solution_cost = solution_cost
         best_swap_indices = (0, 0)
 
@@ -153,3 +359,21 @@ class RepairMethods:
         RepairMethods.two_opt_swap(solution, best_swap_indices[0], best_swap_indices[1])
 
         return best_solution_cost
+
+
+    @staticmethod
+    def lin_kernighan(solution: List[int], solution_cost: float, distance_matrix: List[List[float]],
+                      candidates: Optional[CandidateIndex] = None, max_depth: int = 6) -> float:
+        """
+        This method improves the solution by the Lin-Kernighan style variable-depth search
+        (chains of up to max_depth 2-opt moves over the 5 nearest neighbors of each city, the lists
+        shared through InstanceData unless the candidates are given)
+        until a local optimum is reached. Unlike two_opt, it applies all improving moves found.
+
+        Returns: The updated solution cost (computed incrementally from the gains of the moves).
+        Note: The solution is modified in-place.
+        """
+        if candidates is None:
+            candidates = InstanceData.of(distance_matrix).candidates(5)
+
+        return LocalSearch.lin_kernighan(solution, solution_cost, distance_matrix, candidates, max_depth=max_depth)
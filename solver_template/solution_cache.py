@@ -0,0 +1,150 @@
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator
+from contextlib import contextmanager
+import json
+import logging
+import os
+import tempfile
+import time
+
+try:
+    import fcntl  # advisory locks between the parallel runs, Unix only
+except ImportError:
+    fcntl = None  # type: ignore
+
+
+LOG = logging.getLogger(__name__)
+
+CACHE_ENV = "TSP_SOLUTION_CACHE"  # directory of the cache, DEFAULT_CACHE_DIR when unset
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                 "tsp_solutions")
+CACHE_SIZE = 64  # instances whose best solution is kept, the least recently used ones are evicted
+SUFFIX = '.json'
+LOCK_NAME = '.lock'
+
+InitialMethod = Callable[[int, List[List[float]]], Tuple[List[int], float]]
+
+
+class SolutionCache:
+    """
+    On-disk cache of the best solutions keyed by the content hash of the instance (instance["Hash"],
+    see instance_cache.content_hash), so a repeated run of the same instance continues from the best
+    tour found so far instead of starting from scratch. An entry holds the tour, its cost and the
+    operator statistics of the run which found it (the final pair weights warm start the selector).
+
+    Each entry is one JSON file written atomically (a temporary file replaced in place), the runs
+    in parallel serialize the read-modify-write of store() and the eviction on an exclusive lock of
+    the directory (shared for load()), so a better tour is never overwritten by a worse one.
+    The modification time of an entry is its last use, only the size most recently used entries are kept.
+    """
+    def __init__(self, directory: Optional[str] = None, size: int = CACHE_SIZE):
+        self.directory = directory or os.environ.get(CACHE_ENV) or DEFAULT_CACHE_DIR
+        self.size = size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_NAME), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _read(self, key: str, city_count: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+            tour, cost = entry["Tour"], float(entry["Cost"])
+            valid = sorted(tour) == list(range(len(tour) if city_count is None else city_count))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None  # missing or malformed entry (e.g. not a list of cities)
+
+        if not valid:
+            LOG.warning(f"Cached solution {self._path(key)} is not a tour of {city_count or 'its'} cities, ignoring it")
+            return None
+        entry["Cost"] = cost
+
+        return entry
+
+    def load(self, key: str, city_count: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns: The cached entry of the instance (keys Tour, Cost, Statistics and Updated) or None
+        if there is none (or it is not a valid tour of city_count cities). The entry is marked as used.
+        """
+        try:
+            with self._locked(exclusive=False):
+                entry = self._read(key, city_count)
+                if entry is not None:
+                    os.utime(self._path(key))
+        except OSError as e:
+            LOG.warning(f"Could not read the solution cache {self.directory}: {e}")
+            return None
+
+        return entry
+
+    def store(self, key: str, tour: List[int], cost: float,
+              statistics: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        This method stores the solution unless the cache already holds a better one for the instance
+        and evicts the least recently used entries over the size.
+
+        Returns: True if the solution was stored.
+        """
+        try:
+            with self._locked(exclusive=True):
+                cached = self._read(key)
+                if cached is not None and cached["Cost"] <= cost:
+                    os.utime(self._path(key))
+                    return False
+
+                entry = {"Tour": list(tour), "Cost": cost, "Statistics": statistics, "Updated": time.time()}
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w') as f:
+                        json.dump(entry, f)
+                    os.replace(tmp_path, self._path(key))
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+
+                self._evict()
+        except OSError as e:
+            LOG.warning(f"Could not write the solution cache {self.directory}: {e}")
+            return False
+
+        return True
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SUFFIX):
+                try:
+                    entries.append((os.stat(os.path.join(self.directory, name)).st_mtime_ns, name))
+                except FileNotFoundError:
+                    pass
+
+        entries.sort(reverse=True)
+        for _, name in entries[self.size:]:
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def warm_start(tour: List[int]) -> InitialMethod:
+    """
+    Returns: An initial method of the LNSSolver returning the given (cached) tour,
+    with its cost recomputed from the distance matrix.
+    """
+    def initial(city_count: int, distance_matrix: List[List[float]]) -> Tuple[List[int], float]:
+        solution = list(tour)
+        cost = sum(distance_matrix[a][b] for a, b in zip(solution, solution[1:] + solution[:1]))
+
+        return solution, cost
+
+    return initial
@@ -0,0 +1,147 @@
+from typing import List, Tuple, Dict
+import math
+import heapq
+
+
+Coordinates = List[Tuple[float, float]]
+
+
+class GridIndex:
+    """
+    Uniform grid over the city coordinates. The plane is split into square cells
+    so that each cell holds roughly `density` cities, which makes nearest neighbor
+    queries touch only a few cells around the query point.
+    """
+    def __init__(self, coordinates: Coordinates, density: float = 2.0):
+        self.coordinates = [(float(x), float(y)) for x, y in coordinates]
+        self.city_count = len(self.coordinates)
+
+        if self.city_count == 0:
+            self.min_x = self.min_y = 0.0
+            self.cell_size = 1.0
+            self.cols = self.rows = 1
+            self.cells: Dict[Tuple[int, int], List[int]] = {}
+            return
+
+        xs = [x for x, _ in self.coordinates]
+        ys = [y for _, y in self.coordinates]
+        self.min_x, self.min_y = min(xs), min(ys)
+        width = max(xs) - self.min_x
+        height = max(ys) - self.min_y
+
+        area = max(width * height, max(width, height, 1.0) ** 2 / self.city_count)
+        self.cell_size = max(math.sqrt(area * density / self.city_count), 1e-9)
+        self.cols = int(width / self.cell_size) + 1
+        self.rows = int(height / self.cell_size) + 1
+
+        self.cells = {}
+        for city, (x, y) in enumerate(self.coordinates):
+            self.cells.setdefault(self._cell(x, y), []).append(city)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int((x - self.min_x) / self.cell_size), int((y - self.min_y) / self.cell_size)
+
+    def distance(self, a: int, b: int) -> float:
+        ax, ay = self.coordinates[a]
+        bx, by = self.coordinates[b]
+
+        return math.hypot(ax - bx, ay - by)
+
+    def _ring(self, cx: int, cy: int, r: int) -> List[int]:
+        """
+        Returns the cities stored in the cells exactly r cells away (Chebyshev distance)
+        from the cell (cx, cy).
+        """
+        if r == 0:
+            return self.cells.get((cx, cy), [])
+
+        cities: List[int] = []
+        for x in range(cx - r, cx + r + 1):
+            cities.extend(self.cells.get((x, cy - r), []))
+            cities.extend(self.cells.get((x, cy + r), []))
+        for y in range(cy - r + 1, cy + r):
+            cities.extend(self.cells.get((cx - r, y), []))
+            cities.extend(self.cells.get((cx + r, y), []))
+
+        return cities
+
+    def nearest(self, city: int, k: int) -> List[int]:
+        """
+        Returns up to k cities closest to the given city (the city itself excluded),
+        ordered by increasing distance.
+        """
+        k = min(k, self.city_count - 1)
+        if k <= 0:
+            return []
+
+        cx, cy = self._cell(*self.coordinates[city])
+        max_r = max(self.cols, self.rows)
+        found: List[Tuple[float, int]] = []  # max-heap of (-distance, city) of size k
+
+        r = 0
+        while r <= max_r:
+            for other in self._ring(cx, cy, r):
+                if other == city:
+                    continue
+                d = self.distance(city, other)
+                if len(found) < k:
+                    heapq.heappush(found, (-d, other))
+                elif d < -found[0][0]:
+                    heapq.heapreplace(found, (-d, other))
+
+            # every city outside of the inspected rings is at least r * cell_size away
+            if len(found) == k and -found[0][0] <= r * self.cell_size:
+                break
+            r += 1
+
+        return [other for _, other in sorted((-d, other) for d, other in found)]
+
+    def within(self, city: int, radius: float) -> List[int]:
+        """
+        Returns the cities at most radius away from the given city (the city itself excluded),
+        ordered by increasing distance.
+        """
+        cx, cy = self._cell(*self.coordinates[city])
+        reach = min(int(radius / self.cell_size) + 1, max(self.cols, self.rows))
+        found: List[Tuple[float, int]] = []
+
+        for r in range(reach + 1):
+            for other in self._ring(cx, cy, r):
+                if other != city:
+                    d = self.distance(city, other)
+                    if d <= radius:
+                        found.append((d, other))
+
+        return [other for _, other in sorted(found)]
+
+    def strip(self, city: int, angle: float, half_width: float, k: int) -> List[int]:
+        """
+        Returns up to k cities lying at most half_width away from the line through the given
+        city in the direction angle, the closest ones to the city along the line (the city itself
+        excluded). Only the cells along the line are inspected.
+        """
+        x0, y0 = self.coordinates[city]
+        dx, dy = math.cos(angle), math.sin(angle)
+        reach = int(half_width / self.cell_size) + 1  # cells around the line touching the strip
+        visited = set()
+        found: List[Tuple[float, int]] = []  # (distance along the line, city)
+
+        for step in range(self.cols + self.rows + 1):
+            for sign in ((1, -1) if step else (1,)):
+                t = sign * step * self.cell_size
+                cx, cy = self._cell(x0 + t * dx, y0 + t * dy)
+                for x in range(cx - reach, cx + reach + 1):
+                    for y in range(cy - reach, cy + reach + 1):
+                        if (x, y) in visited:
+                            continue
+                        visited.add((x, y))
+                        for other in self.cells.get((x, y), []):
+                            ox, oy = self.coordinates[other][0] - x0, self.coordinates[other][1] - y0
+                            if other != city and abs(ox * dy - oy * dx) <= half_width:
+                                found.append((abs(ox * dx + oy * dy), other))
+
+            # every strip city not found yet is more than step cells away along the line
+            if len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= step * self.cell_size:
+                break
+
+        return [other for _, other in heapq.nsmallest(k, found)]
@@ -1,8 +1,51 @@
+from typing import List, Tuple
+import json
 import logging
+import math
+import os
+import pickle
+import multiprocessing
+import queue
+import random
+import tempfile
+import time
+
+from candidates import CandidateIndex
+from destroy_methods import DestroyMethods, _calculate_related_cities
+from spatial_index import GridIndex
+from distance_matrix import DistanceMatrix, RowMatrix, solver_matrix, ROW_MAX_CITIES
+from benchmark import compare
+from exact import held_karp, branch_and_bound
+from lower_bound import one_tree_bound
+from initial_solutions import InitialSolutions
+from instance_cache import load_instance, read_instance_json_streaming, CACHE_ENV, _private_dir
+from local_search import LocalSearch
+from lns_solver import LNSSolver
+from operator_selection import AdaptiveOperatorSelector, REJECTED, ACCEPTED, BETTER, NEW_BEST
+from parallel_solver import ParallelLNSSolver, SharedSolutions, _Exchange
+from profiling import PhaseProfiler
+from checkpoint import CheckpointWriter
+from deadline import Deadline
+from acceptance import ACCEPTANCE_CRITERIA, AcceptanceCriterion, SimulatedAnnealing, LateAcceptance, \
+    RecordToRecordTravel, ThresholdAccepting
+import backend
+from precompute import InstanceData, distance_quantile
+from optimizer import Optimizer
+from repair_methods import RepairMethods
+from tour import Tour
+from solution_cache import SolutionCache, warm_start
 
 
 LOG = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(levelname)-5.5s][%(name)-.20s] %(message)s')
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(levelname)-5.5s][%(name)-.20s] %(message)s', force=True)
+
+
+def _random_instance(city_count: int, seed: int = 0) -> Tuple[List[Tuple[float, float]], List[List[float]]]:
+    rng = random.Random(seed)
+    coords = [(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(city_count)]
+    matrix = [[math.dist(a, b) for b in coords] for a in coords]
+
+    return coords, matrix
 
 
 def _test_a():
@@ -12,10 +55,600 @@ def _test_a():
     # as each of the authors uses different IDE and workflow
 
 
+def _test_candidate_index():
+    coords, matrix = _random_instance(200)
+    from_matrix = CandidateIndex.from_matrix(matrix, k=8)
+    from_coords = CandidateIndex.from_coordinates(coords, k=8)
+
+    assert from_matrix.neighbors == from_coords.neighbors
+    assert all(city not in from_matrix.nearest(city) for city in range(200))
+
+
+def _test_greedy_candidates():
+    _, matrix = _random_instance(150)
+    candidates = CandidateIndex.from_matrix(matrix)
+    random.seed(1)
+
+    solution, cost = InitialSolutions.greedy(150, matrix)
+    deleted_cities, cost = DestroyMethods.random(solution, cost, matrix)
+    cost = RepairMethods.greedy(solution, cost, deleted_cities, matrix, candidates)
+
+    assert sorted(solution) == list(range(150))
+    assert math.isclose(cost, RepairMethods.count_cost_trivial(solution, matrix))
+
+
+def _test_two_opt_local_search():
+    _, matrix = _random_instance(120, seed=2)
+    candidates = CandidateIndex.from_matrix(matrix)
+
+    solution, cost = InitialSolutions.random(120, matrix)
+    improved_cost = LocalSearch.two_opt(solution, cost, matrix, candidates)
+
+    assert sorted(solution) == list(range(120))
+    assert improved_cost < cost
+    assert math.isclose(improved_cost, RepairMethods.count_cost_trivial(solution, matrix))
+    assert LocalSearch.two_opt(solution, improved_cost, matrix, candidates) == improved_cost
+
+
+def _test_segment_moves():
+    _, matrix = _random_instance(120, seed=3)
+    candidates = CandidateIndex.from_matrix(matrix)
+
+    for operator in (LocalSearch.or_opt, LocalSearch.two_h_opt, LocalSearch.segment_insertion, LocalSearch.vnd,
+                     LocalSearch.lin_kernighan):
+        solution, cost = InitialSolutions.random(120, matrix)
+        improved_cost = operator(solution, cost, matrix, candidates)
+
+        assert sorted(solution) == list(range(120))
+        assert improved_cost < cost
+        assert math.isclose(improved_cost, RepairMethods.count_cost_trivial(solution, matrix))
+
+
+def _test_distance_matrix():
+    coords, matrix = _random_instance(50, seed=4)
+    compact = DistanceMatrix.from_lists(matrix)
+    lazy = DistanceMatrix.from_coordinates(coords, lazy=True, cache_size=100)
+
+    assert len(compact) == len(lazy) == 50
+    for i in range(50):
+        for j in range(50):
+            assert compact[i][j] == matrix[i][j]
+            assert math.isclose(lazy[i][j], matrix[i][j])
+
+    solution, cost = InitialSolutions.greedy(50, compact)
+    assert math.isclose(cost, RepairMethods.count_cost_trivial(solution, matrix))
+
+    # the solver gets the materialized rows of the compact matrix, the lazy one is kept
+    rows = solver_matrix(compact)
+    assert isinstance(rows, RowMatrix) and rows.data is compact.data
+    assert [list(row) for row in rows] == [list(row) for row in pickle.loads(pickle.dumps(rows))] == matrix
+    assert solver_matrix(lazy) is lazy and solver_matrix(compact, max_cities=10) is compact
+
+    # the compact form keeps the upper triangle only, an asymmetric matrix is kept as the lists of rows
+    asymmetric = [[0, 1, 2], [1, 0, 3.16], [2, 2, 0]]
+    try:
+        DistanceMatrix.from_lists(asymmetric)
+        assert False, "the asymmetric matrix is not compacted"
+    except ValueError:
+        pass
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "asymmetric.json")
+        with open(path, 'w') as f:
+            json.dump({"Matrix": asymmetric, "Timeout": 1}, f)
+        instance = load_instance(path, use_cache=False)
+        assert instance["Matrix"] == asymmetric and solver_matrix(instance["Matrix"]) is instance["Matrix"]
+
+
+def _test_solver_matrix():
+    coords, matrix = _random_instance(200, seed=6)
+    compact = DistanceMatrix.from_lists(matrix)
+
+    # below ROW_MAX_CITIES the solver gets the materialized rows equal to the compact matrix
+    # (their throughput is measured by benchmark.py)
+    rows = solver_matrix(compact)
+    assert 200 <= ROW_MAX_CITIES and isinstance(rows, RowMatrix) and not rows.lazy
+    assert len(rows) == 200 and all(list(rows[i]) == [compact[i][j] for j in range(200)] for i in range(200))
+    assert solver_matrix(DistanceMatrix.from_coordinates(coords, lazy=True)).lazy
+
+    # the benchmark comparison reports a drop of the throughput as a regression
+    summary = {"tsp": {"mean_cost": 100.0, "mean_iterations_per_second": 500.0}}
+    baseline = {"summary": {"tsp": {"mean_cost": 100.0, "mean_iterations_per_second": 1000.0}}}
+    assert compare({"summary": summary}, baseline, tolerance=0.01) == ["tsp"]
+    assert compare({"summary": summary}, baseline, tolerance=0.01, speed_tolerance=0.6) == []
+
+
+def _test_instance_cache():
+    coords, matrix = _random_instance(30, seed=5)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "instance.json")
+        with open(path, 'w') as f:
+            json.dump({"Coordinates": coords, "Matrix": matrix, "Timeout": 10, "GlobalBestVal": 123.5}, f, indent=4)
+
+        assert read_instance_json_streaming(path) == json.loads(json.dumps(
+            {"Coordinates": coords, "Timeout": 10, "GlobalBestVal": 123.5}))
+
+        os.environ[CACHE_ENV] = os.path.join(folder, "cache")
+        try:
+            parsed = load_instance(path)
+            mapped = load_instance(path)
+        finally:
+            del os.environ[CACHE_ENV]
+        assert sorted(os.listdir(folder)) == ["cache", "instance.json"]
+        assert len(os.listdir(os.path.join(folder, "cache"))) == 1  # the sidecar is not written next to the instance
+        assert isinstance(mapped["Matrix"].data, memoryview)  # mapped from the sidecar
+
+        # the mapped instance has the same attributes as the parsed one
+        assert parsed.keys() == mapped.keys() == {"Coordinates", "Matrix", "Timeout", "GlobalBestVal", "Hash"}
+        assert parsed["Hash"] == mapped["Hash"]
+        assert mapped["Timeout"] == 10 and mapped["GlobalBestVal"] == 123.5
+        assert all(mapped["Matrix"][i][j] == matrix[i][j] for i in range(30) for j in range(30))
+
+        # a sidecar is used only from a private directory and only for the exact bytes of the instance file
+        shared = os.path.join(folder, "shared")
+        os.makedirs(shared)
+        os.chmod(shared, 0o777)
+        assert not _private_dir(shared) and _private_dir(os.path.join(folder, "cache"))
+
+        stat = os.stat(path)
+        with open(path) as f:
+            text = f.read()
+        with open(path, 'w') as f:
+            f.write(text.replace('"Timeout": 10', '"Timeout": 20'))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert os.stat(path).st_size == stat.st_size
+        os.environ[CACHE_ENV] = os.path.join(folder, "cache")
+        try:
+            assert load_instance(path)["Timeout"] == 20
+        finally:
+            del os.environ[CACHE_ENV]
+
+
+def _test_construction_heuristics():
+    coords, matrix = _random_instance(150, seed=10)
+    _, random_cost = InitialSolutions.random(150, matrix)
+
+    for method, config in ((InitialSolutions.space_filling_curve, {"coordinates": coords}),
+                           (InitialSolutions.greedy_edge, {}),
+                           (InitialSolutions.mst_double_tree, {})):
+        solution, cost, build_time = InitialSolutions.timed(method, 150, matrix, **config)
+
+        assert sorted(solution) == list(range(150))
+        assert math.isclose(cost, RepairMethods.count_cost_trivial(solution, matrix))
+        assert cost < random_cost / 3 and build_time >= 0
+
+
+def _test_exact_solvers():
+    _, matrix = _random_instance(8, seed=11)
+    _, brute_force_cost = InitialSolutions.brute_force(matrix)
+    solution, cost = held_karp(matrix)
+    assert math.isclose(cost, brute_force_cost)
+    assert math.isclose(cost, RepairMethods.count_cost_trivial(solution, matrix))
+
+    _, matrix = _random_instance(12, seed=12)
+    _, held_karp_cost = held_karp(matrix)
+    solution, cost, optimal = branch_and_bound(matrix, 10)
+    assert optimal and math.isclose(cost, held_karp_cost)
+    assert sorted(solution) == list(range(12))
+
+
+def _test_lower_bound():
+    _, matrix = _random_instance(12, seed=13)
+    _, optimal_cost = held_karp(matrix)
+    bound, _ = one_tree_bound(matrix, optimal_cost * 1.1)
+    assert optimal_cost * 0.9 < bound <= optimal_cost + 1e-6
+
+    solver = LNSSolver(matrix, 30, None, seed=14, lower_bound=True)
+    solver.solve()
+    assert solver.optimal and math.isclose(solver.best_solution_cost, optimal_cost)
+
+
+def _test_tour():
+    _, matrix = _random_instance(80, seed=8)
+    candidates = CandidateIndex.from_matrix(matrix)
+    random.seed(9)
+
+    solution, cost = InitialSolutions.random(80, matrix)
+    tour = Tour(solution, 80)
+    tour.reverse(70, 5)  # wraps around, the shorter side is reversed
+    assert all(tour.pos[city] == i for i, city in enumerate(tour.order))
+    assert tour.between(tour.order[75], tour.order[2], tour.order[10])
+
+    original = tour.copy()
+    tour.begin()
+    deleted_cities, cost = DestroyMethods.random(tour, RepairMethods.count_cost_trivial(tour, matrix), matrix)
+    assert all(city not in tour for city in deleted_cities)
+    cost = RepairMethods.greedy_vnd(tour, cost, deleted_cities, matrix, candidates)
+
+    assert sorted(tour) == list(range(80))
+    assert all(tour.pos[city] == i for i, city in enumerate(tour.order))
+    assert math.isclose(cost, RepairMethods.count_cost_trivial(tour, matrix))
+
+    edited = tour.copy()
+    entries = tour.commit()
+    edited.undo(entries)
+    assert edited.order == original.order and edited.pos == original.pos
+
+    tour.begin()
+    LocalSearch.lin_kernighan(tour, cost, matrix, candidates)
+    DestroyMethods.shaw_removal(tour, cost, matrix, n=10, alpha=50)
+    tour.rollback()
+    assert edited.order != tour.order
+    tour.undo(entries)
+    assert tour.order == original.order and tour.pos == original.pos
+
+
+def _test_adaptive_operator_selection():
+    _, matrix = _random_instance(60, seed=6)
+    solver = LNSSolver(matrix, 10, None, seed=7, max_iterations=120)
+    solver.solve()
+
+    stats = solver.statistics()
+    assert sum(pair["calls"] for pair in stats["pairs"]) == 120
+    assert sum(method["calls"] for method in stats["destroy"]) == 120
+    assert all(pair["weight"] > 0 for pair in stats["pairs"])
+    assert sorted(solver.best_solution) == list(range(60))
+    assert math.isclose(solver.best_solution_cost, RepairMethods.count_cost_trivial(solver.best_solution, matrix))
+    assert not solver.selector.time_scoring  # a run of max_iterations scores the pairs per call
+
+    # scored per call, the weights do not depend on the measured times of the iterations
+    weights = []
+    for elapsed in (0.001, 0.5):
+        selector = AdaptiveOperatorSelector(solver.destroy_methods, solver.repair_methods,
+                                            segment_length=4, time_scoring=False)
+        for pair, outcome in [(0, NEW_BEST), (1, REJECTED), (0, BETTER), (1, ACCEPTED)]:
+            selector.update(pair, outcome, elapsed * (pair + 1))
+        weights.append(selector.weights)
+    assert weights[0] == weights[1]
+
+
+def _test_phase_profiler():
+    _, matrix = _random_instance(40, seed=8)
+    profiler = PhaseProfiler()
+    solver = LNSSolver(matrix, 10, None, seed=9, max_iterations=50, profiler=profiler)
+    solver.solve()
+
+    summary = profiler.summary()
+    for phase in ["destroy", "repair", "local_search", "acceptance"]:
+        assert summary[phase]["calls"] == 50
+        assert sum(summary[phase]["histogram_us"].values()) == 50
+    assert "iterations" in solver.profile_report()
+    assert LNSSolver(matrix, 10, None).profile_report() is None
+
+
+def _test_checkpoint_writer():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "out", "solution.json")
+        writer = CheckpointWriter(path, min_interval=60).start()
+        writer.submit([0, 1, 2])
+        assert not writer.due()
+        assert writer.close([2, 1, 0])  # the final flush ignores the rate limit
+        with open(path) as f:
+            assert json.load(f) == [2, 1, 0]
+        assert os.listdir(os.path.dirname(path)) == ["solution.json"]  # no temporary files left
+
+        _, matrix = _random_instance(30, seed=10)
+        solver = LNSSolver(matrix, 10, path, seed=11, max_iterations=30)
+        solver.solve()
+        with open(path) as f:
+            assert json.load(f) == solver.best_solution
+
+
+def _test_deadline():
+    deadline = Deadline(1.0, margin=0.2)
+    assert deadline.next_fits() and 0.7 < deadline.remaining() <= 0.8
+    deadline.iteration_time = 1.0  # an iteration of a second does not fit into the remaining time
+    assert not deadline.next_fits()
+
+    # the repair past its budget still reinserts every city
+    _, matrix = _random_instance(50, seed=12)
+    solution = list(range(50))
+    cost = RepairMethods.count_cost_trivial(solution, matrix)
+    deleted, cost = DestroyMethods.random(solution, cost, matrix)
+    cost = RepairMethods.greedy(solution, cost, deleted, matrix, CandidateIndex.from_matrix(matrix), time_budget=0.0)
+    assert sorted(solution) == list(range(50))
+    assert math.isclose(cost, RepairMethods.count_cost_trivial(solution, matrix))
+
+    solver = LNSSolver(matrix, 0.5, None, seed=13)
+    start = time.perf_counter()
+    solver.solve()
+    assert time.perf_counter() - start < 0.5
+    assert solver.iterations > 0
+
+
+def _test_backend():
+    assert backend.select_backend("python") == "python" and not backend.vectorized(1000)
+    if backend.np is None:
+        return
+
+    # the batched evaluations give the same repair as the pure-Python loops
+    _, matrix = _random_instance(60, seed=14)
+    solution = list(range(60))
+    random.Random(15).shuffle(solution)
+    repaired = {}
+    for name in backend.BACKENDS:
+        backend.select_backend(name)
+        partial, deleted = solution[20:], solution[:20]
+        cost = RepairMethods.greedy(partial, 0.0, deleted, matrix)
+        repaired[name] = (partial, cost)
+    backend.select_backend()
+
+    assert repaired["numpy"][0] == repaired["python"][0]
+    assert math.isclose(repaired["numpy"][1], repaired["python"][1])
+
+    # the shaw relatedness selects the same most related cities, with and without the tracked detour costs
+    tour = Tour(solution, 60)
+    related = {}
+    for name in backend.BACKENDS:
+        backend.select_backend(name)
+        related[name] = _calculate_related_cities(solution[0], 25.0, solution, matrix, count=10)
+        tour.track_detours(matrix)
+        related[name + "_detours"] = _calculate_related_cities(solution[0], 25.0, tour, matrix, count=10)
+        tour.detours = None
+    backend.select_backend()
+
+    expected = [(city, i, round(d, 9)) for city, i, d in related["python"]]
+    assert len(expected) == 10 and solution[0] not in [city for city, _, _ in expected]
+    for name, cities in related.items():
+        assert [(city, i, round(d, 9)) for city, i, d in cities] == expected, name
+
+
+def _test_instance_data():
+    coords, matrix = _random_instance(80, seed=16)
+    data = InstanceData.of(matrix, coords)
+    assert InstanceData.of(matrix) is data  # shared by all the solvers of the matrix
+
+    distances = sorted(matrix[i][j] for i in range(80) for j in range(i + 1, 80))
+    quantile = data.quantile(0.2)
+    assert distances[int(0.15 * len(distances))] <= quantile <= distances[int(0.25 * len(distances))]
+    assert distance_quantile(matrix, 0.2) == quantile
+
+    solver = LNSSolver(matrix, 10, None, coordinates=coords)
+    assert solver.candidates is data.candidates() and Optimizer(matrix).candidates is data.candidates()
+
+    # the lin_kernighan repair without the candidates reads the shared lists instead of building its own
+    solution, cost = InitialSolutions.random(80, matrix)
+    improved = RepairMethods.lin_kernighan(solution, cost, matrix)
+    assert 5 in data._candidates and sorted(solution) == list(range(80))
+    assert math.isclose(improved, RepairMethods.count_cost_trivial(solution, matrix))
+
+
+def _test_localized_destroy():
+    coords, matrix = _random_instance(200, seed=17)
+    grid = GridIndex(coords)
+    assert grid.within(0, 15) == sorted((c for c in range(1, 200) if math.dist(coords[0], coords[c]) <= 15),
+                                        key=lambda c: math.dist(coords[0], coords[c]))
+
+    angle, half_width = 0.7, 5.0
+    def along(c):
+        dx, dy = coords[c][0] - coords[0][0], coords[c][1] - coords[0][1]
+        return abs(dx * math.cos(angle) + dy * math.sin(angle))
+    in_strip = [c for c in range(1, 200) if abs((coords[c][0] - coords[0][0]) * math.sin(angle)
+                                                 - (coords[c][1] - coords[0][1]) * math.cos(angle)) <= half_width]
+    assert grid.strip(0, angle, half_width, 10) == sorted(in_strip, key=along)[:10]
+
+    for destroy, config in [(DestroyMethods.radial, {"grid": grid}), (DestroyMethods.strip, {"grid": grid}),
+                            (DestroyMethods.segment, {})]:
+        random.seed(18)
+        solution = Tour(range(200), 200)
+        cost = RepairMethods.count_cost_trivial(solution, matrix)
+        deleted, cost = destroy(solution, cost, matrix, n=20, **config)
+        assert len(set(deleted)) == 20 and len(solution) == 180 and not any(city in solution for city in deleted)
+        assert math.isclose(cost, RepairMethods.count_cost_trivial(solution.order, matrix))
+
+
+def _test_detour_costs():
+    _, matrix = _random_instance(60, seed=19)
+    tour = Tour(range(60), 60)
+    detours = tour.track_detours(matrix)
+    tour.begin()
+    tour.reverse(5, 20)
+    tour.reverse(50, 3)
+    deleted, cost = DestroyMethods.segment(tour, RepairMethods.count_cost_trivial(tour.order, matrix), matrix, n=10)
+    RepairMethods.greedy(tour, cost, deleted, matrix, CandidateIndex.from_matrix(matrix))
+    tour.rollback()
+
+    def expected(city):
+        i = tour.pos[city]
+        return matrix[city][tour.order[i - 1]] + matrix[city][tour.order[(i + 1) % 60]]
+    assert all(detours.costs()[city] == expected(city) for city in range(60))
+    assert detours.largest(5) == sorted(range(60), key=lambda city: -expected(city))[:5]
+
+    # n worst by the heap selects the same cities as by scanning the tour
+    plain = list(tour.order)
+    worst, _ = DestroyMethods.n_worst_cases(tour, 0.0, matrix, n=5)
+    assert sorted(worst) == sorted(DestroyMethods.n_worst_cases(plain, 0.0, matrix, n=5)[0])
+
+    # shaw removal asking for more cities than the tour has runs out of related cities gracefully
+    solution = list(range(8))
+    deleted, _ = DestroyMethods.shaw_removal(solution, 0.0, matrix, n=10, alpha=math.inf)
+    assert sorted(deleted) == list(range(8)) and solution == []
+
+
+def _test_regret_repair():
+    _, matrix = _random_instance(120, seed=23)
+    candidates = CandidateIndex.from_matrix(matrix)
+    random.seed(23)
+
+    solution, cost = InitialSolutions.random(120, matrix)
+    deleted_cities, cost = DestroyMethods.random(solution, cost, matrix)
+    for k, kwargs in [(1, {}), (2, {"candidates": candidates}), (3, {"candidates": candidates})]:
+        repaired, cities = solution.copy(), deleted_cities.copy()
+        repaired_cost = RepairMethods.regret(repaired, cost, cities, matrix, k=k, **kwargs)
+
+        assert sorted(repaired) == list(range(120)) and not cities
+        assert math.isclose(repaired_cost, RepairMethods.count_cost_trivial(repaired, matrix))
+        if k == 1:  # regret-1 is the greedy insertion
+            greedy = solution.copy()
+            assert math.isclose(repaired_cost, RepairMethods.greedy(greedy, cost, deleted_cities.copy(), matrix))
+
+    # out of time, the cities are still all inserted
+    repaired = solution.copy()
+    repaired_cost = RepairMethods.regret(repaired, cost, deleted_cities.copy(), matrix, candidates, time_budget=0.0)
+    assert sorted(repaired) == list(range(120))
+    assert math.isclose(repaired_cost, RepairMethods.count_cost_trivial(repaired, matrix))
+
+
+def _test_acceptance_criteria():
+    start, end = Deadline(1000.0), Deadline(0.0)  # at the start and past the end of the search
+    random.seed(24)
+    for criterion in ACCEPTANCE_CRITERIA.values():
+        acceptance = criterion().start(start, 100.0)
+        assert acceptance.accept(100.0, 99.0, 99.0) and acceptance.accept(99.0, 99.0, 99.0)
+        assert not criterion().start(end, 100.0).accept(100.0, 150.0, 100.0)
+
+    # the temperature is calibrated by the median worsening delta and cools with the time
+    annealing = SimulatedAnnealing().start(start, 100.0)
+    for delta in [1.0, 2.0, 30.0]:
+        annealing.accept(100.0, 100.0 + delta, 100.0)
+    assert annealing.scale == 2.0
+    assert math.isclose(annealing.temperature(), -2.0 / math.log(0.5), rel_tol=1e-3)
+    annealing.progress = end.progress
+    assert math.isclose(annealing.temperature(), -2.0 / math.log(0.001))
+
+    # late acceptance compares with the current cost length iterations ago
+    lahc = LateAcceptance(length=2).start(start, 100.0)
+    assert lahc.accept(100.0, 90.0, 100.0) and lahc.accept(90.0, 95.0, 90.0)
+    assert not lahc.accept(95.0, 98.0, 90.0)  # the slot now holds 90
+    assert RecordToRecordTravel(deviation=0.1).start(start, 100.0).accept(100.0, 109.0, 100.0)
+    threshold = ThresholdAccepting().start(start, 100.0)
+    assert threshold.accept(100.0, 110.0, 100.0) is False and threshold.accept(100.0, 105.0, 100.0)
+    try:
+        AcceptanceCriterion()
+        assert False, "the base criterion is abstract"
+    except TypeError:
+        pass
+
+    _, matrix = _random_instance(40, seed=24)
+    for name in sorted(ACCEPTANCE_CRITERIA):
+        solver = LNSSolver(matrix, 10, None, seed=24, max_iterations=40, acceptance=ACCEPTANCE_CRITERIA[name]())
+        solver.solve()
+        assert sorted(solver.best_solution) == list(range(40))
+        assert math.isclose(solver.best_solution_cost, RepairMethods.count_cost_trivial(solver.best_solution, matrix))
+
+    # a progress source of the iterations instead of the deadline
+    steps = iter([0.0, 1.0])
+    annealing = SimulatedAnnealing().start(start, 100.0, progress=lambda: next(steps))
+    annealing.scale = 2.0
+    assert annealing.temperature() > annealing.temperature()
+
+    # a run of max_iterations cools down by the iterations, the same seed gives the same cost on any machine load
+    _, matrix = _random_instance(150, seed=26)
+    costs = []
+    for _ in range(2):
+        solver = LNSSolver(matrix, 30, None, seed=26, max_iterations=200)
+        solver.solve()
+        costs.append(solver.best_solution_cost)
+    assert costs[0] == costs[1]
+    assert solver.acceptance.progress == solver._iteration_progress and not solver.selector.time_scoring
+
+    # a time-limited run cools down by the wall-clock time even with a seed
+    solver = LNSSolver(matrix, 0.3, None, seed=26)
+    solver.solve()
+    assert isinstance(solver.acceptance.progress.__self__, Deadline) and solver.selector.time_scoring
+
+
+def _test_solution_cache():
+    _, matrix = _random_instance(30, seed=25)
+    with tempfile.TemporaryDirectory() as folder:
+        cache = SolutionCache(folder, size=2)
+        assert cache.load("a", 30) is None
+
+        solver = LNSSolver(matrix, 10, None, seed=25, max_iterations=30)
+        solver.solve()
+        assert cache.store("a", solver.best_solution, solver.best_solution_cost, solver.statistics())
+        assert not cache.store("a", list(range(30)), solver.best_solution_cost + 1.0)  # a worse tour is not stored
+        entry = cache.load("a", 30)
+        assert entry["Tour"] == solver.best_solution and entry["Cost"] == solver.best_solution_cost
+        assert cache.load("a", 31) is None  # not a tour of the instance
+
+        # the warm started solver continues from the cached tour with the cached weights
+        warm = LNSSolver(matrix, 10, None, seed=26, max_iterations=10, init_method=warm_start(entry["Tour"]))
+        assert warm.selector.warm_start(entry["Statistics"]) == len(warm.selector.pairs)
+        assert warm.selector.weights == [max(pair["weight"], warm.selector.min_weight)
+                                         for pair in entry["Statistics"]["pairs"]]
+        warm.solve()
+        assert warm.best_solution_cost <= entry["Cost"] + 1e-9
+
+        # the least recently used entry is evicted
+        time.sleep(0.01)
+        cache.store("b", list(range(30)), 1.0)
+        time.sleep(0.01)
+        cache.load("a", 30)
+        time.sleep(0.01)
+        cache.store("c", list(range(30)), 1.0)
+        assert cache.load("b") is None and cache.load("a") is not None and cache.load("c") is not None
+
+        with open(os.path.join(folder, "c.json"), "w") as f:
+            f.write("{")  # a corrupted entry is a miss
+        assert cache.load("c") is None
+
+        # ... and so is a malformed one, which the next store replaces
+        for tour in [[1, "a"], 5, None]:
+            with open(os.path.join(folder, "c.json"), "w") as f:
+                json.dump({"Tour": tour, "Cost": 1.0}, f)
+            assert cache.load("c", 30) is None
+        assert cache.store("c", list(range(30)), 2.0) and cache.load("c", 30)["Cost"] == 2.0
+
+
+def _test_parallel_exchange():
+    class _Solver:
+        def __init__(self, tour, cost):
+            self.best_solution, self.best_solution_cost = tour, cost
+
+    shared = SharedSolutions(multiprocessing.get_context(), 2, 5)
+    inboxes = [queue.Queue(maxsize=2), queue.Queue(maxsize=2)]
+    exchanges = [_Exchange(shared, inboxes, worker, restart_gap=0.1) for worker in range(2)]
+
+    # nobody waits: the first worker posts and continues, the lagging one restarts from the received tour
+    assert exchanges[0](_Solver([0, 1, 2, 3, 4], 10.0), [], 0.0) is None
+    assert exchanges[1](_Solver([4, 3, 2, 1, 0], 20.0), [], 0.0) == ([0, 1, 2, 3, 4], 10.0)
+    assert exchanges[0](_Solver([0, 1, 2, 3, 4], 10.0), [], 0.0) is None  # the worse tour is not taken
+    assert shared.snapshot() == ([0, 1, 2, 3, 4], 10.0)
+    for _ in range(5):  # a full inbox drops the posts instead of blocking
+        exchanges[0].posted_cost = math.inf
+        exchanges[0](_Solver([0, 1, 2, 3, 4], 10.0), [], 0.0)
+
+    _, matrix = _random_instance(40, seed=7)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "solution.json")
+        solver = ParallelLNSSolver(matrix, 2.0, path, worker_count=2, local_search=LocalSearch.two_opt,
+                                   exchange_interval=5)
+        start = time.perf_counter()
+        solver.solve()
+        assert time.perf_counter() - start < 2.5
+        assert sorted(solver.best_solution) == list(range(40)) and solver.iterations > 0
+        with open(path) as f:
+            assert json.load(f) == solver.best_solution
+
+
 def _enumerate():
     LOG.info("Starting tests...")
 
     _test_a()
+    _test_candidate_index()
+    _test_greedy_candidates()
+    _test_two_opt_local_search()
+    _test_segment_moves()
+    _test_distance_matrix()
+    _test_solver_matrix()
+    _test_instance_cache()
+    _test_construction_heuristics()
+    _test_exact_solvers()
+    _test_lower_bound()
+    _test_tour()
+    _test_adaptive_operator_selection()
+    _test_phase_profiler()
+    _test_checkpoint_writer()
+    _test_deadline()
+    _test_backend()
+    _test_instance_data()
+    _test_localized_destroy()
+    _test_detour_costs()
+    _test_regret_repair()
+    _test_acceptance_criteria()
+    _test_solution_cache()
+    _test_parallel_exchange()
 
     LOG.info("All tests passed!")
 
@@ -0,0 +1,312 @@
+from typing import List, Optional, Iterable, Iterator, Tuple, Union, Any, Set
+import heapq
+
+
+# ('reverse', i, j): the positions i..j were reversed (a reversal is its own inverse)
+# ('replace', lo, removed, hi): the cities removed from the positions lo.. were replaced by order[lo:hi]
+JournalEntry = Tuple[Any, ...]
+
+HEAP_SLACK = 4  # the lazy heap is rebuilt when it holds more than this many entries per city
+
+
+class DetourCosts:
+    """
+    Detour cost of each city of a tour, d(prev, city) + d(city, next), i.e. the sum of the lengths
+    of its two tour edges. The tour edits only mark the cities whose neighbors changed as dirty,
+    their costs are recomputed once when the costs are read (typically by the next destroy),
+    and the costs are kept in a lazy max-heap: a changed cost is pushed as a new entry and the
+    outdated entries are dropped when they reach the top, so the k largest costs are found
+    in O(k log n) (amortized) instead of scanning and sorting the whole tour.
+    Cities out of the tour have the cost -1.
+    """
+    __slots__ = ('tour', 'distance_matrix', 'cost', 'heap', 'dirty')
+
+    def __init__(self, tour: 'Tour', distance_matrix: List[List[float]]):
+        self.tour = tour
+        self.distance_matrix = distance_matrix
+        self.cost: List[float] = [-1.0] * len(distance_matrix)
+        self.heap: List[Tuple[float, int]] = []  # (-cost, city), possibly outdated
+        self.dirty: Set[int] = set()
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        order = self.tour.order
+        n = len(order)
+        cost = self.cost
+        cost[:] = [-1.0] * len(cost)
+        for i, city in enumerate(order):
+            row = self.distance_matrix[city]
+            cost[city] = row[order[i - 1]] + row[order[(i + 1) % n]]
+        self.heap = [(-cost[city], city) for city in order]
+        heapq.heapify(self.heap)
+        self.dirty.clear()
+
+    def flush(self) -> None:
+        order, pos = self.tour.order, self.tour.pos
+        n = len(order)
+        cost, heap = self.cost, self.heap
+        for city in self.dirty:
+            i = pos[city]
+            if i == -1:
+                cost[city] = -1.0
+                continue
+            row = self.distance_matrix[city]
+            detour = row[order[i - 1]] + row[order[(i + 1) % n]]
+            if detour != cost[city]:
+                cost[city] = detour
+                heapq.heappush(heap, (-detour, city))
+        self.dirty.clear()
+
+        if len(heap) > HEAP_SLACK * n + 64:
+            self.heap = [(-cost[city], city) for city in order]
+            heapq.heapify(self.heap)
+
+    def costs(self) -> List[float]:
+        """
+        Returns: The up-to-date detour costs indexed by the city.
+        """
+        if self.dirty:
+            self.flush()
+        return self.cost
+
+    def largest(self, k: int) -> List[int]:
+        """
+        Returns: The k cities of the tour with the largest detour costs, from the largest one.
+        """
+        cost = self.costs()
+        heap = self.heap
+        found: List[Tuple[float, int]] = []
+        seen = set()
+        while heap and len(found) < k:
+            entry = heapq.heappop(heap)
+            city = entry[1]
+            if cost[city] == -entry[0] and city not in seen:  # drop the outdated and duplicate entries
+                found.append(entry)
+                seen.add(city)
+        for entry in found:
+            heapq.heappush(heap, entry)
+
+        return [city for _, city in found]
+
+
+class Tour:
+    """
+    Tour stored as the array of cities together with the position of each city in it,
+    so the neighbors of a city are found in O(1) and a segment is reversed in place
+    (always the shorter side of the cyclic tour, i.e. at most n/2 swaps).
+    Cities missing in the tour (e.g. removed by a destroy method) have the position -1.
+
+    The tour supports len(), iteration, indexing, slice assignment and insert, so the
+    destroy and repair methods written for the list of cities accept it unchanged,
+    while the local search operators work directly on its arrays without rebuilding
+    the position index.
+
+    Between begin() and commit()/rollback() every edit is recorded in the journal, so a
+    rejected solution is rolled back in the time of its edits (and not by copying the tour).
+    After track_detours() the detour costs of the cities are kept up to date as well.
+    """
+    __slots__ = ('order', 'pos', 'journal', 'detours')
+
+    def __init__(self, cities: Iterable[int], city_count: Optional[int] = None):
+        self.order: List[int] = list(cities)
+        if city_count is None:
+            city_count = max(self.order) + 1 if self.order else 0
+        self.pos: List[int] = [-1] * city_count
+        for i, city in enumerate(self.order):
+            self.pos[city] = i
+        self.journal: Optional[List[JournalEntry]] = None
+        self.detours: Optional[DetourCosts] = None
+
+    @staticmethod
+    def wrap(solution: Union['Tour', List[int]], city_count: int) -> 'Tour':
+        """
+        Returns: The solution itself if it is a Tour, otherwise a Tour sharing the list
+        of cities (the edits of the tour modify the list in place).
+        """
+        if isinstance(solution, Tour):
+            return solution
+
+        tour = Tour.__new__(Tour)
+        tour.order = solution
+        tour.pos = [-1] * city_count
+        for i, city in enumerate(solution):
+            tour.pos[city] = i
+        tour.journal = None
+        tour.detours = None
+
+        return tour
+
+    @staticmethod
+    def reverse_segment(order: List[int], pos: List[int], i: int, j: int) -> None:
+        """
+        This method reverses the cyclic segment of the tour between the positions i and j
+        (both included, going forward from i). The complementary segment is reversed
+        instead when it is shorter, which results in the same cyclic tour.
+        The position index pos is kept up to date.
+        """
+        n = len(order)
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            length = n - length
+
+        for _ in range(length // 2):
+            a, b = order[i], order[j]
+            order[i], order[j] = b, a
+            pos[b], pos[a] = i, j
+            i = (i + 1) % n
+            j = (j - 1) % n
+
+    @staticmethod
+    def journal_size(entries: List[JournalEntry]) -> int:
+        return sum(len(entry[2]) + 1 if entry[0] == 'replace' else 1 for entry in entries)
+
+    def track_detours(self, distance_matrix: List[List[float]]) -> DetourCosts:
+        self.detours = DetourCosts(self, distance_matrix)
+        return self.detours
+
+    def begin(self) -> None:
+        self.journal = []
+
+    def commit(self) -> List[JournalEntry]:
+        """
+        Stops recording the edits.
+
+        Returns: The journal of the edits since begin().
+        """
+        entries, self.journal = self.journal or [], None
+        return entries
+
+    def rollback(self) -> None:
+        self.undo(self.commit())
+
+    def undo(self, entries: List[JournalEntry]) -> None:
+        """
+        This method reverts the journaled edits (newest first), the undo itself is not recorded.
+        """
+        journal, self.journal = self.journal, None
+        for entry in reversed(entries):
+            if entry[0] == 'reverse':
+                Tour.reverse_segment(self.order, self.pos, entry[1], entry[2])
+                if self.detours is not None:
+                    self._update_reversal(entry[1], entry[2])
+            else:
+                _, lo, removed, hi = entry
+                self._replace(lo, hi, removed)
+        self.journal = journal
+
+    def _replace(self, lo: int, hi: int, cities: List[int]) -> List[int]:
+        order, pos = self.order, self.pos
+        removed = order[lo:hi]
+        for city in removed:
+            pos[city] = -1
+        order[lo:hi] = cities
+
+        end = len(order) if len(cities) != hi - lo else hi  # the positions behind shift if the length changes
+        for i in range(lo, end):
+            pos[order[i]] = i
+
+        if self.journal is not None:
+            self.journal.append(('replace', lo, removed, lo + len(cities)))
+        if self.detours is not None and order:
+            n = len(order)
+            dirty = self.detours.dirty
+            dirty.update(removed)
+            dirty.update(order[i % n] for i in range(lo - 1, lo + len(cities) + 1))
+
+        return removed
+
+    def _update_reversal(self, i: int, j: int) -> None:
+        # only the two edges at the ends of the reversed segment change
+        order = self.order
+        self.detours.dirty.update((order[i - 1], order[i], order[j], order[(j + 1) % len(order)]))  # type: ignore
+
+    def assign(self, other: 'Tour') -> None:
+        """
+        Copies the other tour into this one in place (the arrays are reused, not reallocated).
+        """
+        self.order[:] = other.order
+        self.pos[:] = other.pos
+        if self.detours is not None:
+            self.detours.rebuild()
+
+    def copy(self) -> 'Tour':
+        tour = Tour.__new__(Tour)
+        tour.order = self.order.copy()
+        tour.pos = self.pos.copy()
+        tour.journal = None
+        tour.detours = None
+
+        return tour
+
+    def next(self, city: int) -> int:
+        return self.order[(self.pos[city] + 1) % len(self.order)]
+
+    def prev(self, city: int) -> int:
+        return self.order[self.pos[city] - 1]
+
+    def between(self, a: int, b: int, c: int) -> bool:
+        """
+        Returns: True if b lies on the forward path from a to c (a and c included).
+        """
+        pos = self.pos
+        i, j, k = pos[a], pos[b], pos[c]
+        if i <= k:
+            return i <= j <= k
+
+        return j >= i or j <= k
+
+    def reverse(self, i: int, j: int) -> None:
+        Tour.reverse_segment(self.order, self.pos, i, j)
+        if self.journal is not None:
+            self.journal.append(('reverse', i, j))
+        if self.detours is not None:
+            self._update_reversal(i, j)
+
+    def two_opt_move(self, a: int, b: int, c: int, d: int) -> None:
+        """
+        This method replaces the tour edges (a, b) and (c, d) by the edges (a, c) and (b, d),
+        both edges must have the same orientation.
+        """
+        pos = self.pos
+        if self.order[(pos[a] + 1) % len(self.order)] == b:
+            self.reverse(pos[b], pos[c])
+        else:
+            self.reverse(pos[c], pos[b])
+
+    def insert(self, index: int, city: int) -> None:
+        self._replace(index, index, [city])
+
+    def __setitem__(self, index: slice, cities: Iterable[int]) -> None:
+        """
+        Slice assignment (e.g. solution[:] = ... in the destroy and repair methods), only
+        the window of positions that actually differs is rewritten and journaled.
+        """
+        old = self.order
+        new = list(cities)
+        if index != slice(None):
+            new, replaced = old.copy(), new
+            new[index] = replaced
+
+        lo, common = 0, min(len(old), len(new))
+        while lo < common and old[lo] == new[lo]:
+            lo += 1
+        old_hi, new_hi = len(old), len(new)
+        while old_hi > lo and new_hi > lo and old[old_hi - 1] == new[new_hi - 1]:
+            old_hi -= 1
+            new_hi -= 1
+
+        if lo < old_hi or lo < new_hi:
+            self._replace(lo, old_hi, new[lo:new_hi])
+
+    def __getitem__(self, index: int) -> int:
+        return self.order[index]
+
+    def __contains__(self, city: int) -> bool:
+        return self.pos[city] != -1
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.order)
@@ -2,6 +2,7 @@ from typing import List
 import json
 import os
 import logging
+import tempfile
 
 
 LOG = logging.getLogger(__name__)
@@ -15,11 +16,21 @@ def read_instance_json(file_path: str):
 
 
 def write_instance_json(solution: List[int], file_path: str) -> None:
+    """
+    The solution is written to a temporary file next to the target and renamed over it,
+    so the file always holds a complete solution (even if the process is killed meanwhile).
+    """
     LOG.info(f"Writing solution to {file_path}")
     folder = os.path.dirname(file_path)
 
     if folder:
         os.makedirs(folder, exist_ok=True)  # Create the directory if it doesn't exist
-    
-    with open(file_path, 'w') as f:
-        json.dump(solution, f)
+
+    fd, temp_path = tempfile.mkstemp(dir=folder or ".", prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(solution, f)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise